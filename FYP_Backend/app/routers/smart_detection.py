@@ -1,15 +1,36 @@
 # app/routers/smart_detection.py
-from fastapi import APIRouter, Response
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi import APIRouter, Query, Response
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Tuple
-from picamera2 import Picamera2
-from ultralytics import YOLO
-import cv2
+from typing import Dict, List, Optional, Tuple
+from collections import deque
+import numpy as np
+import os
 import time
 import threading
 import traceback
-import RPi.GPIO as GPIO
+from app.utils.frame_buffer import FrameRingBuffer, FrameRef, CaptureThread
+from app.utils.camera_supervisor import CameraSupervisor, CircuitBreaker
+from app.utils.mjpeg_broadcaster import MJPEGBroadcaster
+from app.utils.jpeg_encoder import AdaptiveQuality, create_jpeg_encoder, system_headroom
+from app.utils.inference_backends import create_backend
+from app.utils.inference_worker import ProcessInferenceBackend
+from app.utils.zone_mapping import ZoneMapper, load_zone_polygons
+from app.utils.motion_gate import MotionGate
+from app.utils.zone_hysteresis import ZoneHysteresis
+from app.utils.single_flight import LatestValue, SingleFlight
+from app.utils.rate_controller import AdaptiveRateController
+from app.utils.resource_governor import ResourceGovernor, parse_cpu_list, resolve_thread_count
+from app.utils.scan_scheduler import ScanScheduler, parse_hours
+from app.utils.roi_tiling import RoiTiler
+from app.utils.tracker import IoUTracker, TrackEvent
+from app.utils.zone_voting import ZoneVoter
+from app.utils.hardware import (create_camera_source, create_relay_driver, parse_size,
+                                resolve_camera_spec, resolve_relay_spec)
+from app.utils.relay_actuator import RelayActuator
+from app.utils.detection_pipeline import DetectionPipeline, FrameResult
+from app.utils.multi_camera import CameraChannel, MultiCameraScheduler, load_camera_configs
+from app.utils.metrics import metrics_registry
 
 # -----------------------------
 # Router
@@ -21,25 +42,261 @@ router = APIRouter()
 # -----------------------------
 RELAY_PINS = [2, 3, 4, 17]  # BCM numbering
 
-GPIO.setmode(GPIO.BCM)
-for pin in RELAY_PINS:
-    GPIO.setup(pin, GPIO.OUT)
-    GPIO.output(pin, GPIO.HIGH)  # OFF initially (active LOW)
+# "gpio" (RPi.GPIO, active LOW), "memory" (records writes) or "auto"
+# (gpio on a Raspberry Pi; elsewhere memory, with a warning)
+RELAY_DRIVER = resolve_relay_spec(os.getenv("RELAY_DRIVER", "auto"))
+
+# Minimum seconds between two toggles of the same relay
+RELAY_MIN_TOGGLE_SECONDS = float(os.getenv("RELAY_MIN_TOGGLE_SECONDS", "1.0"))
+
+# Pins are configured by start_detection_service(), not at import. Only the
+# actuator thread writes to the driver; everything else queues desired states.
+relay_driver = create_relay_driver(RELAY_DRIVER)
+relay_actuator = RelayActuator(relay_driver, min_toggle_s=RELAY_MIN_TOGGLE_SECONDS,
+                               on_write=lambda seconds: observe_stage("relay_write", seconds))
 
 def turn_off_all_relays():
-    for pin in RELAY_PINS:
-        GPIO.output(pin, GPIO.HIGH)
+    relay_actuator.all_off()
 
 # -----------------------------
 # Detection Settings
 # -----------------------------
-DURATION = 5  # seconds per scan
-FRAME_SKIP = 5
+DURATION = 5  # seconds per scan (upper bound with SCAN_EARLY_EXIT)
+FRAME_SKIP = 5  # initial value; adapted at runtime by rate_controller
 GRID_ROWS, GRID_COLS = 3, 3
+# "picamera", "synthetic", "file:<video or image dir>" or "auto" (picamera on
+# a Raspberry Pi; elsewhere synthetic, with a warning)
+CAMERA_SOURCE = resolve_camera_spec(os.getenv("CAMERA_SOURCE", "auto"))
+# Camera stream (what /preview shows) and an optional smaller detection stream
+# captured from the same sensor frame (picamera2's "lores" stream; mock
+# sources downscale). Without DETECTION_STREAM_SIZE one stream feeds both.
+CAMERA_SIZE = parse_size(os.getenv("CAMERA_SIZE", "640x480"))
+DETECTION_STREAM_SIZE = parse_size(os.getenv("DETECTION_STREAM_SIZE", ""))  # e.g. "320x240"
+DETECTION_FRAME_SIZE = DETECTION_STREAM_SIZE or CAMERA_SIZE
+# Zone polygons (inline JSON or a file path, see app/utils/zone_mapping.py)
+# instead of the plain GRID_ROWS x GRID_COLS cells. Each polygon feeds a
+# (row, col) zone, so relays still follow columns. In multi-camera mode each
+# camera takes its own "zones" list.
+ZONE_POLYGONS = os.getenv("ZONE_POLYGONS", "")
+FRAME_BUFFER_SLOTS = 6  # frame pool slots: writer + newest + one per concurrent reader
+FRAME_WAIT_TIMEOUT = 1.0  # seconds to wait for a new frame before giving up
+PREVIEW_MAX_FPS = 15  # per-client cap for /preview
+# Preview JPEGs: "turbo" (PyTurboJPEG), "opencv" or "auto"; both encode the BGR frame as is.
+# With PREVIEW_ADAPTIVE_QUALITY, quality and then resolution step down as
+# viewers are added or CPU headroom runs out.
+PREVIEW_JPEG_ENCODER = os.getenv("PREVIEW_JPEG_ENCODER", "auto")
+PREVIEW_ADAPTIVE_QUALITY = os.getenv("PREVIEW_ADAPTIVE_QUALITY", "1") == "1"
+
+# Camera watchdog: restart the camera in the background when no new frame
+# arrived for CAMERA_STALE_SECONDS or frames stopped changing for
+# CAMERA_FROZEN_SECONDS (0 = off); failed inits back off up to CAMERA_RETRY_MAX_BACKOFF s
+CAMERA_STALE_SECONDS = 5.0
+CAMERA_FROZEN_SECONDS = float(os.getenv("CAMERA_FROZEN_SECONDS", "10"))
+CAMERA_RETRY_MAX_BACKOFF = 60.0
+
+# Multi-camera: JSON list (inline or a file path) of cameras sharing the one
+# loaded model, e.g. [{"name": "room101", "source": "picamera", "relay_pins": [2, 3, 4, 17],
+# "weight": 1, "max_fps": 4}]. When set, every camera runs through the
+# scheduler instead of the single-camera loop. Policy: "fair" or "round_robin".
+CAMERAS_CONFIG = os.getenv("SMART_DETECTION_CAMERAS", "")
+CAMERA_SCHEDULER_POLICY = os.getenv("CAMERA_SCHEDULER_POLICY", "fair")
+
+# Motion gate: skip inference when less than MOTION_CHANGED_FRACTION of the
+# pixels changed since the last inferred frame, for at most MOTION_MAX_REUSE s
+MOTION_GATE_ENABLED = os.getenv("MOTION_GATE_ENABLED", "1") == "1"
+MOTION_CHANGED_FRACTION = 0.01
+MOTION_MAX_REUSE = 30.0
+
+# ROI tiling: re-check only zones that moved, are uncertain or are due for
+# re-verification, as one batch of crops, instead of the full frame
+ROI_TILING_ENABLED = os.getenv("ROI_TILING_ENABLED", "0") == "1"
+ROI_IMGSZ = 320
+ROI_MARGIN = 0.25  # fraction of a cell added around each crop
+ROI_REVERIFY_SECONDS = 10.0
+ROI_MAX_ZONES = 4  # above this a full-frame inference is cheaper
+
+# People tracking: counts come from IoU/centroid tracks that coast through
+# missed detections for TRACK_MAX_AGE s, and zone entry/exit events are kept
+TRACKER_ENABLED = os.getenv("TRACKER_ENABLED", "1") == "1"
+TRACK_IOU_THRESHOLD = 0.3
+TRACK_MAX_AGE = 2.0
+TRACK_MIN_HITS = 1  # detections before a track counts (1 = immediately)
+ZONE_EVENT_HISTORY = 500
+
+# Scan voting: every processed frame votes per zone, and a scan stops early
+# once every zone is decided with SCAN_CONFIDENCE (after SCAN_MIN_FRAMES)
+SCAN_EARLY_EXIT = os.getenv("SCAN_EARLY_EXIT", "1") == "1"
+SCAN_CONFIDENCE = 0.95
+SCAN_MIN_FRAMES = 3
+VOTE_DETECTION_RATE = 0.6  # share of frames the model finds a person who is in the zone
+VOTE_FALSE_POSITIVE_RATE = 0.05  # share of frames it finds one in an empty zone
+
+# "continuous": update relays on every processed frame through per-zone
+# hysteresis. "scan": a DURATION-second scan, duty-cycled by ScanScheduler.
+DETECTION_MODE = os.getenv("DETECTION_MODE", "continuous")
+AUTO_SCAN_INTERVAL = 6  # scan spacing while occupied (or any relay is on)
+
+# Scan-mode duty cycling: empty rooms back off from SCAN_EMPTY_INTERVAL towards
+# SCAN_MAX_IDLE_INTERVAL, and towards SCAN_QUIET_INTERVAL during quiet hours
+SCAN_EMPTY_INTERVAL = 15.0
+SCAN_IDLE_BACKOFF = 1.5
+SCAN_MAX_IDLE_INTERVAL = 120.0
+SCAN_QUIET_HOURS = parse_hours(os.getenv("SCAN_QUIET_HOURS", "23-6"))  # local time, "" = none
+SCAN_QUIET_INTERVAL = 300.0
+# Continuous mode applies the same intervals as a rate cap: while no zone is
+# occupied or pending and every relay is off, the next frame waits out the
+# interval, or until motion shows up in a frame checked every IDLE_MOTION_CHECK_S
+CONTINUOUS_DUTY_CYCLE = os.getenv("CONTINUOUS_DUTY_CYCLE", "1") == "1"
+IDLE_MOTION_CHECK_S = 1.0
+PAUSE_POLL_S = 0.25  # how quickly a paused continuous loop notices /scheduler/resume
+HYSTERESIS_ON_FRAMES = 1  # consecutive occupied frames before a zone turns ON
+HYSTERESIS_OFF_SECONDS = 10.0  # empty time before a zone turns OFF
+ZONE_HYSTERESIS_OVERRIDES = {}  # (row, col) -> (on_frames, off_seconds)
+
+# Adaptive frame skip / scan interval from measured inference latency
+ADAPTIVE_RATE_ENABLED = os.getenv("ADAPTIVE_RATE_ENABLED", "1") == "1"
+TARGET_LATENCY_MS = float(os.getenv("DETECTION_TARGET_LATENCY_MS", "500"))
+DETECTION_CPU_BUDGET = float(os.getenv("DETECTION_CPU_BUDGET", "0.5"))  # share of one core
+MAX_FRAME_SKIP = 30
+MAX_SCAN_INTERVAL = 60.0
+
+# Inference backend: "ultralytics" (PyTorch), "onnxruntime" or "openvino".
+# Export CPU models with `python -m app.utils.inference_backends --format onnx`.
+INFERENCE_BACKEND = os.getenv("DETECTION_BACKEND", "ultralytics")
+MODEL_PATH = os.getenv("DETECTION_MODEL", "yolov8n.pt")
+CONF_THRESHOLD = 0.25
+# Model input size, independent of the stream sizes (exported graphs with a
+# fixed input shape use their own)
+DETECTION_IMGSZ = int(os.getenv("DETECTION_IMGSZ", "640"))
+# Run the backend in a separate process (frames via shared memory) so
+# inference never competes with request handling for the GIL
+INFERENCE_WORKER_PROCESS = os.getenv("INFERENCE_WORKER_PROCESS", "0") == "1"
+
+# Resource governor: inference threads ("auto" = one per pinned core, or every
+# core but one; "0" = the backend's default), optional cores for the detection
+# threads (e.g. "1-3" leaves core 0 to the API), and the SoC temperatures
+# between which the detection rate is throttled, ahead of the firmware's 80 C cap
+INFERENCE_CPUS = parse_cpu_list(os.getenv("INFERENCE_CPUS", ""))
+INFERENCE_THREADS = resolve_thread_count(os.getenv("INFERENCE_THREADS", "auto"), INFERENCE_CPUS)
+THERMAL_SOFT_LIMIT_C = float(os.getenv("THERMAL_SOFT_LIMIT_C", "70"))
+THERMAL_HARD_LIMIT_C = float(os.getenv("THERMAL_HARD_LIMIT_C", "78"))
+THERMAL_MAX_THROTTLE = 4.0  # detection rate divisor at THERMAL_HARD_LIMIT_C
+
+resource_governor = ResourceGovernor(
+    inference_threads=INFERENCE_THREADS,
+    cpus=INFERENCE_CPUS,
+    soft_limit_c=THERMAL_SOFT_LIMIT_C,
+    hard_limit_c=THERMAL_HARD_LIMIT_C,
+    max_throttle=THERMAL_MAX_THROTTLE,
+    on_throttle=lambda factor: rate_controller.set_throttle(factor)
+)
+
+# Loaded in the background by start_detection_service()
+if INFERENCE_WORKER_PROCESS:
+    model = ProcessInferenceBackend(INFERENCE_BACKEND, MODEL_PATH, conf=CONF_THRESHOLD, imgsz=DETECTION_IMGSZ,
+                                    num_threads=INFERENCE_THREADS)
+else:
+    model = create_backend(INFERENCE_BACKEND, MODEL_PATH, conf=CONF_THRESHOLD, imgsz=DETECTION_IMGSZ,
+                           num_threads=INFERENCE_THREADS)
+
+# Box -> zone mapping through a cached pixel lookup table
+zone_mapper = ZoneMapper(GRID_ROWS, GRID_COLS, polygons=load_zone_polygons(ZONE_POLYGONS))
 
-print("[INFO] Loading YOLOv8 model...")
-model = YOLO("yolov8n.pt")
-print("[INFO] Model loaded successfully.")
+rate_controller = AdaptiveRateController(
+    target_latency_ms=TARGET_LATENCY_MS,
+    cpu_budget=DETECTION_CPU_BUDGET,
+    initial_skip=FRAME_SKIP,
+    max_skip=MAX_FRAME_SKIP,
+    base_scan_interval=AUTO_SCAN_INTERVAL,
+    max_scan_interval=MAX_SCAN_INTERVAL,
+    enabled=ADAPTIVE_RATE_ENABLED
+)
+
+motion_gate = MotionGate(
+    changed_fraction=MOTION_CHANGED_FRACTION,
+    max_reuse_s=MOTION_MAX_REUSE,
+    enabled=MOTION_GATE_ENABLED
+)
+
+roi_tiler = RoiTiler(
+    GRID_ROWS, GRID_COLS,
+    margin=ROI_MARGIN,
+    reverify_s=ROI_REVERIFY_SECONDS,
+    max_zones=ROI_MAX_ZONES,
+    imgsz=ROI_IMGSZ,
+    zone_mapper=zone_mapper
+) if ROI_TILING_ENABLED else None
+
+def create_tracker(mapper: ZoneMapper) -> Optional[IoUTracker]:
+    if not TRACKER_ENABLED:
+        return None
+    return IoUTracker(mapper, iou_threshold=TRACK_IOU_THRESHOLD,
+                      max_age_s=TRACK_MAX_AGE, min_hits=TRACK_MIN_HITS)
+
+tracker = create_tracker(zone_mapper)
+
+# -----------------------------
+# Metrics (served as Prometheus text from GET /metrics)
+# -----------------------------
+stage_seconds = metrics_registry.histogram(
+    "smart_detection_stage_seconds", "Time spent in each detection pipeline stage", ["stage"])
+scan_seconds = metrics_registry.histogram(
+    "smart_detection_scan_seconds", "Wall time of a full detection scan")
+scans_total = metrics_registry.counter(
+    "smart_detection_scans_total", "Detection decisions made (scans, or frames in continuous mode)", ["mode"])
+frames_processed_total = metrics_registry.counter(
+    "smart_detection_frames_processed_total", "Sampled frames run through the pipeline", ["result"])
+frames_skipped_total = metrics_registry.counter(
+    "smart_detection_frames_skipped_total", "Captured frames that did not reach the model", ["reason"])
+scans_ended_total = metrics_registry.counter(
+    "smart_detection_scans_ended_total", "Scans by how they ended", ["reason"])
+recent_scans = deque(maxlen=10000)  # decision timestamps for the per-minute gauge
+
+def scans_last_minute() -> int:
+    cutoff = time.time() - 60
+    while recent_scans and recent_scans[0] < cutoff:
+        recent_scans.popleft()
+    return len(recent_scans)
+
+def record_scan(mode: str):
+    scans_total.inc(mode=mode)
+    recent_scans.append(time.time())
+
+def record_frame_result(reused: bool):
+    frames_processed_total.inc(result="reused" if reused else "inferred")
+    if reused:
+        frames_skipped_total.inc(reason="motion_gate")
+
+zone_events_total = metrics_registry.counter(
+    "smart_detection_zone_events_total", "Tracked people entering or leaving a zone", ["kind"])
+zone_events = deque(maxlen=ZONE_EVENT_HISTORY)  # recent events for GET /events
+
+def record_zone_events(events: Tuple[TrackEvent, ...], camera: str = None):
+    for event in events:
+        zone_events_total.inc(kind=event.kind)
+        zone_events.append({**event._asdict(), "zone": list(event.zone), "camera": camera})
+
+def observe_stage(stage: str, seconds: float):
+    stage_seconds.observe(seconds, stage=stage)
+
+metrics_registry.callback(
+    "smart_detection_scans_per_minute", "Detection decisions in the last 60 seconds", scans_last_minute)
+metrics_registry.callback(
+    "smart_detection_soc_temperature_celsius", "Smoothed SoC temperature",
+    lambda: resource_governor.temperature_c)
+metrics_registry.callback(
+    "smart_detection_thermal_throttle", "Factor the detection rate is divided by to keep the SoC cool",
+    lambda: resource_governor.throttle)
+
+# Per-frame path shared with benchmark_detection.py
+pipeline = DetectionPipeline(
+    model, zone_mapper, relay_actuator, RELAY_PINS,
+    motion_gate=motion_gate,
+    rate_controller=rate_controller,
+    on_stage=observe_stage,
+    roi_tiler=roi_tiler,
+    tracker=tracker
+)
 
 # -----------------------------
 # Response Schemas
@@ -51,174 +308,663 @@ class CommandResult(BaseModel):
 class DetectionResponse(BaseModel):
     human_detected: bool
     occupied_zones: List[Tuple[int, int]]
+    zone_counts: List[List[int]]
     commands: List[CommandResult]
     processed: int
+    reused_frames: int
     frames_with_humans: int
     detection_rate: float
     pin_status: dict
     logs: List[str]
+    source: str = "scan"  # "scan" or "continuous"
+    camera: Optional[str] = None  # camera name in multi-camera mode
+    zone_confidence: List[List[float]] = []  # per-zone confidence of the scan's vote
+    scan_seconds: float = 0.0
+    early_exit: bool = False  # the scan stopped before DURATION because every zone was decided
+    timestamp: float = 0.0  # when this result was published (epoch seconds)
+    age_seconds: float = 0.0  # how old the result was when it was served
 
 # -----------------------------
 # Camera Handler
 # -----------------------------
-camera_lock = threading.Lock()
-camera_instance = None
-
+# camera_supervisor (below) initialises the camera in the background behind a
+# circuit breaker, so this never blocks: None means "unavailable right now".
 def get_camera():
-    global camera_instance
-    with camera_lock:
-        if camera_instance is None:
-            try:
-                camera_instance = Picamera2()
-                camera_instance.preview_configuration.main.size = (640, 480)
-                camera_instance.preview_configuration.main.format = "RGB888"
-                camera_instance.configure("preview")
-                camera_instance.start()
-            except Exception as e:
-                print("[ERROR] Camera init failed:", e)
-                camera_instance = None
-        return camera_instance
+    return camera_supervisor.get()
+
+# -----------------------------
+# Frame Capture
+# -----------------------------
+# A single capture thread owns the camera and captures into a pool of
+# reference-counted slots; detection and preview hold slots instead of
+# copying. The pool is in shared memory when the worker process reads it.
+# With a detection stream, frame_buffer holds its frames and display_buffer
+# the full-size ones for /preview.
+frame_buffer = FrameRingBuffer(slots=FRAME_BUFFER_SLOTS, shared=INFERENCE_WORKER_PROCESS)
+display_buffer = FrameRingBuffer(slots=FRAME_BUFFER_SLOTS) if DETECTION_STREAM_SIZE else None
+
+def record_capture(seconds: float):
+    # Time of the capture itself, not of waiting for the next sampled frame
+    observe_stage("capture", seconds)
+    rate_controller.record_capture(seconds)
+
+capture_thread = CaptureThread(get_camera, frame_buffer, on_capture=record_capture,
+                               display_buffer=display_buffer)
+capture_start_lock = threading.Lock()
+camera_supervisor = CameraSupervisor(
+    lambda: create_camera_source(CAMERA_SOURCE, size=CAMERA_SIZE, lores_size=DETECTION_STREAM_SIZE),
+    frame_buffer,
+    lambda: capture_thread.running,
+    stale_after_s=CAMERA_STALE_SECONDS,
+    frozen_after_s=CAMERA_FROZEN_SECONDS,
+    breaker=CircuitBreaker(max_backoff=CAMERA_RETRY_MAX_BACKOFF)
+)
+
+metrics_registry.callback(
+    "smart_detection_camera_errors_total", "Frame capture errors",
+    lambda: capture_thread.capture_errors, kind="counter")
+metrics_registry.callback(
+    "smart_detection_frames_captured_total", "Frames captured from the camera",
+    lambda: capture_thread.frames_captured, kind="counter")
+metrics_registry.callback(
+    "smart_detection_camera_init_failures_total", "Failed camera initialisations",
+    lambda: camera_supervisor.init_failures, kind="counter")
+metrics_registry.callback(
+    "smart_detection_camera_restarts_total", "Camera restarts after stale or frozen frames",
+    lambda: sum(camera_supervisor.reinits.values()), kind="counter")
+
+def ensure_capture_running() -> FrameRingBuffer:
+    with capture_start_lock:
+        capture_thread.start()
+    return frame_buffer
+
+def ensure_display_running() -> FrameRingBuffer:
+    ensure_capture_running()
+    return display_buffer if display_buffer is not None else frame_buffer
 
 # -----------------------------
 # Detection Function
 # -----------------------------
+def read_sampled_frame(buffer: FrameRingBuffer, last_seq: int) -> Optional[FrameRef]:
+    """
+    Wait for the next frame to sample and hold it in the pool (None on
+    timeout). The caller must release the ref once the frame is processed.
+    """
+    ref = buffer.acquire(last_seq + rate_controller.frame_skip, timeout=FRAME_WAIT_TIMEOUT)
+    if ref is not None:
+        rate_controller.record_frame(ref.seq, ref.timestamp)
+        if last_seq > 0 and ref.seq - last_seq > 1:
+            frames_skipped_total.inc(ref.seq - last_seq - 1, reason="frame_skip")
+    return ref
+
 def run_detection() -> DetectionResponse:
-    picam2 = get_camera()
-    if picam2 is None:
+    if get_camera() is None:
         raise RuntimeError("Camera not available")
+    buffer = ensure_capture_running()
 
     start_time = time.time()
-    frame_count = 0
     processed_frames = 0
+    reused_frames = 0
     frames_with_humans = 0
-    last_occupied_grids = set()
+    early_exit = False
+    last_zone_counts = zone_mapper.as_grid(np.zeros(zone_mapper.n_zones, dtype=np.int64))
+    last_seq = buffer.seq
+    voter = ZoneVoter(
+        GRID_ROWS, GRID_COLS,
+        confidence=SCAN_CONFIDENCE,
+        detection_rate=VOTE_DETECTION_RATE,
+        false_positive_rate=VOTE_FALSE_POSITIVE_RATE
+    )
 
     logs = []  # âœ… frontend logs
 
+    busy_time = 0.0  # time spent in detection work, for scan spacing
+
     while (time.time() - start_time) < DURATION:
-        frame = picam2.capture_array()
-        h, w, _ = frame.shape
-        cell_h, cell_w = h // GRID_ROWS, w // GRID_COLS
-        frame_count += 1
-
-        if frame_count % FRAME_SKIP == 0:
-            processed_frames += 1
-            results = model(frame, classes=0, conf=0.25, verbose=False)
-            current_frame_grids = set()
-
-            for r in results:
-                if len(r.boxes) > 0:
-                    frames_with_humans += 1
-                for box in r.boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    center_x, center_y = (x1 + x2) / 2, (y1 + y2) / 2
-                    grid_col = int(center_x // cell_w)
-                    grid_row = int(center_y // cell_h)
-                    if 0 <= grid_row < GRID_ROWS and 0 <= grid_col < GRID_COLS:
-                        current_frame_grids.add((grid_row, grid_col))
-
-            last_occupied_grids = current_frame_grids
+        # Sample every frame_skip-th captured frame; if inference is slower
+        # than that, the newest frame is used straight away.
+        ref = read_sampled_frame(buffer, last_seq)
+        if ref is None:
+            continue
+        last_seq = ref.seq
+
+        processed_frames += 1
+        work_started = time.perf_counter()
+        with ref:
+            has_humans, counts, reused, events = pipeline.process_frame(ref.frame)
+        busy_time += time.perf_counter() - work_started
+        record_frame_result(reused)
+        record_zone_events(events)
+        if reused:
+            reused_frames += 1
+        if has_humans:
+            frames_with_humans += 1
+        voter.vote(counts, reused=reused)
+        last_zone_counts = zone_mapper.as_grid(counts)
+        if SCAN_EARLY_EXIT and processed_frames >= SCAN_MIN_FRAMES and voter.all_decided():
+            early_exit = True
+            break
 
+    elapsed = time.time() - start_time
+    rate_controller.record_scan(busy_time, elapsed)
+    scan_seconds.observe(elapsed)
+    scans_ended_total.inc(reason="early_exit" if early_exit else "duration")
+    record_scan("scan")
     detection_rate = (frames_with_humans / processed_frames * 100) if processed_frames > 0 else 0
-    human_detected = frames_with_humans > 0
+    # Zones are decided by the vote over the whole scan, not by its last frame
+    last_occupied_grids = voter.occupied()
+    human_detected = bool(last_occupied_grids)
 
     logs.append(
-        f"[DETECTION] Processed={processed_frames}, FramesWithHumans={frames_with_humans}, DetectionRate={detection_rate:.2f}%, HumanDetected={human_detected}"
+        f"[DETECTION] Processed={processed_frames}, Reused={reused_frames}, FramesWithHumans={frames_with_humans}, DetectionRate={detection_rate:.2f}%, HumanDetected={human_detected}"
+    )
+    logs.append(
+        f"[VOTE] Decided={voter.stats()['decided_zones']}/{zone_mapper.n_zones}, ScanTime={elapsed:.2f}s, EarlyExit={early_exit}"
     )
 
     commands = []
     pin_status = {}
 
     if human_detected:
-        active_columns = {col for (_, col) in last_occupied_grids}
-
-        for i, pin in enumerate(RELAY_PINS):
-            if i in active_columns:
-                GPIO.output(pin, GPIO.LOW)
-                state = "ON"
-            else:
-                GPIO.output(pin, GPIO.HIGH)
-                state = "OFF"
-
-            logs.append(f"[RELAY] GPIO {pin} -> {state}")
-            pin_status[pin] = state
-
+        pin_status = pipeline.apply_relays(last_occupied_grids, logs)
         for pos in last_occupied_grids:
             commands.append(CommandResult(zone=pos, status="ON"))
 
     else:
         turn_off_all_relays()
-        for pin in RELAY_PINS:
-            logs.append(f"[RELAY] GPIO {pin} -> OFF")
-            pin_status[pin] = "OFF"
+        relay_actuator.flush()
+        pin_status = pipeline.relay_status()
+        for pin, state in pin_status.items():
+            held = " (held, toggle interval)" if state == "ON" else ""
+            logs.append(f"[RELAY] GPIO {pin} -> OFF{held}")
         commands.append(CommandResult(zone=(-1, -1), status="OFF"))
 
     print("\n".join(logs))  # âœ… terminal log
 
-    return DetectionResponse(
+    response = DetectionResponse(
         human_detected=human_detected,
         occupied_zones=list(last_occupied_grids),
+        zone_counts=last_zone_counts,
         commands=commands,
         processed=processed_frames,
+        reused_frames=reused_frames,
         frames_with_humans=frames_with_humans,
         detection_rate=detection_rate,
         pin_status=pin_status,
-        logs=logs
+        logs=logs,
+        source="scan",
+        zone_confidence=voter.confidence_grid(),
+        scan_seconds=round(elapsed, 3),
+        early_exit=early_exit,
+        timestamp=time.time()
     )
+    latest_detection.publish(response)
+    return response
+
+# -----------------------------
+# Published Results
+# -----------------------------
+# /detect serves the newest result from the background loop; forced scans
+# share whichever scan is already running instead of starting another.
+latest_detection: LatestValue[DetectionResponse] = LatestValue()
+scan_flight = SingleFlight()
+
+def run_scan_shared() -> DetectionResponse:
+    return scan_flight.do(run_detection)
 
 # -----------------------------
-# Automatic Detection Thread
+# Continuous Detection
 # -----------------------------
-def auto_detection_loop():
-    while True:
+zone_hysteresis = ZoneHysteresis(
+    GRID_ROWS, GRID_COLS,
+    on_frames=HYSTERESIS_ON_FRAMES,
+    off_seconds=HYSTERESIS_OFF_SECONDS,
+    overrides=ZONE_HYSTERESIS_OVERRIDES
+)
+
+def continuous_detection_loop():
+    """Update zone occupancy on every processed frame and switch relays on state changes"""
+    buffer = ensure_capture_running()
+    last_seq = buffer.seq
+    pin_status = None
+    relay_logs = []
+    window = deque()  # (timestamp, has_humans, reused) over the last DURATION seconds
+    last_recorded = 0.0
+    while not detection_stop.is_set():
+        if continuous_duty_cycle.paused:
+            # POST /scheduler/pause: no frames processed, relays keep their state
+            detection_stop.wait(PAUSE_POLL_S)
+            continue
         try:
-            run_detection()
+            ref = read_sampled_frame(buffer, last_seq)
+            now = time.time()
+            if ref is None:
+                # Camera stalled: let hysteresis time zones out anyway
+                counts = np.zeros(zone_hysteresis.rows * zone_hysteresis.cols, dtype=np.int64)
+            else:
+                last_seq = ref.seq
+                with ref:
+                    has_humans, counts, reused, events = pipeline.process_frame(ref.frame)
+                window.append((now, has_humans, reused))
+                record_frame_result(reused)
+                record_zone_events(events)
+                record_scan("continuous")
+            while window and now - window[0][0] > DURATION:
+                window.popleft()
+
+            changed = zone_hysteresis.update(counts, now)
+            if roi_tiler is not None:
+                roi_tiler.flag(zone_hysteresis.pending())
+            if changed or pin_status is None:
+                relay_logs = []
+                pin_status = pipeline.apply_relays(zone_hysteresis.occupied(), relay_logs)
+                print("\n".join(relay_logs))
+
+            # Live relay states: a toggle held back by the actuator lands later
+            publish_continuous_snapshot(counts, window, pipeline.relay_status(), relay_logs, now)
+
+            if CONTINUOUS_DUTY_CYCLE:
+                last_recorded, idled = duty_cycle_wait(buffer, last_recorded)
+                if idled:
+                    resume_at = max(last_seq, buffer.seq - rate_controller.frame_skip)
+                    if last_seq > 0 and resume_at > last_seq:
+                        frames_skipped_total.inc(resume_at - last_seq, reason="duty_cycle")
+                    last_seq = resume_at
         except Exception as e:
-            print("[ERROR] Auto detection failed:", e)
-        time.sleep(6)  # 6 second loop
+            print("[ERROR] Continuous detection failed:", e)
+            time.sleep(1)
+
+def publish_continuous_snapshot(counts: np.ndarray, window: deque, pin_status: Dict[int, str],
+                                relay_logs: List[str], now: float,
+                                hysteresis: ZoneHysteresis = None, target: LatestValue = None,
+                                camera: str = None):
+    hysteresis = hysteresis or zone_hysteresis
+    target = target or latest_detection
+    occupied = hysteresis.occupied()
+    processed_frames = len(window)
+    frames_with_humans = sum(1 for _, has_humans, _ in window if has_humans)
+    reused_frames = sum(1 for _, _, reused in window if reused)
+    detection_rate = (frames_with_humans / processed_frames * 100) if processed_frames > 0 else 0
+    logs = [
+        f"[DETECTION] Processed={processed_frames}, Reused={reused_frames}, FramesWithHumans={frames_with_humans}, DetectionRate={detection_rate:.2f}%, HumanDetected={bool(occupied)}"
+    ] + relay_logs
+    if occupied:
+        commands = [CommandResult(zone=pos, status="ON") for pos in occupied]
+    else:
+        commands = [CommandResult(zone=(-1, -1), status="OFF")]
+    target.publish(DetectionResponse(
+        human_detected=bool(occupied),
+        occupied_zones=list(occupied),
+        zone_counts=zone_mapper.as_grid(counts),
+        commands=commands,
+        processed=processed_frames,
+        reused_frames=reused_frames,
+        frames_with_humans=frames_with_humans,
+        detection_rate=detection_rate,
+        pin_status=dict(pin_status),
+        logs=logs,
+        source="continuous",
+        camera=camera,
+        timestamp=now
+    ))
+
+# -----------------------------
+# Scan Scheduler
+# -----------------------------
+# Scan mode: started and stopped with the service; POST /scheduler/pause and
+# /resume. Scans wait for the camera instead of failing while it comes up.
+scan_scheduler = ScanScheduler(
+    lambda: run_scan_shared().human_detected,
+    occupied_interval=AUTO_SCAN_INTERVAL,
+    empty_interval=SCAN_EMPTY_INTERVAL,
+    backoff=SCAN_IDLE_BACKOFF,
+    max_idle_interval=SCAN_MAX_IDLE_INTERVAL,
+    quiet_hours=SCAN_QUIET_HOURS,
+    quiet_interval=SCAN_QUIET_INTERVAL,
+    relays_on_fn=lambda: any(relay_actuator.states.values()),
+    min_interval_fn=lambda: rate_controller.scan_interval,
+    throttle_fn=lambda: resource_governor.throttle,
+    ready_fn=lambda: get_camera() is not None
+)
+
+# Continuous mode: the same policy, never started; the detection loop feeds it
+# and waits out its interval itself (duty_cycle_wait)
+continuous_duty_cycle = ScanScheduler(
+    lambda: False,
+    occupied_interval=0.0,
+    empty_interval=SCAN_EMPTY_INTERVAL,
+    backoff=SCAN_IDLE_BACKOFF,
+    max_idle_interval=SCAN_MAX_IDLE_INTERVAL,
+    quiet_hours=SCAN_QUIET_HOURS,
+    quiet_interval=SCAN_QUIET_INTERVAL,
+    relays_on_fn=lambda: any(relay_actuator.states.values()),
+    throttle_fn=lambda: resource_governor.throttle
+)
+
+def duty_cycle_wait(buffer: FrameRingBuffer, last_recorded: float) -> Tuple[float, bool]:
+    """
+    Rate cap for the continuous loop -> (when occupancy was last recorded,
+    whether it waited). Occupied rooms are recorded once per
+    AUTO_SCAN_INTERVAL and never wait; an empty room with every relay off
+    waits out the scheduler's interval, ending early on motion.
+    """
+    now = time.time()
+    if zone_hysteresis.occupied() or zone_hysteresis.pending().any() or any(relay_actuator.states.values()):
+        continuous_duty_cycle.last_interval, continuous_duty_cycle.last_reason = AUTO_SCAN_INTERVAL, "occupied"
+        if now - last_recorded >= AUTO_SCAN_INTERVAL:
+            continuous_duty_cycle.record(True, now)
+            return now, False
+        return last_recorded, False
+    continuous_duty_cycle.record(False, now)
+    interval, reason = continuous_duty_cycle.next_interval(now)
+    deadline = now + interval
+    continuous_duty_cycle.last_interval, continuous_duty_cycle.last_reason = interval, reason
+    continuous_duty_cycle.next_scan_at = deadline
+    while not detection_stop.wait(min(IDLE_MOTION_CHECK_S, max(0.0, deadline - time.time()))):
+        if time.time() >= deadline or continuous_duty_cycle.paused:
+            break
+        ref = buffer.acquire(buffer.seq, timeout=FRAME_WAIT_TIMEOUT)
+        if ref is None:
+            continue
+        with ref:
+            if motion_gate.moved(ref.frame):
+                break
+    continuous_duty_cycle.next_scan_at = None
+    return now, True
+
+# -----------------------------
+# Preview Encoding
+# -----------------------------
+def preview_headroom() -> float:
+    # No headroom while the governor is slowing detection down for heat
+    return 0.0 if resource_governor.throttle > 1.0 else system_headroom()
+
+def create_preview_broadcaster(buffer_factory, mapper: ZoneMapper) -> MJPEGBroadcaster:
+    return MJPEGBroadcaster(
+        buffer_factory, GRID_ROWS, GRID_COLS,
+        max_fps=PREVIEW_MAX_FPS, wait_timeout=FRAME_WAIT_TIMEOUT, zone_mapper=mapper,
+        encoder=create_jpeg_encoder(PREVIEW_JPEG_ENCODER),
+        adaptive=AdaptiveQuality(headroom_fn=preview_headroom, enabled=PREVIEW_ADAPTIVE_QUALITY)
+    )
+
+# -----------------------------
+# Multi-Camera Scheduler
+# -----------------------------
+# Each configured camera gets its own capture thread, motion gate, hysteresis
+# and relay pins; one scheduler thread shares the loaded model between them.
+camera_configs = load_camera_configs(CAMERAS_CONFIG)
+camera_feeds: Dict[str, Tuple[ZoneHysteresis, LatestValue]] = {}
+camera_previews: Dict[str, MJPEGBroadcaster] = {}
+
+def make_camera_result_handler(name: str):
+    hysteresis = ZoneHysteresis(
+        GRID_ROWS, GRID_COLS,
+        on_frames=HYSTERESIS_ON_FRAMES,
+        off_seconds=HYSTERESIS_OFF_SECONDS,
+        overrides=ZONE_HYSTERESIS_OVERRIDES
+    )
+    latest = LatestValue()
+    window = deque()
+    relays = {"pin_status": None, "logs": []}
+    camera_feeds[name] = (hysteresis, latest)
+
+    def handle(channel: CameraChannel, result: FrameResult, now: float):
+        window.append((now, result.has_humans, result.reused))
+        while window and now - window[0][0] > DURATION:
+            window.popleft()
+        record_frame_result(result.reused)
+        record_zone_events(result.events, camera=name)
+        record_scan("continuous")
+
+        changed = hysteresis.update(result.counts, now)
+        if channel.pipeline.roi_tiler is not None:
+            channel.pipeline.roi_tiler.flag(hysteresis.pending())
+        if changed or relays["pin_status"] is None:
+            relays["logs"] = []
+            relays["pin_status"] = channel.pipeline.apply_relays(hysteresis.occupied(), relays["logs"])
+            print("\n".join(f"[{name}] {line}" for line in relays["logs"]))
+        publish_continuous_snapshot(result.counts, window, channel.pipeline.relay_status(), relays["logs"], now,
+                                    hysteresis=hysteresis, target=latest, camera=name)
+    return handle
+
+def build_camera_scheduler() -> MultiCameraScheduler:
+    channels = []
+    for config in camera_configs:
+        camera_zones = ZoneMapper(GRID_ROWS, GRID_COLS, polygons=load_zone_polygons(config["zones"]))
+        pipeline = DetectionPipeline(
+            model, camera_zones, relay_actuator, config["relay_pins"],
+            motion_gate=MotionGate(
+                changed_fraction=MOTION_CHANGED_FRACTION,
+                max_reuse_s=MOTION_MAX_REUSE,
+                enabled=MOTION_GATE_ENABLED
+            ),
+            on_stage=observe_stage,
+            roi_tiler=RoiTiler(
+                GRID_ROWS, GRID_COLS,
+                margin=ROI_MARGIN,
+                reverify_s=ROI_REVERIFY_SECONDS,
+                max_zones=ROI_MAX_ZONES,
+                imgsz=ROI_IMGSZ,
+                zone_mapper=camera_zones
+            ) if ROI_TILING_ENABLED else None,
+            tracker=create_tracker(camera_zones)
+        )
+        channel = CameraChannel(
+            config["name"],
+            create_camera_source(config["source"], size=CAMERA_SIZE, lores_size=DETECTION_STREAM_SIZE,
+                                 camera_num=config["camera_num"]),
+            pipeline,
+            make_camera_result_handler(config["name"]),
+            weight=config["weight"], max_fps=config["max_fps"], buffer_slots=FRAME_BUFFER_SLOTS,
+            shared_buffer=INFERENCE_WORKER_PROCESS,
+            stale_after_s=CAMERA_STALE_SECONDS, frozen_after_s=CAMERA_FROZEN_SECONDS
+        )
+        camera_previews[channel.name] = create_preview_broadcaster(
+            lambda channel=channel: channel.preview_buffer, camera_zones
+        )
+        channels.append(channel)
+    return MultiCameraScheduler(channels, policy=CAMERA_SCHEDULER_POLICY,
+                                throttle_fn=lambda: resource_governor.throttle)
+
+camera_scheduler = build_camera_scheduler() if camera_configs else None
+
+def all_relay_pins() -> List[int]:
+    if camera_scheduler is None:
+        return RELAY_PINS
+    return sorted({pin for config in camera_configs for pin in config["relay_pins"]})
+
+# -----------------------------
+# Service Lifecycle
+# -----------------------------
+# Nothing heavy happens at import time. main.py's lifespan handler calls
+# start_detection_service(), which configures the relays and then loads and
+# warms up the model in the background so the API can answer straight away.
+service_lock = threading.Lock()
+service_state = {"state": "stopped", "since": time.time(), "error": None}
+detection_stop = threading.Event()
+detection_thread = None
+
+def set_service_state(state: str, error: str = None):
+    service_state.update(state=state, since=time.time(), error=error)
+    print(f"[INFO] Smart detection service: {state}" + (f" ({error})" if error else ""))
+
+def is_ready() -> bool:
+    return service_state["state"] == "ready"
+
+def on_inference_worker_state(state: str, error: Optional[str]):
+    """The worker process died and is respawned on the next inference call"""
+    if state == "restarting":
+        set_service_state("restarting_inference_worker", error)
+    elif state == "running" and service_state["state"] == "restarting_inference_worker":
+        set_service_state("ready")
+    elif state == "failed":
+        set_service_state("failed", error)
+        turn_off_all_relays()  # detection can no longer keep them in line with occupancy
+
+if INFERENCE_WORKER_PROCESS:
+    model.on_state = on_inference_worker_state
 
-threading.Thread(target=auto_detection_loop, daemon=True).start()
+def readiness() -> dict:
+    return {
+        "ready": is_ready(),
+        "state": service_state["state"],
+        "since": service_state["since"],
+        "error": service_state["error"],
+        "model_loaded": model.loaded,
+        "model_load_time_s": model.load_time_s,
+        "hardware": {
+            "camera": CAMERA_SOURCE if camera_scheduler is None else
+                      {config["name"]: config["source"] for config in camera_configs},
+            "relays": relay_driver.name,
+        },
+    }
+
+def load_and_start_detection():
+    global detection_thread
+    # Everything started from here on (model threads, inference worker,
+    # detection loop, schedulers) inherits the INFERENCE_CPUS affinity
+    resource_governor.pin_current_thread()
+    try:
+        if not model.loaded:
+            set_service_state("loading_model")
+            model.load()
+        set_service_state("warming_up")
+        model.warmup((DETECTION_FRAME_SIZE[1], DETECTION_FRAME_SIZE[0], 3))
+        if detection_stop.is_set():
+            return
+        if camera_scheduler is not None:
+            camera_scheduler.start()
+        elif DETECTION_MODE == "continuous":
+            # Still running when a dead inference worker failed the service
+            if detection_thread is None or not detection_thread.is_alive():
+                detection_thread = threading.Thread(target=continuous_detection_loop, name="smart-detection",
+                                                    daemon=True)
+                detection_thread.start()
+        else:
+            scan_scheduler.start()
+        set_service_state("ready")
+    except Exception as e:
+        traceback.print_exc()
+        set_service_state("failed", str(e))
+
+def start_detection_service():
+    """Configure relays and start loading the model in the background; returns immediately"""
+    with service_lock:
+        if service_state["state"] not in ("stopped", "failed"):
+            return
+        detection_stop.clear()
+        relay_actuator.start(all_relay_pins())  # OFF initially
+        print(f"[INFO] Relay driver: {relay_driver.name}")
+        resource_governor.start()
+        if camera_scheduler is None:
+            camera_supervisor.start()  # camera comes up while the model loads
+        set_service_state("starting")
+        threading.Thread(target=load_and_start_detection, name="smart-detection-startup", daemon=True).start()
+
+def stop_detection_service():
+    """Stop the detection loop and capture, switch relays off and release the hardware"""
+    global detection_thread
+    with service_lock:
+        detection_stop.set()
+        scan_scheduler.stop()
+        if detection_thread is not None:
+            detection_thread.join(timeout=DURATION + FRAME_WAIT_TIMEOUT)
+            detection_thread = None
+        if camera_scheduler is not None:
+            camera_scheduler.stop()
+        capture_thread.stop()
+        frame_buffer.close()
+        if display_buffer is not None:
+            display_buffer.close()
+        camera_supervisor.stop()
+        print("[INFO] Cleaning up GPIO...")
+        relay_actuator.stop()  # all OFF, bypassing the toggle interval
+        relay_actuator.cleanup()
+        model.close()
+        resource_governor.stop()
+        set_service_state("stopped")
 
 # -----------------------------
 # API Endpoints
 # -----------------------------
+def scan_drives_relays() -> bool:
+    """True when /detect's own scan switches relays; otherwise a background loop owns them"""
+    return DETECTION_MODE != "continuous" and camera_scheduler is None
+
+def fresh_detection(latest: LatestValue) -> Optional[DetectionResponse]:
+    """
+    A result produced after this call started, without starting a competing
+    scan. None when the background loop published nothing within DURATION.
+    """
+    if latest is latest_detection and scan_drives_relays():
+        return run_scan_shared()
+    return latest.wait_newer(time.time(), timeout=DURATION)
+
 @router.post("/detect", response_model=DetectionResponse)
-def detect_human():
+def detect_human(force: bool = False, camera: Optional[str] = None):
+    """
+    Latest published detection result. force=true waits for a fresh result,
+    joining a scan that is already in flight rather than starting another.
+    In multi-camera mode, ``camera`` picks the camera (default: the first).
+    """
+    if not is_ready():
+        return JSONResponse(
+            content={"error": "Detection service not ready", **readiness()},
+            status_code=503
+        )
+    if camera_scheduler is None and get_camera() is None:
+        return JSONResponse(
+            content={"error": "Camera unavailable", **camera_supervisor.stats()},
+            status_code=503
+        )
+    latest = latest_detection
+    if camera_scheduler is not None:
+        name = camera or camera_scheduler.channels[0].name
+        if name not in camera_feeds:
+            return JSONResponse(content={"error": f"Unknown camera '{name}'"}, status_code=404)
+        latest = camera_feeds[name][1]
     try:
-        return run_detection()
+        snapshot = latest.get()
+        if force or snapshot is None:
+            snapshot = fresh_detection(latest)
+        if snapshot is None:
+            # The loop keeps the relays in line with its hysteresis; leave them alone
+            return JSONResponse(
+                content={"error": "No detection result within the scan budget", "timeout_s": DURATION},
+                status_code=504
+            )
+        return snapshot.model_copy(update={"age_seconds": round(time.time() - snapshot.timestamp, 3)})
     except Exception as e:
         print("[ERROR] Detection failed:", e)
         traceback.print_exc()
-        turn_off_all_relays()
+        if scan_drives_relays():
+            turn_off_all_relays()
         return Response(
             content='{"error": "Internal server error during detection"}',
             media_type="application/json",
             status_code=500
         )
 
+# -----------------------------
+# Preview Broadcaster
+# -----------------------------
+# One encoder shared by all /preview clients; it idles when nobody watches.
+preview_broadcaster = create_preview_broadcaster(ensure_display_running, zone_mapper)
+
 @router.get("/preview")
-def preview():
+def preview(fps: float = Query(PREVIEW_MAX_FPS, gt=0), camera: Optional[str] = None):
+    """MJPEG stream at up to ``fps`` (capped at PREVIEW_MAX_FPS); fps <= 0 is a 422"""
+    if camera_scheduler is not None:
+        broadcaster = camera_previews.get(camera or camera_scheduler.channels[0].name)
+    else:
+        broadcaster = preview_broadcaster
+
     def mjpeg_stream_generator():
-        picam2 = get_camera()
-        if picam2 is None:
+        if broadcaster is None or (camera_scheduler is None and get_camera() is None):
             yield b"--frame\r\nContent-Type: text/plain\r\n\r\nCamera not available\r\n"
             return
         try:
-            while True:
-                frame = picam2.capture_array()
-                bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                h, w, _ = bgr.shape
-                cell_h, cell_w = h // GRID_ROWS, w // GRID_COLS
-                for i in range(1, GRID_ROWS):
-                    cv2.line(bgr, (0, i * cell_h), (w, i * cell_h), (0, 255, 0), 1)
-                for j in range(1, GRID_COLS):
-                    cv2.line(bgr, (j * cell_w, 0), (j * cell_w, h), (0, 255, 0), 1)
-                ret, jpeg = cv2.imencode(".jpg", bgr)
-                if not ret:
-                    continue
-                chunk = jpeg.tobytes()
-                yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + chunk + b'\r\n')
-                time.sleep(0.05)
+            yield from broadcaster.stream(max_fps=fps)
         except Exception as e:
             print("[ERROR] MJPEG stream failed:", e)
 
@@ -227,6 +973,143 @@ def preview():
         media_type="multipart/x-mixed-replace; boundary=frame"
     )
 
+@router.get("/status")
+def pipeline_status():
+    return {
+        "service": readiness(),
+        "capture": {
+            "running": capture_thread.running,
+            "frames_captured": capture_thread.frames_captured,
+            "capture_errors": capture_thread.capture_errors,
+            "frame_pool": frame_buffer.stats(),
+            "display_pool": display_buffer.stats() if display_buffer is not None else None,
+            "streams": {
+                "display": list(CAMERA_SIZE),
+                "detection": list(DETECTION_FRAME_SIZE),
+                "inference_imgsz": model.imgsz,
+            },
+        },
+        "camera": camera_supervisor.stats(),
+        "relays": relay_actuator.stats(),
+        "preview": preview_broadcaster.stats(),
+        "inference": model.stats(),
+        # Multi-camera: each camera's own motion gate, ROI tiler and tracker are under "cameras"
+        **({"motion_gate": None, "roi": None, "tracker": None} if camera_scheduler is not None else {
+            "motion_gate": motion_gate.stats(),
+            "roi": {"enabled": roi_tiler is not None, **(roi_tiler.stats() if roi_tiler is not None else {})},
+            "tracker": {"enabled": tracker is not None, **(tracker.stats() if tracker is not None else {})},
+        }),
+        "mode": DETECTION_MODE,
+        "rate": rate_controller.stats(),
+        "resources": resource_governor.stats(),
+        "zones": zone_hysteresis.stats(),
+        "last_result_age_s": round(time.time() - latest_detection.published_at, 3) if latest_detection.get() else None,
+        "scans": {
+            "run": scan_flight.calls,
+            "joined": scan_flight.joined,
+            "in_flight": scan_flight.in_flight,
+            "early_exit": SCAN_EARLY_EXIT,
+            "early_exits": int(scans_ended_total.value(reason="early_exit")),
+            "full_duration": int(scans_ended_total.value(reason="duration")),
+        },
+        "scheduler": active_scheduler_stats(),
+        "cameras": camera_scheduler.stats() if camera_scheduler is not None else None,
+    }
+
+def active_scheduler() -> Optional[ScanScheduler]:
+    """The scheduler /scheduler/pause and /resume act on (None in multi-camera mode)"""
+    if camera_scheduler is not None:
+        return None
+    return scan_scheduler if DETECTION_MODE == "scan" else continuous_duty_cycle
+
+def active_scheduler_stats() -> Optional[Dict]:
+    scheduler = active_scheduler()
+    if scheduler is None:
+        return None
+    if scheduler is scan_scheduler:
+        return scan_scheduler.stats()
+    return {"duty_cycle": "continuous" if CONTINUOUS_DUTY_CYCLE else "off", **continuous_duty_cycle.stats()}
+
+def scan_scheduler_unavailable() -> Optional[JSONResponse]:
+    if active_scheduler() is None:
+        return JSONResponse(content={"error": "Pausing detection is not supported with multiple cameras"},
+                            status_code=409)
+    return None
+
+@router.post("/scheduler/pause")
+def pause_scan_scheduler():
+    """
+    Stop scheduled scans (scan mode) or frame processing (continuous mode)
+    until /scheduler/resume; relays keep their state. 409 with multiple cameras.
+    """
+    error = scan_scheduler_unavailable()
+    if error is not None:
+        return error
+    active_scheduler().pause()
+    print(f"[INFO] Detection paused ({DETECTION_MODE} mode)")
+    return active_scheduler_stats()
+
+@router.post("/scheduler/resume")
+def resume_scan_scheduler():
+    """Resume after /scheduler/pause, starting with a scan or frame straight away. 409 with multiple cameras."""
+    error = scan_scheduler_unavailable()
+    if error is not None:
+        return error
+    active_scheduler().resume()
+    print(f"[INFO] Detection resumed ({DETECTION_MODE} mode)")
+    return active_scheduler_stats()
+
+@router.get("/events")
+def recent_zone_events(since: float = 0.0, camera: Optional[str] = None):
+    """Tracked entry/exit events, oldest first, optionally newer than ``since`` (epoch seconds)"""
+    events = [e for e in list(zone_events)
+              if e["timestamp"] > since and (camera is None or e["camera"] == camera)]
+    return {"events": events, "count": len(events)}
+
+class ZonePolygon(BaseModel):
+    zone: Tuple[int, int]
+    points: List[Tuple[float, float]]  # fractions of the frame width/height
+
+def zone_mapper_for(camera: Optional[str]) -> Optional[ZoneMapper]:
+    if camera_scheduler is None:
+        return zone_mapper if camera is None else None
+    channel = camera_scheduler.by_name.get(camera or camera_scheduler.channels[0].name)
+    return channel.pipeline.zone_mapper if channel is not None else None
+
+@router.get("/zones")
+def get_zones(camera: Optional[str] = None):
+    """Current zone layout; an empty polygon list means the plain grid"""
+    mapper = zone_mapper_for(camera)
+    if mapper is None:
+        return JSONResponse(content={"error": f"Unknown camera '{camera}'"}, status_code=404)
+    return {"rows": mapper.rows, "cols": mapper.cols, "version": mapper.version,
+            "polygons": mapper.polygon_config()}
+
+@router.put("/zones")
+def set_zones(polygons: List[ZonePolygon], camera: Optional[str] = None):
+    """Replace the zone layout at runtime; compiled lookup tables are rebuilt on the next frame"""
+    mapper = zone_mapper_for(camera)
+    if mapper is None:
+        return JSONResponse(content={"error": f"Unknown camera '{camera}'"}, status_code=404)
+    try:
+        mapper.set_polygons([polygon.model_dump() for polygon in polygons])
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    print(f"[INFO] Zone layout updated ({len(polygons)} polygons), version {mapper.version}")
+    return get_zones(camera)
+
+@router.get("/cameras")
+def camera_status():
+    """Per-camera occupancy and how the shared model's time is being split"""
+    if camera_scheduler is None:
+        return {"multi_camera": False, "cameras": {}}
+    stats = camera_scheduler.stats()
+    for name, (hysteresis, latest) in camera_feeds.items():
+        snapshot = latest.get()
+        stats["cameras"][name]["occupied_zones"] = [list(zone) for zone in sorted(hysteresis.occupied())]
+        stats["cameras"][name]["last_result_age_s"] = round(time.time() - snapshot.timestamp, 3) if snapshot else None
+    return {"multi_camera": True, **stats}
+
 HTML_UI = """
 <!doctype html>
 <html>
@@ -243,7 +1126,3 @@ HTML_UI = """
 def ui():
     return HTMLResponse(content=HTML_UI, status_code=200)
 
-@router.on_event("shutdown")
-def cleanup_gpio():
-    print("[INFO] Cleaning up GPIO...")
-    GPIO.cleanup()
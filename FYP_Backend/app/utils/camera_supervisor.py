@@ -0,0 +1,260 @@
+"""
+Camera lifecycle off the request path: circuit breaker plus watchdog.
+
+Camera initialisation (Picamera2() in particular) is slow and, when the
+camera is missing or wedged, fails slowly too. Callers therefore never
+initialise the camera themselves: CameraSupervisor.get() returns the current
+camera or None straight away, and a background watchdog thread does all
+(re)initialisation behind a circuit breaker, so a broken camera is retried
+with exponential backoff instead of on every call.
+
+The watchdog also checks the frames the capture thread publishes:
+  * stale - no new frame for ``stale_after_s`` while capture is running,
+  * frozen - a sparse sample of the newest frame has stayed within
+    ``frozen_threshold`` (mean absolute difference, in grey levels) of the
+    previous one for ``frozen_checks`` checks in a row and for at least
+    ``frozen_after_s``. A live sensor always adds more noise than that;
+    samples too dark or flat to show noise (``min_contrast``) are never
+    judged frozen, so a dark or static room does not trigger it,
+and restarts the camera in the background when either happens. A stale
+camera counts as a failure on the circuit breaker; a frozen one is simply
+restarted, since it was delivering frames.
+"""
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from app.utils.frame_buffer import FrameRingBuffer
+from app.utils.hardware import CameraSource
+
+
+class CircuitBreaker:
+    """
+    closed: calls allowed. After a failure it opens for a backoff that
+    doubles (``multiplier``) with each consecutive failure up to
+    ``max_backoff``; once that has passed, one trial call is allowed
+    (half_open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, base_backoff: float = 1.0, max_backoff: float = 60.0, multiplier: float = 2.0):
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0  # consecutive
+        self.retry_at = 0.0
+        self.last_error: Optional[str] = None
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and now >= self.retry_at:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self, error: str, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            backoff = min(self.max_backoff, self.base_backoff * self.multiplier ** (self.failures - 1))
+            self.retry_at = now + backoff
+            self.state = "open"
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "retry_in_s": round(max(0.0, self.retry_at - time.monotonic()), 2) if self.state == "open" else 0.0,
+                "last_error": self.last_error,
+            }
+
+
+class CameraSupervisor:
+    def __init__(self, factory: Callable[[], CameraSource], buffer: FrameRingBuffer,
+                 capture_active: Callable[[], bool], name: str = "camera",
+                 stale_after_s: float = 5.0, frozen_after_s: float = 10.0,
+                 frozen_threshold: float = 0.1, frozen_checks: int = 5, min_contrast: float = 2.0,
+                 check_interval: float = 0.5, breaker: Optional[CircuitBreaker] = None):
+        self.factory = factory  # builds (or returns) an unstarted CameraSource
+        self.buffer = buffer
+        self.capture_active = capture_active
+        self.name = name
+        self.stale_after_s = stale_after_s
+        self.frozen_after_s = frozen_after_s  # 0 disables the frozen-frame check
+        self.frozen_threshold = frozen_threshold
+        self.frozen_checks = frozen_checks
+        self.min_contrast = min_contrast
+        self.check_interval = check_interval
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+
+        self._lock = threading.Lock()
+        self._camera: Optional[CameraSource] = None
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Frame health
+        self._last_seq = 0
+        self._last_progress = 0.0
+        self._sample: Optional[np.ndarray] = None
+        self._last_change = 0.0
+        self._unchanged = 0  # consecutive checks within frozen_threshold
+        self.last_frame_delta: Optional[float] = None
+
+        self.init_attempts = 0
+        self.init_failures = 0
+        self.reinits: Dict[str, int] = {"stale": 0, "frozen": 0}
+
+    # -----------------------------
+    # Callers
+    # -----------------------------
+    @property
+    def camera(self) -> Optional[CameraSource]:
+        return self._camera
+
+    def get(self) -> Optional[CameraSource]:
+        """The running camera, or None at once if it is (re)initialising or broken"""
+        camera = self._camera
+        if camera is None:
+            self._wake.set()
+        return camera
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the watchdog; the camera is initialised in the background"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the watchdog and the camera"""
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        self._release("stopped")
+
+    def _release(self, reason: str):
+        with self._lock:
+            camera, self._camera = self._camera, None
+        if camera is not None:
+            try:
+                camera.stop()
+            except Exception as e:
+                print(f"[ERROR] Camera '{self.name}' stop failed ({reason}):", e)
+
+    # -----------------------------
+    # Watchdog
+    # -----------------------------
+    def _initialise(self):
+        self.init_attempts += 1
+        try:
+            camera = self.factory()
+            camera.start()
+        except Exception as e:
+            self.init_failures += 1
+            self.breaker.record_failure(str(e))
+            print(f"[ERROR] Camera '{self.name}' init failed (retry in "
+                  f"{self.breaker.stats()['retry_in_s']}s):", e)
+            return
+        now = time.monotonic()
+        # The last sample is kept: a camera that comes back frozen is not "fresh"
+        self._last_seq, self._last_progress = self.buffer.seq, now
+        self._last_change, self._unchanged = now, 0
+        with self._lock:
+            self._camera = camera
+        print(f"[INFO] Camera '{self.name}' source: {camera.name}")
+
+    def _frame_sample(self) -> Optional[np.ndarray]:
+        ref = self.buffer.acquire(timeout=0)
+        if ref is None:
+            return None
+        with ref:
+            return ref.frame[::16, ::16].astype(np.int16)  # ~1200 scattered pixels
+
+    def _changed(self, sample: np.ndarray) -> bool:
+        """Whether ``sample`` differs from the previous one by more than noise tolerance"""
+        previous, self._sample = self._sample, sample
+        if previous is None or previous.shape != sample.shape:
+            return True
+        self.last_frame_delta = float(np.mean(np.abs(sample - previous)))
+        if self.last_frame_delta > self.frozen_threshold or float(sample.std()) < self.min_contrast:
+            self._unchanged = 0
+            return True  # moving, or too dark / flat to tell a frozen sensor from a still room
+        self._unchanged += 1
+        return self._unchanged < self.frozen_checks
+
+    def _check_health(self, now: float) -> Optional[str]:
+        """'stale' / 'frozen' if the camera needs restarting, else None"""
+        seq = self.buffer.seq
+        if seq != self._last_seq:
+            self._last_seq, self._last_progress = seq, now
+            fresh = True
+            if self.frozen_after_s:
+                sample = self._frame_sample()
+                if sample is not None:
+                    fresh = self._changed(sample)
+                    if fresh:
+                        self._last_change = now
+            if fresh and self.breaker.state != "closed":
+                self.breaker.record_success()  # real frames are flowing again
+        if not self.capture_active():
+            self._last_progress = self._last_change = now  # nobody is capturing: nothing to judge
+            return None
+        if now - self._last_progress > self.stale_after_s:
+            return "stale"
+        if self.frozen_after_s and now - self._last_change > self.frozen_after_s:
+            return "frozen"
+        return None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if self._camera is None:
+                if self.breaker.allow():
+                    self._initialise()
+            else:
+                problem = self._check_health(time.monotonic())
+                if problem is not None:
+                    self.reinits[problem] += 1
+                    if problem == "stale":
+                        self.breaker.record_failure(f"{problem} frames")
+                    print(f"[ERROR] Camera '{self.name}' {problem}; restarting it in the background")
+                    self._release(problem)
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+
+    def stats(self) -> Dict:
+        camera = self._camera
+        return {
+            "available": camera is not None,
+            "source": camera.name if camera is not None else None,
+            "watchdog_running": self.running,
+            "breaker": self.breaker.stats(),
+            "init_attempts": self.init_attempts,
+            "init_failures": self.init_failures,
+            "reinits": dict(self.reinits),
+            "frame_delta": round(self.last_frame_delta, 3) if self.last_frame_delta is not None else None,
+            "last_frame_age_s": round(time.monotonic() - self._last_progress, 2) if camera is not None else None,
+        }
@@ -0,0 +1,149 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+from app.utils.hardware import RelayDriver
+from app.utils.inference_backends import InferenceBackend
+from app.utils.motion_gate import MotionGate
+from app.utils.rate_controller import AdaptiveRateController
+from app.utils.relay_actuator import RelayActuator
+from app.utils.roi_tiling import RoiTiler
+from app.utils.tracker import IoUTracker, TrackEvent
+from app.utils.zone_mapping import ZoneMapper
+
+# Stage names reported to the on_stage hook
+STAGES = ("capture", "preprocess", "inference", "grid_mapping", "relay_write")
+
+
+class FrameResult(NamedTuple):
+    has_humans: bool
+    counts: np.ndarray  # flat per-zone people count
+    reused: bool  # True when the motion gate reused the previous result
+    events: Tuple[TrackEvent, ...] = ()  # zone entry/exit events (tracker only)
+
+
+class DetectionPipeline:
+    """
+    The per-frame detection path shared by the API loops and the offline
+    benchmark: motion gate -> inference -> zone mapping -> relay write.
+    With a RoiTiler, inference runs on crops of the zones that need
+    re-checking instead of the full frame whenever that is cheaper. With an
+    IoUTracker, zone counts come from tracked people rather than the raw
+    detections of the last frame, so a missed detection doesn't flicker.
+
+    ``on_stage(name, seconds)`` is called after every timed stage so callers
+    can collect latency statistics without touching the hot path.
+    """
+
+    def __init__(self, backend: InferenceBackend, zone_mapper: ZoneMapper,
+                 relay_driver: Union[RelayDriver, RelayActuator], relay_pins: Sequence[int],
+                 motion_gate: Optional[MotionGate] = None,
+                 rate_controller: Optional[AdaptiveRateController] = None,
+                 on_stage: Optional[Callable[[str, float], None]] = None,
+                 roi_tiler: Optional[RoiTiler] = None,
+                 tracker: Optional[IoUTracker] = None):
+        self.backend = backend
+        self.zone_mapper = zone_mapper
+        self.relay_driver = relay_driver
+        self.relay_pins = list(relay_pins)
+        self.motion_gate = motion_gate
+        self.rate_controller = rate_controller
+        self.on_stage = on_stage
+        self.roi_tiler = roi_tiler
+        self.tracker = tracker
+        self._zones_version = zone_mapper.version
+
+    def observe(self, stage: str, seconds: float):
+        if self.on_stage is not None:
+            self.on_stage(stage, seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def process_frame(self, frame: np.ndarray) -> FrameResult:
+        """Motion gate + inference + zone mapping for one frame"""
+        if self.zone_mapper.version != self._zones_version:
+            # Zone layout changed: cached counts belong to the old zones
+            self._zones_version = self.zone_mapper.version
+            if self.motion_gate is not None:
+                self.motion_gate.reset()
+        if self.motion_gate is not None:
+            with self.stage("preprocess"):
+                run_inference, cached = self.motion_gate.check(frame)
+            if not run_inference:
+                # Scene is static: reuse the last occupancy result
+                has_humans, counts = cached
+                if self.tracker is not None:
+                    self.tracker.hold(time.time())
+                return FrameResult(has_humans, counts, True)
+
+        zones = None
+        if self.roi_tiler is not None:
+            with self.stage("preprocess"):
+                zones = self.roi_tiler.plan(frame)
+            if zones is not None and not len(zones):
+                # Nothing moved and nothing is due: keep the last counts
+                counts = self.roi_tiler.last_counts()
+                if self.tracker is not None:
+                    self.tracker.hold(time.time())
+                return FrameResult(bool(counts.any()), counts, True)
+
+        started = time.perf_counter()
+        if zones is not None:
+            counts, xyxy = self.roi_tiler.detect(self.backend, frame, zones)
+        else:
+            xyxy = self.backend.predict(frame).xyxy
+        inference_time = time.perf_counter() - started
+        self.observe("inference", inference_time)
+        if self.rate_controller is not None:
+            self.rate_controller.record_inference(inference_time)
+
+        events = ()
+        with self.stage("grid_mapping"):
+            if self.tracker is not None:
+                now = time.time()
+                events = tuple(self.tracker.update(xyxy, now, frame.shape, observed_zones=zones))
+                counts = self.tracker.counts(now, frame.shape)
+            elif zones is None:
+                counts = self.zone_mapper.counts(xyxy, frame.shape)
+        has_humans = bool(counts.any()) if zones is not None or self.tracker is not None else len(xyxy) > 0
+        if self.roi_tiler is not None:
+            self.roi_tiler.commit(counts, zones, inference_time)
+        if self.motion_gate is not None:
+            self.motion_gate.store((has_humans, counts), inference_time)
+        return FrameResult(has_humans, counts, False, events)
+
+    def apply_relays(self, occupied_grids: Set[Tuple[int, int]], logs: List[str]) -> Dict[int, str]:
+        """
+        Drive each relay from whether any occupied zone is in its column and
+        return the states the relays are actually at. Only changed pins are
+        written. Through a RelayActuator the write happens on the actuator
+        thread, which times it; a pin still inside its toggle interval is
+        reported at its current state until the actuator switches it.
+        """
+        active_columns = {col for (_, col) in occupied_grids}
+        desired = {pin: i in active_columns for i, pin in enumerate(self.relay_pins)}
+        if isinstance(self.relay_driver, RelayActuator):
+            self.relay_driver.apply(desired)
+            self.relay_driver.flush()
+        else:
+            with self.stage("relay_write"):
+                self.relay_driver.apply(desired)
+        pin_status = self.relay_status()
+        for pin, on in desired.items():
+            state = "ON" if on else "OFF"
+            held = f" (held at {pin_status[pin]}, toggle interval)" if pin_status[pin] != state else ""
+            logs.append(f"[RELAY] GPIO {pin} -> {state}{held}")
+        return pin_status
+
+    def relay_status(self) -> Dict[int, str]:
+        """Current state of this pipeline's relays, as the driver last wrote them"""
+        states = self.relay_driver.states
+        return {pin: "ON" if states.get(pin) else "OFF" for pin in self.relay_pins}
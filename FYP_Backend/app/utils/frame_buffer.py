@@ -0,0 +1,324 @@
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Shared-memory blocks backing frame pools in this process: name -> (base address, size).
+# Lets a consumer in another process be handed a frame by reference (see shared_location).
+_SHARED_BLOCKS: Dict[str, Tuple[int, int]] = {}
+
+
+def shared_location(array: np.ndarray) -> Optional[Tuple[str, int, Tuple[int, ...]]]:
+    """(block name, byte offset, strides) if ``array`` lives in a shared frame pool, else None"""
+    address = array.__array_interface__["data"][0]
+    extent = sum((n - 1) * stride for n, stride in zip(array.shape, array.strides)) + array.itemsize
+    for name, (base, size) in list(_SHARED_BLOCKS.items()):
+        if base <= address and address + extent <= base + size:
+            return name, address - base, array.strides
+    return None
+
+
+def shared_block_names() -> List[str]:
+    """Names of the shared-memory blocks currently backing a frame pool (retired ones excluded)"""
+    return list(_SHARED_BLOCKS)
+
+
+class FrameRef:
+    """
+    A frame slot held by a reader. The capture thread will not reuse the slot
+    until release() is called, so ``frame`` can be used without copying.
+    """
+
+    __slots__ = ("seq", "frame", "timestamp", "_buffer", "_index", "_generation")
+
+    def __init__(self, buffer: "FrameRingBuffer", index: int, seq: int, frame: np.ndarray, timestamp: float,
+                 generation: int = 0):
+        self._buffer = buffer
+        self._index = index
+        self._generation = generation  # the pool allocation the slot index refers to
+        self.seq = seq
+        self.frame = frame
+        self.timestamp = timestamp
+
+    def release(self):
+        if self._buffer is not None:
+            self._buffer._release(self._index, self._generation)
+            self._buffer = None
+            self.frame = None
+
+    def __enter__(self) -> "FrameRef":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class FrameRingBuffer:
+    """
+    Fixed pool of preallocated frame slots shared between one writer (the
+    capture thread) and any number of readers (detection, preview, ...).
+
+    Slots are reference counted: readers acquire() the newest frame and use
+    it in place, and the writer only fills slots that nobody holds and that
+    are not the newest frame. If every slot is held, the frame is dropped
+    instead of allocating. Slots are allocated on the first write so the
+    pool adapts to whatever resolution the camera is configured for. With
+    ``shared=True`` they live in a SharedMemory block that a worker process
+    can read directly.
+    """
+
+    def __init__(self, slots: int = 4, shared: bool = False):
+        if slots < 3:
+            raise ValueError("FrameRingBuffer needs at least 3 slots")
+        self._slots = slots
+        self.shared = shared
+        self._frames: Optional[np.ndarray] = None
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._retired: List[shared_memory.SharedMemory] = []
+        self._timestamps = [0.0] * slots
+        self._slot_seq = [0] * slots
+        self._refs = [0] * slots
+        self._generation = 0  # bumped on every (re)allocation; refs into older pools are ignored
+        self._writing = -1
+        self._latest = -1
+        self._seq = 0  # sequence number of the newest frame, 0 = empty
+        self._cond = threading.Condition()
+        self.allocations = 0
+        self.frames_dropped = 0
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the newest frame (0 while empty)"""
+        return self._seq
+
+    @property
+    def frame_shape(self) -> Optional[Tuple[int, ...]]:
+        return self._frames.shape[1:] if self._frames is not None else None
+
+    # -----------------------------
+    # Writer
+    # -----------------------------
+    def _allocate_locked(self, shape: Tuple[int, ...], dtype: np.dtype):
+        if self._shm is not None:
+            # Readers may still hold views into the old block; free it on close()
+            _SHARED_BLOCKS.pop(self._shm.name, None)
+            self._retired.append(self._shm)
+            self._shm = None
+        full_shape = (self._slots,) + tuple(shape)
+        if self.shared:
+            nbytes = int(np.prod(full_shape)) * np.dtype(dtype).itemsize
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._frames = np.ndarray(full_shape, dtype=dtype, buffer=self._shm.buf)
+            _SHARED_BLOCKS[self._shm.name] = (self._frames.__array_interface__["data"][0], nbytes)
+        else:
+            self._frames = np.empty(full_shape, dtype=dtype)
+        self._refs = [0] * self._slots
+        self._slot_seq = [0] * self._slots
+        self._latest = -1
+        self._generation += 1
+        self.allocations += 1
+
+    def begin_write(self, shape: Tuple[int, ...], dtype=np.uint8) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Reserve a free slot for the next frame -> (index, writable view), or
+        None when every slot is held by a reader (the frame is dropped).
+        """
+        with self._cond:
+            if self._frames is None or self._frames.shape[1:] != tuple(shape) or self._frames.dtype != dtype:
+                self._allocate_locked(shape, dtype)
+            free = [i for i in range(self._slots) if self._refs[i] == 0 and i != self._latest]
+            if not free:
+                self.frames_dropped += 1
+                return None
+            index = min(free, key=lambda i: self._slot_seq[i])
+            self._writing = index
+            self._refs[index] = 1  # the writer's own hold
+            return index, self._frames[index]
+
+    def commit_write(self, index: int) -> int:
+        """Publish a slot filled after begin_write() and wake up waiting readers"""
+        with self._cond:
+            self._refs[index] = 0
+            self._writing = -1
+            self._seq += 1
+            self._slot_seq[index] = self._seq
+            self._timestamps[index] = time.time()
+            self._latest = index
+            self._cond.notify_all()
+            return self._seq
+
+    def abort_write(self, index: int):
+        with self._cond:
+            self._refs[index] = 0
+            self._writing = -1
+
+    def write(self, frame: np.ndarray) -> int:
+        """Copy a frame into a free slot; returns its seq, or 0 if it was dropped"""
+        slot = self.begin_write(frame.shape, frame.dtype)
+        if slot is None:
+            return 0
+        index, target = slot
+        np.copyto(target, frame)
+        return self.commit_write(index)
+
+    # -----------------------------
+    # Readers
+    # -----------------------------
+    def acquire(self, min_seq: int = 0, timeout: float = 1.0) -> Optional[FrameRef]:
+        """
+        Hold the newest frame once its seq is >= min_seq (None on timeout).
+        The frame is used in place; release the ref as soon as you are done.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq >= min_seq and self._latest >= 0, timeout=timeout)
+            if self._seq < min_seq or self._latest < 0:
+                return None
+            index = self._latest
+            self._refs[index] += 1
+            return FrameRef(self, index, self._slot_seq[index], self._frames[index], self._timestamps[index],
+                            self._generation)
+
+    def _release(self, index: int, generation: int):
+        with self._cond:
+            if generation != self._generation:
+                return  # the slot belonged to a pool that has since been replaced
+            self._refs[index] = max(0, self._refs[index] - 1)
+
+    def close(self):
+        """Free the slots (and any shared memory); the pool reallocates on the next write"""
+        with self._cond:
+            blocks = self._retired + ([self._shm] if self._shm is not None else [])
+            self._frames = None
+            self._shm = None
+            self._retired = []
+            self._latest = -1
+        for shm in blocks:
+            _SHARED_BLOCKS.pop(shm.name, None)
+            try:
+                shm.close()
+            except BufferError:
+                pass  # a reader still has a view; the mapping goes when it does
+            shm.unlink()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "slots": self._slots,
+                "shared_memory": self.shared,
+                "held": sum(1 for refs in self._refs if refs > 0),
+                "allocations": self.allocations,
+                "frames_dropped": self.frames_dropped,
+            }
+
+
+class CaptureThread:
+    """
+    Background thread that drives the camera at its native rate and
+    publishes every frame into a FrameRingBuffer. It is the only code
+    that calls the camera, so consumers never compete for it. Once the
+    frame size is known, frames are captured straight into a free slot.
+
+    With a ``display_buffer`` and a camera that has a detection stream
+    (``lores_size``), each capture fills a slot in both: the lores frame in
+    ``buffer`` for detection, the full-size frame in ``display_buffer``.
+    """
+
+    def __init__(self, camera_factory: Callable[[], object], buffer: FrameRingBuffer,
+                 error_backoff: float = 1.0,
+                 on_capture: Optional[Callable[[float], None]] = None,
+                 display_buffer: Optional[FrameRingBuffer] = None):
+        self.buffer = buffer
+        self.display_buffer = display_buffer
+        self.on_capture = on_capture  # called with the seconds each capture + publish took
+        self._camera_factory = camera_factory
+        self._error_backoff = error_backoff
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.frames_captured = 0
+        self.capture_errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the capture thread if it is not already running"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="camera-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Ask the capture thread to exit and wait for it"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def capture_once(self, camera) -> bool:
+        """Capture one frame into the buffer; False if it was dropped"""
+        if self.display_buffer is not None and getattr(camera, "lores_size", None):
+            return self._capture_streams(camera)
+        shape = self.buffer.frame_shape
+        capture_into = getattr(camera, "capture_into", None)
+        if shape is None or capture_into is None:
+            return self.buffer.write(camera.capture_array()) > 0
+        slot = self.buffer.begin_write(shape)
+        if slot is None:
+            getattr(camera, "skip_frame", camera.capture_array)()  # keep the camera's queue moving
+            return False
+        index, target = slot
+        try:
+            capture_into(target)
+        except ValueError:
+            # Camera changed resolution: reallocate through a plain write
+            self.buffer.abort_write(index)
+            return self.buffer.write(camera.capture_array()) > 0
+        except Exception:
+            self.buffer.abort_write(index)
+            raise
+        self.buffer.commit_write(index)
+        return True
+
+    def _capture_streams(self, camera) -> bool:
+        (width, height), (lores_width, lores_height) = camera.size, camera.lores_size
+        display = self.display_buffer.begin_write((height, width, 3))
+        detect = self.buffer.begin_write((lores_height, lores_width, 3)) if display is not None else None
+        if detect is None:
+            if display is not None:
+                self.display_buffer.abort_write(display[0])
+            getattr(camera, "skip_frame", camera.capture_array)()  # keep the camera's queue moving
+            return False
+        try:
+            camera.capture_streams_into(display[1], detect[1])
+        except Exception:
+            self.display_buffer.abort_write(display[0])
+            self.buffer.abort_write(detect[0])
+            raise
+        self.display_buffer.commit_write(display[0])
+        self.buffer.commit_write(detect[0])
+        return True
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            camera = self._camera_factory()
+            if camera is None:
+                self._stop_event.wait(self._error_backoff)
+                continue
+            started = time.perf_counter()
+            try:
+                captured = self.capture_once(camera)
+            except Exception as e:
+                self.capture_errors += 1
+                self.last_error = str(e)
+                print("[ERROR] Frame capture failed:", e)
+                self._stop_event.wait(self._error_backoff)
+                continue
+            if captured:
+                self.frames_captured += 1
+            if self.on_capture is not None:
+                self.on_capture(time.perf_counter() - started)
@@ -0,0 +1,422 @@
+"""
+Camera and relay hardware abstraction for smart detection.
+
+On the Pi the real Picamera2 / RPi.GPIO implementations are used. Anywhere
+else (CI, x86 benchmarking boxes) a video file, a directory of images or a
+synthetic scene can stand in for the camera, and an in-memory relay bank
+records every write so the full detection-to-relay path can be exercised.
+
+Sources are chosen with a spec string:
+    camera: "auto" | "picamera" | "synthetic" | "file:<video or image dir>"
+    relays: "auto" | "gpio" | "memory"
+"auto" always means the real hardware on a Raspberry Pi, so a missing
+picamera2 / RPi.GPIO there fails loudly instead of quietly running on
+mocks. Elsewhere it falls back to the mocks with a warning.
+
+A camera can also deliver a second, low-resolution stream (``lores_size``)
+for detection alongside the full-size one for display. Picamera2 produces
+it in hardware (its "lores" stream); the mock sources downscale the main
+frame, so the rest of the pipeline sees the same two streams everywhere.
+"""
+import glob
+import importlib.util
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+PI_MODEL_PATH = "/proc/device-tree/model"
+
+
+def is_raspberry_pi() -> bool:
+    try:
+        with open(PI_MODEL_PATH, "rb") as f:
+            return b"Raspberry Pi" in f.read()
+    except OSError:
+        return False
+
+
+def parse_size(spec: str) -> Optional[Tuple[int, int]]:
+    """ "640x480" -> (640, 480); empty spec = None """
+    spec = (spec or "").strip().lower()
+    if not spec:
+        return None
+    width, height = (int(part) for part in spec.split("x"))
+    return width, height
+
+
+def downscale_into(frame: np.ndarray, out: np.ndarray):
+    """Resize ``frame`` into the preallocated ``out`` (stands in for the ISP's lores scaler)"""
+    # INTER_AREA looks marginally better but costs ~9x more at 4x downscaling
+    cv2.resize(frame, (out.shape[1], out.shape[0]), dst=out, interpolation=cv2.INTER_LINEAR)
+
+
+# -----------------------------
+# Camera Sources
+# -----------------------------
+class CameraSource:
+    """
+    Produces HxWx3 uint8 frames in B, G, R order (what Picamera2's RGB888
+    format holds in memory, and what OpenCV and ultralytics expect);
+    capture_array() blocks until the next one
+    """
+
+    name = "base"
+
+    def __init__(self, size: Tuple[int, int] = (640, 480), lores_size: Optional[Tuple[int, int]] = None):
+        if lores_size is not None and (lores_size[0] > size[0] or lores_size[1] > size[1]):
+            raise ValueError(f"Detection stream {lores_size} is larger than the camera stream {size}")
+        self.size = size  # (width, height)
+        self.lores_size = lores_size  # (width, height) of the detection stream; None = single stream
+
+    def start(self):
+        pass
+
+    def capture_array(self) -> np.ndarray:
+        raise NotImplementedError
+
+    def capture_into(self, out: np.ndarray):
+        """Capture the next frame into a preallocated array (ValueError on a size mismatch)"""
+        np.copyto(out, self.capture_array())
+
+    def capture_streams_into(self, main_out: np.ndarray, lores_out: np.ndarray):
+        """Capture one frame as both streams: full size into main_out, lores into lores_out"""
+        self.capture_into(main_out)
+        downscale_into(main_out, lores_out)
+
+    def skip_frame(self):
+        """Consume a frame nobody has room for, so the camera's queue keeps moving"""
+        self.capture_array()
+
+    def stop(self):
+        pass
+
+
+class PiCameraSource(CameraSource):
+    """
+    Frames are copied straight from the capture request's buffer into the
+    caller's slot through a MappedArray, so the capture path allocates no
+    per-frame array (capture_array() / make_array() each allocate a copy).
+    """
+
+    name = "picamera"
+
+    def __init__(self, size: Tuple[int, int] = (640, 480), lores_size: Optional[Tuple[int, int]] = None,
+                 camera_num: int = 0):
+        super().__init__(size, lores_size)
+        self.camera_num = camera_num  # which CSI camera, for boards with more than one
+
+    def start(self):
+        from picamera2 import MappedArray, Picamera2
+        self._mapped_array = MappedArray
+        self.camera = Picamera2(self.camera_num)
+        if self.lores_size is not None:
+            if self.lores_size[0] % 64:
+                # Otherwise YUV420 rows are padded and the planes can't be read as one array
+                raise ValueError(f"Detection stream width {self.lores_size[0]} must be a multiple of 64")
+            # The ISP scales the lores stream; it is YUV420 on every Pi model
+            self.camera.configure(self.camera.create_preview_configuration(
+                main={"size": self.size, "format": "RGB888"},
+                lores={"size": self.lores_size, "format": "YUV420"},
+            ))
+        else:
+            self.camera.preview_configuration.main.size = self.size
+            self.camera.preview_configuration.main.format = "RGB888"
+            self.camera.configure("preview")
+        self.camera.start()
+
+    def capture_array(self) -> np.ndarray:
+        return self.camera.capture_array()
+
+    def _copy_main(self, request, out: np.ndarray):
+        with self._mapped_array(request, "main") as mapped:
+            frame = mapped.array
+            if frame.shape[0] != out.shape[0] or frame.shape[1] < out.shape[1]:
+                raise ValueError(f"Frame buffer shape {out.shape} != camera shape {frame.shape}")
+            # Rows can be padded to the ISP's stride; copy only the visible width
+            np.copyto(out, frame[:, :out.shape[1], :3])
+
+    def capture_into(self, out: np.ndarray):
+        request = self.camera.capture_request()
+        try:
+            self._copy_main(request, out)
+        finally:
+            request.release()
+
+    def capture_streams_into(self, main_out: np.ndarray, lores_out: np.ndarray):
+        request = self.camera.capture_request()  # both streams of the same sensor frame
+        try:
+            self._copy_main(request, main_out)
+            with self._mapped_array(request, "lores") as mapped:
+                # RGB888 main frames are B, G, R in memory; give lores the same order
+                cv2.cvtColor(mapped.array, cv2.COLOR_YUV420p2BGR, dst=lores_out)
+        finally:
+            request.release()
+
+    def skip_frame(self):
+        self.camera.capture_request().release()
+
+    def stop(self):
+        self.camera.stop()
+        self.camera.close()
+
+
+class _PacedSource(CameraSource):
+    """Sleeps between frames so mock sources behave like a camera running at ``fps``"""
+
+    def __init__(self, size: Tuple[int, int] = (640, 480), fps: Optional[float] = 30.0,
+                 lores_size: Optional[Tuple[int, int]] = None):
+        super().__init__(size, lores_size)
+        self.fps = fps
+        self._next_due = 0.0
+
+    def _pace(self):
+        if not self.fps:
+            return
+        now = time.monotonic()
+        if now < self._next_due:
+            time.sleep(self._next_due - now)
+        self._next_due = max(now, self._next_due) + 1.0 / self.fps
+
+
+class SyntheticCameraSource(_PacedSource):
+    """
+    Deterministic scene of person-sized blobs walking around a textured
+    background. Useful for load testing; a real detector will mostly see
+    nobody in it, so pair it with recorded footage for accuracy work.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, size: Tuple[int, int] = (640, 480), fps: Optional[float] = 30.0,
+                 people: int = 3, seed: int = 0, lores_size: Optional[Tuple[int, int]] = None):
+        super().__init__(size, fps, lores_size)
+        width, height = size
+        rng = np.random.default_rng(seed)
+        self._background = cv2.GaussianBlur(rng.integers(60, 200, (height, width, 3), dtype=np.uint8), (21, 21), 0)
+        self._positions = rng.uniform([0, 0], [width, height], (people, 2))
+        self._velocities = rng.uniform(-4, 4, (people, 2))
+        self._colors = rng.integers(0, 255, (people, 3))
+
+    def capture_array(self) -> np.ndarray:
+        frame = np.empty_like(self._background)
+        self.capture_into(frame)
+        return frame
+
+    def capture_into(self, out: np.ndarray):
+        if out.shape != self._background.shape:
+            raise ValueError(f"Frame buffer shape {out.shape} != camera shape {self._background.shape}")
+        self._pace()
+        width, height = self.size
+        self._positions += self._velocities
+        for axis, limit in ((0, width), (1, height)):
+            outside = (self._positions[:, axis] < 0) | (self._positions[:, axis] > limit)
+            self._velocities[outside, axis] *= -1
+        np.clip(self._positions, 0, [width, height], out=self._positions)
+
+        # Drawn straight into the caller's buffer: no per-frame allocation
+        np.copyto(out, self._background)
+        for (x, y), color in zip(self._positions.astype(int), self._colors):
+            cv2.rectangle(out, (x - 20, y - 60), (x + 20, y + 60), color.tolist(), -1)
+            cv2.circle(out, (x, y - 75), 15, color.tolist(), -1)
+
+
+class FileCameraSource(_PacedSource):
+    """Replays a video file or a directory of images in a loop, as decoded (BGR, like the Pi camera)"""
+
+    name = "file"
+
+    def __init__(self, path: str, size: Optional[Tuple[int, int]] = None,
+                 fps: Optional[float] = 30.0, loop: bool = True, lores_size: Optional[Tuple[int, int]] = None):
+        super().__init__(size or (640, 480), fps, lores_size)
+        self.path = path
+        self.loop = loop
+        self._resize = size is not None
+        self._capture = None
+        self._images: List[str] = []
+        self._index = 0
+
+    def start(self):
+        if os.path.isdir(self.path):
+            self._images = sorted(p for p in glob.glob(os.path.join(self.path, "*"))
+                                  if p.lower().endswith(IMAGE_EXTENSIONS))
+            if not self._images:
+                raise FileNotFoundError(f"No images found in {self.path}")
+        else:
+            self._capture = cv2.VideoCapture(self.path)
+            if not self._capture.isOpened():
+                raise FileNotFoundError(f"Cannot open video {self.path}")
+
+    def _read_bgr(self) -> Optional[np.ndarray]:
+        if self._images:
+            if self._index >= len(self._images):
+                if not self.loop:
+                    return None
+                self._index = 0
+            frame = cv2.imread(self._images[self._index])
+            self._index += 1
+            return frame
+        ok, frame = self._capture.read()
+        if not ok and self.loop:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._capture.read()
+        return frame if ok else None
+
+    def _next_bgr(self) -> np.ndarray:
+        self._pace()
+        frame = self._read_bgr()
+        if frame is None:
+            raise EOFError(f"End of {self.path}")
+        if self._resize and (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return frame
+
+    def capture_array(self) -> np.ndarray:
+        return self._next_bgr()
+
+    def capture_into(self, out: np.ndarray):
+        frame = self._next_bgr()
+        if out.shape != frame.shape:
+            raise ValueError(f"Frame buffer shape {out.shape} != frame shape {frame.shape}")
+        np.copyto(out, frame)
+
+    def stop(self):
+        if self._capture is not None:
+            self._capture.release()
+
+
+def resolve_camera_spec(spec: str = "auto") -> str:
+    """The camera an "auto" spec stands for on this machine"""
+    if spec != "auto":
+        return spec
+    if is_raspberry_pi() or importlib.util.find_spec("picamera2"):
+        return "picamera"
+    print("[WARNING] CAMERA_SOURCE=auto: not a Raspberry Pi and picamera2 is not installed, using the synthetic camera")
+    return "synthetic"
+
+
+def create_camera_source(spec: str = "auto", size: Tuple[int, int] = (640, 480),
+                         fps: Optional[float] = 30.0, lores_size: Optional[Tuple[int, int]] = None,
+                         camera_num: int = 0) -> CameraSource:
+    """Build (but do not start) a camera source from a spec string; camera_num picks the Pi camera"""
+    spec = resolve_camera_spec(spec)
+    if spec == "picamera":
+        return PiCameraSource(size, lores_size, camera_num=camera_num)
+    if spec == "synthetic":
+        return SyntheticCameraSource(size, fps, lores_size=lores_size)
+    if spec.startswith("file:"):
+        return FileCameraSource(spec[len("file:"):], size, fps, lores_size=lores_size)
+    raise ValueError(f"Unknown camera source '{spec}'")
+
+
+# -----------------------------
+# Relay Drivers
+# -----------------------------
+class RelayDriver:
+    """A bank of on/off relays addressed by BCM pin number"""
+
+    name = "base"
+
+    def __init__(self):
+        self.states: Dict[int, bool] = {}
+        self.writes = 0
+
+    def setup(self, pins: Sequence[int]):
+        for pin in pins:
+            self._setup_pin(pin)
+            self.set(pin, False)
+
+    def set(self, pin: int, on: bool):
+        self._write(pin, on)
+        self.states[pin] = on
+        self.writes += 1
+
+    def apply(self, states: Dict[int, bool]) -> int:
+        """Write only the pins whose state differs; returns how many were written"""
+        written = 0
+        for pin, on in states.items():
+            if self.states.get(pin) != on:
+                self.set(pin, on)
+                written += 1
+        return written
+
+    def all_off(self):
+        for pin in list(self.states):
+            self.set(pin, False)
+
+    def cleanup(self):
+        pass
+
+    def _setup_pin(self, pin: int):
+        pass
+
+    def _write(self, pin: int, on: bool):
+        raise NotImplementedError
+
+
+class GPIORelayDriver(RelayDriver):
+    """RPi.GPIO relay board; the relays are active LOW"""
+
+    name = "gpio"
+
+    def __init__(self):
+        super().__init__()
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+
+    def setup(self, pins: Sequence[int]):
+        self.GPIO.setmode(self.GPIO.BCM)
+        super().setup(pins)
+
+    def _setup_pin(self, pin: int):
+        self.GPIO.setup(pin, self.GPIO.OUT)
+
+    def _write(self, pin: int, on: bool):
+        self.GPIO.output(pin, self.GPIO.LOW if on else self.GPIO.HIGH)
+
+    def cleanup(self):
+        self.GPIO.cleanup()
+
+
+class InMemoryRelayDriver(RelayDriver):
+    """Records every write as (timestamp, pin, on) for tests and benchmarks"""
+
+    name = "memory"
+
+    def __init__(self, max_history: int = 10000):
+        super().__init__()
+        self.max_history = max_history
+        self.history: List[Tuple[float, int, bool]] = []
+        self._lock = threading.Lock()
+
+    def _write(self, pin: int, on: bool):
+        with self._lock:
+            self.history.append((time.time(), pin, on))
+            if len(self.history) > self.max_history:
+                del self.history[:len(self.history) - self.max_history]
+
+    def cleanup(self):
+        self.states.clear()
+
+
+def resolve_relay_spec(spec: str = "auto") -> str:
+    """The relay driver an "auto" spec stands for on this machine"""
+    if spec != "auto":
+        return spec
+    if is_raspberry_pi() or importlib.util.find_spec("RPi"):
+        return "gpio"
+    print("[WARNING] RELAY_DRIVER=auto: not a Raspberry Pi and RPi.GPIO is not installed, relays are in-memory only")
+    return "memory"
+
+
+def create_relay_driver(spec: str = "auto") -> RelayDriver:
+    spec = resolve_relay_spec(spec)
+    if spec == "gpio":
+        return GPIORelayDriver()
+    if spec == "memory":
+        return InMemoryRelayDriver()
+    raise ValueError(f"Unknown relay driver '{spec}'")
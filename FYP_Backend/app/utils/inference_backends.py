@@ -0,0 +1,357 @@
+"""
+Pluggable person-detection backends for the smart detection pipeline.
+
+Every backend takes a camera frame (HxWx3 uint8, in the channel order the
+camera delivers and ultralytics expects) and returns a ``Detections`` tuple
+of person boxes in frame pixel coordinates. Backends record how long they
+took to load and a rolling window of per-frame latencies so the fastest
+option can be chosen per device.
+
+Export a model for the CPU backends with:
+
+    python -m app.utils.inference_backends --format onnx [--int8]
+    python -m app.utils.inference_backends --format openvino [--int8]
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+import cv2
+import numpy as np
+
+PERSON_CLASS = 0
+LATENCY_WINDOW = 256
+
+
+class Detections(NamedTuple):
+    xyxy: np.ndarray  # (N, 4) float32 boxes in frame pixels
+    conf: np.ndarray  # (N,) float32 scores
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(np.zeros((0, 4), dtype=np.float32), np.zeros((0,), dtype=np.float32))
+
+
+class InferenceBackend:
+    """Base class: subclasses implement _load() and _predict()"""
+
+    name = "base"
+
+    def __init__(self, model_path: str, conf: float = 0.25, imgsz: int = 640,
+                 num_threads: Optional[int] = None):
+        self.model_path = model_path
+        self.conf = conf
+        self.imgsz = imgsz
+        self.num_threads = num_threads  # intra-op threads; None = the library's default
+        self.loaded = False
+        self.load_time_s: Optional[float] = None
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._frames = 0
+        self._stats_lock = threading.Lock()
+
+    def load(self) -> "InferenceBackend":
+        started = time.perf_counter()
+        self._load()
+        self.load_time_s = time.perf_counter() - started
+        self.loaded = True
+        print(f"[INFO] {self.name} backend loaded {self.model_path} in {self.load_time_s:.2f}s")
+        return self
+
+    def close(self):
+        """Release the model; load() can be called again afterwards"""
+        self.loaded = False
+
+    def warmup(self, shape: Tuple[int, ...] = (480, 640, 3), runs: int = 1):
+        """Run throwaway inferences so the first real frame doesn't pay for lazy init"""
+        frame = np.zeros(shape, dtype=np.uint8)
+        for _ in range(runs):
+            self._predict(frame)
+
+    def predict(self, frame: np.ndarray) -> Detections:
+        started = time.perf_counter()
+        detections = self._predict(frame)
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self._latencies.append(elapsed)
+            self._frames += 1
+        return detections
+
+    def predict_batch(self, frames: Sequence[np.ndarray], imgsz: Optional[int] = None) -> List[Detections]:
+        """
+        Detect people in several images (e.g. zone crops) with as few model
+        calls as the backend allows. ``imgsz`` overrides the inference size
+        where the backend supports it; fixed-shape exported graphs ignore it
+        (with a warning).
+        """
+        if not frames:
+            return []
+        started = time.perf_counter()
+        detections = self._predict_batch(frames, imgsz)
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self._latencies.append(elapsed)
+            self._frames += 1
+        return detections
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            latencies = np.array(self._latencies, dtype=np.float64) * 1000
+            frames = self._frames
+        summary = {
+            "backend": self.name,
+            "model": self.model_path,
+            "loaded": self.loaded,
+            "num_threads": self.num_threads,
+            "load_time_s": round(self.load_time_s, 3) if self.load_time_s is not None else None,
+            "frames": frames,
+        }
+        if len(latencies):
+            summary.update({
+                "latency_ms_last": round(float(latencies[-1]), 2),
+                "latency_ms_mean": round(float(latencies.mean()), 2),
+                "latency_ms_p50": round(float(np.percentile(latencies, 50)), 2),
+                "latency_ms_p95": round(float(np.percentile(latencies, 95)), 2),
+            })
+        return summary
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _predict(self, frame: np.ndarray) -> Detections:
+        raise NotImplementedError
+
+    def _predict_batch(self, frames: Sequence[np.ndarray], imgsz: Optional[int]) -> List[Detections]:
+        return [self._predict(frame) for frame in frames]
+
+
+# -----------------------------
+# PyTorch (ultralytics)
+# -----------------------------
+class UltralyticsBackend(InferenceBackend):
+    name = "ultralytics"
+
+    def _load(self):
+        from ultralytics import YOLO
+        if self.num_threads:
+            import torch
+            torch.set_num_threads(self.num_threads)  # process-wide
+        self.model = YOLO(self.model_path)
+
+    def _predict(self, frame: np.ndarray) -> Detections:
+        results = self.model(frame, classes=PERSON_CLASS, conf=self.conf, imgsz=self.imgsz, verbose=False)
+        return self._to_detections(results[0]) if results else Detections.empty()
+
+    def _predict_batch(self, frames: Sequence[np.ndarray], imgsz: Optional[int]) -> List[Detections]:
+        # A list input is run as a single batch
+        results = self.model(list(frames), classes=PERSON_CLASS, conf=self.conf,
+                             imgsz=imgsz or self.imgsz, verbose=False)
+        return [self._to_detections(result) for result in results]
+
+    @staticmethod
+    def _to_detections(result) -> Detections:
+        boxes = result.boxes
+        if len(boxes) == 0:
+            return Detections.empty()
+        return Detections(
+            boxes.xyxy.cpu().numpy().astype(np.float32, copy=False),
+            boxes.conf.cpu().numpy().astype(np.float32, copy=False),
+        )
+
+
+# -----------------------------
+# Exported YOLOv8 graphs
+# -----------------------------
+class ExportedYOLOBackend(InferenceBackend):
+    """
+    Shared pre/post-processing for exported YOLOv8 graphs, which take a
+    Bx3xSxS float tensor and return raw (B, 4 + classes, anchors) predictions.
+    Subclasses implement _infer(); batches are run in one call only when the
+    graph was exported with a dynamic batch dimension. A per-call ``imgsz``
+    (ROI crops) is honoured only by graphs with dynamic spatial dimensions,
+    which ``--dynamic`` exports also have; fixed-size graphs run at their size.
+    """
+
+    iou_threshold = 0.45
+    dynamic_batch = False
+    fixed_size: Optional[int] = None  # input side of a fixed-shape graph; None = any multiple of 32
+    _warned_imgsz = False
+
+    def _use_graph_size(self, size):
+        """A graph exported for a fixed input size overrides the configured imgsz"""
+        if isinstance(size, int) and size > 0:
+            self.fixed_size = size
+            if size != self.imgsz:
+                print(f"[INFO] {self.model_path} takes {size}x{size} input; ignoring imgsz={self.imgsz}")
+                self.imgsz = size
+
+    def _input_size(self, imgsz: Optional[int]) -> int:
+        """Side to run a batch at: ``imgsz`` rounded up to the stride, or the graph's fixed size"""
+        if not imgsz or imgsz == self.imgsz:
+            return self.imgsz
+        if self.fixed_size is not None:
+            if not self._warned_imgsz:
+                self._warned_imgsz = True
+                print(f"[WARNING] {self.model_path} has a fixed {self.fixed_size}x{self.fixed_size} input; "
+                      f"imgsz={imgsz} is ignored (export with --dynamic to honour it)")
+            return self.imgsz
+        return -(-imgsz // 32) * 32
+
+    def _infer(self, tensor: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _predict(self, frame: np.ndarray) -> Detections:
+        tensor, scale, pad = self._preprocess(frame)
+        return self._postprocess(self._infer(tensor), scale, pad, frame.shape)
+
+    def _predict_batch(self, frames: Sequence[np.ndarray], imgsz: Optional[int]) -> List[Detections]:
+        size = self._input_size(imgsz)
+        prepared = [self._preprocess(frame, size) for frame in frames]
+        if self.dynamic_batch:
+            output = self._infer(np.concatenate([tensor for tensor, _, _ in prepared]))
+            outputs = [output[i:i + 1] for i in range(len(frames))]
+        else:
+            outputs = [self._infer(tensor) for tensor, _, _ in prepared]
+        return [self._postprocess(out, scale, pad, frame.shape)
+                for out, (_, scale, pad), frame in zip(outputs, prepared, frames)]
+
+    def _preprocess(self, frame: np.ndarray, size: Optional[int] = None) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+        size = size or self.imgsz
+        h, w = frame.shape[:2]
+        scale = min(size / h, size / w)
+        new_w, new_h = int(round(w * scale)), int(round(h * scale))
+        pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+
+        canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+        canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        # Same channel flip ultralytics applies to numpy input
+        tensor = canvas[:, :, ::-1].transpose(2, 0, 1)[np.newaxis].astype(np.float32) / 255.0
+        return np.ascontiguousarray(tensor), scale, (pad_x, pad_y)
+
+    def _postprocess(self, output: np.ndarray, scale: float, pad: Tuple[int, int],
+                     shape: Tuple[int, ...]) -> Detections:
+        preds = output[0].T  # (anchors, 4 + classes)
+        scores = preds[:, 4 + PERSON_CLASS]
+        keep = scores >= self.conf
+        if not keep.any():
+            return Detections.empty()
+        preds, scores = preds[keep], scores[keep]
+
+        cx, cy, bw, bh = preds[:, 0], preds[:, 1], preds[:, 2], preds[:, 3]
+        xyxy = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+        xyxy[:, [0, 2]] -= pad[0]
+        xyxy[:, [1, 3]] -= pad[1]
+        xyxy /= scale
+        xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], 0, shape[1])
+        xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], 0, shape[0])
+
+        xywh = np.concatenate([xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+        indices = cv2.dnn.NMSBoxes(xywh.tolist(), scores.tolist(), self.conf, self.iou_threshold)
+        indices = np.array(indices, dtype=np.int64).reshape(-1)
+        return Detections(xyxy[indices].astype(np.float32), scores[indices].astype(np.float32))
+
+
+class OnnxRuntimeBackend(ExportedYOLOBackend):
+    name = "onnxruntime"
+
+    def _load(self):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(self.model_path, sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self._use_graph_size(model_input.shape[2])
+
+    def _infer(self, tensor: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: tensor})[0]
+
+
+class OpenVINOBackend(ExportedYOLOBackend):
+    name = "openvino"
+
+    def _load(self):
+        import openvino as ov
+        path = self.model_path
+        if os.path.isdir(path):
+            # ultralytics exports a directory containing <name>.xml/.bin
+            xml_files = [f for f in os.listdir(path) if f.endswith(".xml")]
+            if not xml_files:
+                raise FileNotFoundError(f"No OpenVINO .xml model in {path}")
+            path = os.path.join(path, xml_files[0])
+        core = ov.Core()
+        config = {"INFERENCE_NUM_THREADS": self.num_threads} if self.num_threads else {}
+        self.compiled = core.compile_model(core.read_model(path), "CPU", config)
+        self.output = self.compiled.output(0)
+        shape = self.compiled.input(0).get_partial_shape()
+        self.dynamic_batch = shape[0].is_dynamic
+        if shape[2].is_static:
+            self._use_graph_size(shape[2].get_length())
+
+    def _infer(self, tensor: np.ndarray) -> np.ndarray:
+        return self.compiled([tensor])[self.output]
+
+
+BACKENDS: Dict[str, Type[InferenceBackend]] = {
+    UltralyticsBackend.name: UltralyticsBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    OpenVINOBackend.name: OpenVINOBackend,
+}
+
+
+def create_backend(name: str, model_path: str, conf: float = 0.25, imgsz: int = 640,
+                   num_threads: Optional[int] = None) -> InferenceBackend:
+    """Instantiate (but do not load) a backend by name"""
+    try:
+        backend_cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {sorted(BACKENDS)}")
+    return backend_cls(model_path, conf=conf, imgsz=imgsz, num_threads=num_threads)
+
+
+# -----------------------------
+# Export
+# -----------------------------
+def export_model(weights: str = "yolov8n.pt", fmt: str = "onnx", int8: bool = False, imgsz: int = 640,
+                 dynamic: bool = False) -> str:
+    """
+    Export ultralytics weights for a CPU backend and return the exported path.
+    ONNX int8 uses onnxruntime dynamic quantization; OpenVINO int8 uses the
+    ultralytics/NNCF calibration path. ``dynamic`` exports a variable batch
+    dimension so ROI crops can be batched into one call.
+    """
+    from ultralytics import YOLO
+
+    if fmt == "onnx":
+        exported = YOLO(weights).export(format="onnx", imgsz=imgsz, simplify=True, dynamic=dynamic)
+        if not int8:
+            return exported
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized = exported.replace(".onnx", "-int8.onnx")
+        quantize_dynamic(exported, quantized, weight_type=QuantType.QUInt8)
+        return quantized
+    if fmt == "openvino":
+        return YOLO(weights).export(format="openvino", imgsz=imgsz, int8=int8, dynamic=dynamic)
+    raise ValueError(f"Unsupported export format '{fmt}'")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export YOLOv8 weights for a CPU inference backend")
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    parser.add_argument("--int8", action="store_true", help="quantize weights to int8")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--dynamic", action="store_true", help="variable batch size (for batched ROI crops)")
+    args = parser.parse_args()
+    print(export_model(args.weights, args.format, args.int8, args.imgsz, args.dynamic))
@@ -0,0 +1,282 @@
+"""
+Inference in a separate worker process.
+
+ProcessInferenceBackend wraps one of the regular backends and runs it in a
+child process, so YOLO never holds the API process's GIL. Frames that
+already live in a shared frame pool (FrameRingBuffer(shared=True)) are
+passed by reference: only the block name, offset, shape and strides cross
+the multiprocessing Pipe. The worker keeps each pool attached between calls
+and closes an attachment once its pool has been retired or reallocated.
+Other frames are copied into the worker's own shared-memory block, or
+pickled through the pipe if they don't fit. The detections that come back
+are a few small arrays.
+
+The worker is started with the "spawn" method by default. Forking a process
+that already runs camera and API threads (and possibly torch) is not safe.
+
+If the worker dies (OOM killer, a crash in native code), the next call
+respawns it, backing off between failed attempts. After
+``max_restart_failures`` failed restarts in a row it gives up and reports
+"failed" through ``on_state``.
+"""
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.frame_buffer import shared_block_names, shared_location
+from app.utils.inference_backends import Detections, InferenceBackend, create_backend
+
+# Room for a few 640x480 frames or a batch of ROI crops
+DEFAULT_SHM_BYTES = 8 * 1024 * 1024
+WORKER_START_TIMEOUT = 300.0  # first ultralytics load can download weights
+RESTART_BACKOFF = 1.0  # seconds before retrying a failed restart, doubled per failure
+RESTART_MAX_BACKOFF = 60.0
+
+
+def _inference_worker(conn, shm_name: str, backend_name: str, model_path: str, conf: float, imgsz: int,
+                      num_threads: Optional[int] = None):
+    """Child process main loop: load the backend, then serve predict requests until told to stop"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    pools: Dict[str, shared_memory.SharedMemory] = {}  # attached frame pools by name
+    try:
+        backend = create_backend(backend_name, model_path, conf=conf, imgsz=imgsz, num_threads=num_threads).load()
+        conn.send(("ready", backend.load_time_s))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        shm.close()
+        return
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        command = message[0]
+        if command == "stop":
+            break
+        try:
+            started = time.perf_counter()
+            if command == "predict":
+                _, layout, batch_imgsz = message
+                frames = [np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+                          for offset, shape in layout]
+            elif command == "predict_shared":
+                _, layout, batch_imgsz, live = message
+                for name in [name for name in pools if name not in live]:
+                    pools.pop(name).close()  # retired or reallocated pool
+                frames = []
+                for name, offset, shape, strides in layout:
+                    if name not in pools:
+                        pools[name] = shared_memory.SharedMemory(name=name)
+                    frames.append(np.ndarray(shape, dtype=np.uint8, buffer=pools[name].buf,
+                                             offset=offset, strides=strides))
+            else:  # "predict_inline"
+                _, frames, batch_imgsz = message
+            if len(frames) == 1 and batch_imgsz is None:
+                results = [backend.predict(frames[0])]
+            else:
+                results = backend.predict_batch(frames, imgsz=batch_imgsz)
+            del frames  # drop views into the shared block before replying
+            conn.send(("ok", [(d.xyxy, d.conf) for d in results], time.perf_counter() - started))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}", 0.0))
+    for pool in pools.values():
+        pool.close()
+    shm.close()
+
+
+class ProcessInferenceBackend(InferenceBackend):
+    """Runs ``inner`` (any name in BACKENDS) in a worker process"""
+
+    def __init__(self, inner: str, model_path: str, conf: float = 0.25, imgsz: int = 640,
+                 num_threads: Optional[int] = None, shm_bytes: int = DEFAULT_SHM_BYTES,
+                 start_method: str = "spawn", max_restart_failures: int = 5,
+                 on_state: Optional[Callable[[str, Optional[str]], None]] = None):
+        super().__init__(model_path, conf=conf, imgsz=imgsz, num_threads=num_threads)
+        self.inner = inner
+        self.name = f"process:{inner}"
+        self.shm_bytes = shm_bytes
+        self.start_method = start_method
+        self._call_lock = threading.Lock()
+        self._conn = None
+        self._process = None
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self.worker_time_total = 0.0
+        self.ipc_time_total = 0.0
+        self.calls = 0
+        self.inline_calls = 0
+        self.zero_copy_calls = 0
+        self.max_restart_failures = max_restart_failures
+        self.on_state = on_state  # ("restarting" | "running" | "failed", error)
+        self.restarts = 0
+        self.restart_failures = 0  # consecutive
+        self.last_exit: Optional[str] = None
+        self.failed: Optional[str] = None
+        self._restart_at = 0.0  # monotonic time of the next allowed restart attempt
+        self._respawn = False  # set once loaded; close() clears it so a closed backend stays closed
+
+    def _notify(self, state: str, error: Optional[str] = None):
+        if self.on_state is not None:
+            self.on_state(state, error)
+
+    def _load(self):
+        context = multiprocessing.get_context(self.start_method)
+        self._shm = shared_memory.SharedMemory(create=True, size=self.shm_bytes)
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_inference_worker, name="inference-worker", daemon=True,
+            # The worker inherits the CPU affinity of the thread that starts it
+            args=(child_conn, self._shm.name, self.inner, self.model_path, self.conf, self.imgsz,
+                  self.num_threads)
+        )
+        self._process.start()
+        child_conn.close()
+        try:
+            if not self._conn.poll(WORKER_START_TIMEOUT):
+                self._shutdown()
+                raise RuntimeError("Inference worker did not start in time")
+            status, payload = self._conn.recv()
+        except (EOFError, OSError) as e:
+            # The worker died before replying
+            process = self._process
+            self._shutdown()  # joins it, so the exit code is known
+            raise RuntimeError(f"Inference worker exited while loading (exit code {process.exitcode}): {e!r}")
+        if status != "ready":
+            self._shutdown()
+            raise RuntimeError(f"Inference worker failed to load the model: {payload}")
+        self._respawn, self.failed = True, None
+        print(f"[INFO] Inference worker pid {self._process.pid} running {self.inner}")
+
+    def _shared_layout(self, frames: Sequence[np.ndarray]) -> Optional[List[Tuple]]:
+        """References to frames that already sit in a shared frame pool; None unless all do"""
+        layout = []
+        for frame in frames:
+            location = shared_location(frame) if frame.dtype == np.uint8 else None
+            if location is None:
+                return None
+            name, offset, strides = location
+            layout.append((name, offset, frame.shape, strides))
+        return layout
+
+    def _layout(self, frames: Sequence[np.ndarray]) -> Optional[List[Tuple[int, Tuple[int, ...]]]]:
+        """Pack frames back to back into shared memory; None if they don't fit"""
+        layout, offset = [], 0
+        for frame in frames:
+            if frame.dtype != np.uint8 or offset + frame.nbytes > self.shm_bytes:
+                return None
+            target = np.ndarray(frame.shape, dtype=np.uint8, buffer=self._shm.buf, offset=offset)
+            np.copyto(target, frame)
+            layout.append((offset, frame.shape))
+            offset += frame.nbytes
+        return layout
+
+    def _restart_locked(self):
+        """Respawn a dead worker (caller holds _call_lock); raises while backing off or given up"""
+        if not self._respawn:
+            raise RuntimeError("Inference worker is not running")
+        if self.failed is not None:
+            raise RuntimeError(f"Inference worker failed: {self.failed}")
+        if self._process is not None:
+            self.last_exit = f"exit code {self._process.exitcode}"
+        self.loaded = False
+        now = time.monotonic()
+        if now < self._restart_at:
+            raise RuntimeError(f"Inference worker is down, next restart in {self._restart_at - now:.1f}s")
+        print(f"[ERROR] Inference worker is not running ({self.last_exit}), restarting")
+        self._notify("restarting", self.last_exit)
+        self._shutdown()
+        try:
+            self.load()
+        except Exception as e:
+            self.restart_failures += 1
+            if self.restart_failures >= self.max_restart_failures:
+                self.failed = f"{self.restart_failures} restarts failed, last: {e}"
+                self._notify("failed", self.failed)
+            else:
+                backoff = min(RESTART_MAX_BACKOFF, RESTART_BACKOFF * 2 ** (self.restart_failures - 1))
+                self._restart_at = time.monotonic() + backoff
+            raise RuntimeError(f"Inference worker restart failed: {e}")
+        self.restarts += 1
+        self.restart_failures = 0
+        self._notify("running")
+
+    def _call(self, frames: Sequence[np.ndarray], imgsz: Optional[int]) -> List[Detections]:
+        with self._call_lock:
+            if self._process is None or not self._process.is_alive():
+                self._restart_locked()
+            started = time.perf_counter()
+            # The caller holds the pool slot for the duration of the call
+            shared = self._shared_layout(frames)
+            layout = self._layout(frames) if shared is None else None
+            try:
+                if shared is not None:
+                    self.zero_copy_calls += 1
+                    self._conn.send(("predict_shared", shared, imgsz, shared_block_names()))
+                elif layout is not None:
+                    self._conn.send(("predict", layout, imgsz))
+                else:
+                    self.inline_calls += 1
+                    self._conn.send(("predict_inline", [np.ascontiguousarray(f) for f in frames], imgsz))
+                reply = self._conn.recv()
+            except (EOFError, OSError) as e:
+                self.loaded = False
+                raise RuntimeError(f"Inference worker exited: {e}")
+            status, payload, worker_time = reply
+            self.calls += 1
+            self.worker_time_total += worker_time
+            self.ipc_time_total += time.perf_counter() - started - worker_time
+        if status != "ok":
+            raise RuntimeError(f"Inference worker error: {payload}")
+        return [Detections(xyxy, conf) for xyxy, conf in payload]
+
+    def _predict(self, frame: np.ndarray) -> Detections:
+        return self._call([frame], None)[0]
+
+    def _predict_batch(self, frames: Sequence[np.ndarray], imgsz: Optional[int]) -> List[Detections]:
+        return self._call(frames, imgsz)
+
+    def close(self):
+        self._respawn = False
+        self._shutdown()
+
+    def _shutdown(self):
+        if self._conn is not None:
+            try:
+                self._conn.send(("stop",))
+            except (OSError, ValueError):
+                pass
+        if self._process is not None:
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+        self.loaded = False
+
+    def stats(self) -> Dict:
+        summary = super().stats()
+        summary["worker"] = {
+            "pid": self._process.pid if self._process is not None else None,
+            "alive": self._process is not None and self._process.is_alive(),
+            "restarts": self.restarts,
+            "restart_failures": self.restart_failures,
+            "last_exit": self.last_exit,
+            "failed": self.failed,
+            "calls": self.calls,
+            "inline_calls": self.inline_calls,
+            "zero_copy_calls": self.zero_copy_calls,
+            "avg_worker_ms": round(self.worker_time_total / self.calls * 1000, 2) if self.calls else None,
+            # Time spent copying into shared memory and on the pipe round trip
+            "avg_ipc_overhead_ms": round(self.ipc_time_total / self.calls * 1000, 2) if self.calls else None,
+        }
+        return summary
@@ -0,0 +1,224 @@
+"""
+JPEG encoding for the /preview stream.
+
+Capture frames are B, G, R in memory (Picamera2's RGB888, see hardware.py).
+Two encoders can turn them into JPEGs, both straight from that order:
+  * "turbo" - PyTurboJPEG (libjpeg-turbo) with 4:2:0 chroma and the fast DCT,
+  * "opencv" - cv2.imencode.
+"auto" uses turbo when the binding and libturbojpeg are installed.
+
+Either way the frame is copied (and scaled) into the encoder's working
+buffer once, so the capture slot is released before the slow part.
+ZoneOverlay then draws the zone grid or polygon outlines. They are
+precomputed as flat pixel indices per frame size and zone layout, so drawing
+is one indexed assignment per frame instead of a set of cv2.line calls.
+
+AdaptiveQuality picks the (quality, scale) step to encode at from the number
+of viewers and the CPU headroom left.
+"""
+import os
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from app.utils.zone_mapping import ZoneMapper
+
+# (JPEG quality, resolution scale), best first
+QUALITY_LADDER = ((85, 1.0), (75, 1.0), (65, 1.0), (60, 0.75), (50, 0.5))
+
+
+class JpegEncoder:
+    """Base class: subclasses implement encode() on a buffer from prepare()"""
+
+    name = "base"
+
+    def __init__(self):
+        self._work: Optional[np.ndarray] = None
+
+    def prepare(self, frame: np.ndarray, scale: float = 1.0) -> np.ndarray:
+        """Copy the BGR frame, scaled, into the reused working buffer"""
+        h, w = frame.shape[:2]
+        size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+        shape = (size[1], size[0], 3)
+        if self._work is None or self._work.shape != shape:
+            self._work = np.empty(shape, dtype=np.uint8)
+        if size != (w, h):
+            cv2.resize(frame, size, dst=self._work, interpolation=cv2.INTER_LINEAR)
+        else:
+            np.copyto(self._work, frame)
+        return self._work
+
+    def encode(self, image: np.ndarray, quality: int) -> bytes:
+        raise NotImplementedError
+
+
+class OpenCVJpegEncoder(JpegEncoder):
+    name = "opencv"
+
+    def encode(self, image: np.ndarray, quality: int) -> bytes:
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        if not ok:
+            raise RuntimeError("cv2.imencode failed")
+        return jpeg.tobytes()
+
+
+class TurboJpegEncoder(JpegEncoder):
+    name = "turbo"
+
+    def __init__(self):
+        super().__init__()
+        import turbojpeg
+        self._turbo = turbojpeg.TurboJPEG()  # raises if libturbojpeg is missing
+        self._options = {
+            "pixel_format": turbojpeg.TJPF_BGR,
+            "jpeg_subsample": turbojpeg.TJSAMP_420,
+            "flags": turbojpeg.TJFLAG_FASTDCT,
+        }
+
+    def encode(self, image: np.ndarray, quality: int) -> bytes:
+        return self._turbo.encode(image, quality=int(quality), **self._options)
+
+
+JPEG_ENCODERS = {
+    TurboJpegEncoder.name: TurboJpegEncoder,
+    OpenCVJpegEncoder.name: OpenCVJpegEncoder,
+}
+
+
+def create_jpeg_encoder(name: str = "auto") -> JpegEncoder:
+    """ "turbo", "opencv" or "auto" (turbo if it can be loaded, else OpenCV) """
+    if name == "auto":
+        try:
+            return TurboJpegEncoder()
+        except (ImportError, OSError, RuntimeError) as e:
+            print("[INFO] libjpeg-turbo binding unavailable, preview uses OpenCV:", e)
+            return OpenCVJpegEncoder()
+    try:
+        encoder_cls = JPEG_ENCODERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown JPEG encoder '{name}', expected one of {sorted(JPEG_ENCODERS)} or 'auto'")
+    return encoder_cls()
+
+
+class ZoneOverlay:
+    """Zone grid / polygon outlines as cached pixel indices per (size, layout version)"""
+
+    def __init__(self, grid_rows: int, grid_cols: int, zone_mapper: Optional[ZoneMapper] = None,
+                 color: Tuple[int, int, int] = (0, 255, 0)):
+        self.grid_rows = grid_rows
+        self.grid_cols = grid_cols
+        self.zone_mapper = zone_mapper
+        self.color = np.array(color, dtype=np.uint8)  # BGR
+        self._version: Optional[int] = None
+        self._indices: Dict[Tuple[int, int], np.ndarray] = {}  # one per ladder scale
+
+    def indices(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """Flat indices of the outline pixels for an HxW image"""
+        version = self.zone_mapper.version if self.zone_mapper is not None else 0
+        if version != self._version:
+            self._indices.clear()
+            self._version = version
+        key = tuple(shape[:2])
+        if key not in self._indices:
+            self._indices[key] = self._build(*key)
+        return self._indices[key]
+
+    def _build(self, h: int, w: int) -> np.ndarray:
+        mask = np.zeros((h, w), dtype=np.uint8)
+        if self.zone_mapper is not None and self.zone_mapper.polygons:
+            cv2.polylines(mask, self.zone_mapper.outlines((h, w)), True, 1, 1)
+        else:
+            cell_h, cell_w = h // self.grid_rows, w // self.grid_cols
+            for i in range(1, self.grid_rows):
+                mask[i * cell_h, :] = 1
+            for j in range(1, self.grid_cols):
+                mask[:, j * cell_w] = 1
+        return np.flatnonzero(mask)
+
+    def apply(self, image: np.ndarray):
+        """Draw the outlines onto a contiguous HxWx3 BGR image in place"""
+        image.reshape(-1, 3)[self.indices(image.shape)] = self.color
+
+
+def system_headroom() -> float:
+    """Share of the CPUs left idle, from the 1-minute load average (1.0 if unknown)"""
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return 1.0
+    return max(0.0, 1.0 - load / (os.cpu_count() or 1))
+
+
+class AdaptiveQuality:
+    """
+    Chooses a (quality, scale) step from ``ladder``, best first. The step
+    used is the worse of two:
+      * viewers - every ``clients_per_step`` clients beyond the first drop a
+        step, since each JPEG is sent to every client,
+      * CPU headroom - when the encoder uses more than ``cpu_share`` of a
+        core (encode time x frame rate), or ``headroom_fn`` reports less
+        than ``min_headroom`` of the machine idle, drop a step. With both
+        comfortably clear, raise one again. This changes at most once every
+        ``hold_s``.
+    """
+
+    def __init__(self, ladder: Sequence[Tuple[int, float]] = QUALITY_LADDER, clients_per_step: int = 3,
+                 cpu_share: float = 0.15, min_headroom: float = 0.2, hold_s: float = 2.0,
+                 smoothing: float = 0.2, headroom_fn: Callable[[], float] = system_headroom,
+                 enabled: bool = True):
+        if not ladder:
+            raise ValueError("AdaptiveQuality needs at least one (quality, scale) step")
+        self.ladder = tuple(ladder)
+        self.clients_per_step = clients_per_step
+        self.cpu_share = cpu_share
+        self.min_headroom = min_headroom
+        self.hold_s = hold_s
+        self.smoothing = smoothing
+        self.headroom_fn = headroom_fn
+        self.enabled = enabled
+
+        self.step = 0
+        self._cpu_step = 0
+        self._changed_at = 0.0
+        self.encode_share: Optional[float] = None
+        self.headroom: Optional[float] = None
+
+    @property
+    def current(self) -> Tuple[int, float]:
+        return self.ladder[self.step]
+
+    def update(self, encode_s: float, period_s: float, clients: int, now: Optional[float] = None) -> Tuple[int, float]:
+        """Feed one encode (its time and the time since the previous one); returns the next step's settings"""
+        now = time.monotonic() if now is None else now
+        if period_s > 0:
+            share = encode_s / period_s
+            self.encode_share = share if self.encode_share is None else \
+                self.encode_share + self.smoothing * (share - self.encode_share)
+        if not self.enabled:
+            return self.current
+        last = len(self.ladder) - 1
+        if self.encode_share is not None and now - self._changed_at >= self.hold_s:
+            self.headroom = self.headroom_fn()
+            cpu_step = self._cpu_step
+            if self.encode_share > self.cpu_share or self.headroom < self.min_headroom:
+                cpu_step = min(last, cpu_step + 1)
+            elif self.encode_share < self.cpu_share / 2 and self.headroom > 2 * self.min_headroom:
+                cpu_step = max(0, cpu_step - 1)
+            if cpu_step != self._cpu_step:
+                self._cpu_step, self._changed_at = cpu_step, now
+        client_step = (max(1, clients) - 1) // self.clients_per_step
+        self.step = min(last, max(client_step, self._cpu_step))
+        return self.current
+
+    def stats(self) -> Dict:
+        quality, scale = self.current
+        return {
+            "adaptive": self.enabled,
+            "quality": quality,
+            "scale": scale,
+            "step": self.step,
+            "encode_cpu_share": round(self.encode_share, 3) if self.encode_share is not None else None,
+            "headroom": round(self.headroom, 2) if self.headroom is not None else None,
+        }
@@ -0,0 +1,156 @@
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+
+from app.utils.frame_buffer import FrameRingBuffer
+from app.utils.jpeg_encoder import AdaptiveQuality, JpegEncoder, OpenCVJpegEncoder, ZoneOverlay
+from app.utils.zone_mapping import ZoneMapper
+
+BOUNDARY_CHUNK = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+
+
+class MJPEGBroadcaster:
+    """
+    Encodes each preview frame once and fans the same JPEG bytes out to every
+    connected /preview client. The encoder thread only runs while at least
+    one client is subscribed, and each client is paced to its own frame rate
+    by skipping to the newest JPEG rather than queueing old ones.
+
+    Quality and resolution come from ``adaptive`` (fixed at its best step
+    when None); see app/utils/jpeg_encoder.py.
+    """
+
+    def __init__(self, buffer_factory: Callable[[], FrameRingBuffer],
+                 grid_rows: int, grid_cols: int,
+                 max_fps: float = 15.0, wait_timeout: float = 1.0,
+                 zone_mapper: Optional[ZoneMapper] = None,
+                 encoder: Optional[JpegEncoder] = None,
+                 adaptive: Optional[AdaptiveQuality] = None):
+        self._buffer_factory = buffer_factory
+        self.grid_rows = grid_rows
+        self.grid_cols = grid_cols
+        self.zone_mapper = zone_mapper  # polygon zones are outlined instead of the grid
+        self.overlay = ZoneOverlay(grid_rows, grid_cols, zone_mapper=zone_mapper)
+        self.encoder = encoder if encoder is not None else OpenCVJpegEncoder()
+        self.adaptive = adaptive if adaptive is not None else AdaptiveQuality(enabled=False)
+        self.max_fps = max_fps
+        self._wait_timeout = wait_timeout
+
+        self._cond = threading.Condition()
+        self._subscribers = 0
+        self._thread: Optional[threading.Thread] = None
+        self._jpeg: Optional[bytes] = None
+        self._jpeg_seq = 0
+
+        self.frames_encoded = 0
+        self.encode_time_total = 0.0
+        self.bytes_encoded = 0
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+    def stats(self) -> dict:
+        """Encoder counters for the status endpoint"""
+        encoded = self.frames_encoded
+        return {
+            "subscribers": self._subscribers,
+            "encoder_running": self._thread is not None and self._thread.is_alive(),
+            "frames_encoded": encoded,
+            "avg_encode_ms": round(self.encode_time_total / encoded * 1000, 2) if encoded else 0.0,
+            "avg_jpeg_kb": round(self.bytes_encoded / encoded / 1024, 1) if encoded else 0.0,
+            "encoder": self.encoder.name,
+            **self.adaptive.stats(),
+            "max_fps": self.max_fps,
+        }
+
+    # -----------------------------
+    # Subscribers
+    # -----------------------------
+    def stream(self, max_fps: Optional[float] = None) -> Iterator[bytes]:
+        """Multipart MJPEG generator for one client, at up to ``max_fps`` (None = the broadcaster's cap)"""
+        if max_fps is not None and max_fps <= 0:
+            raise ValueError(f"max_fps must be positive, got {max_fps}")
+        interval = 1.0 / min(max_fps if max_fps is not None else self.max_fps, self.max_fps)
+        last_seq = self._subscribe()
+        try:
+            next_due = 0.0
+            while True:
+                now = time.monotonic()
+                if now < next_due:
+                    time.sleep(next_due - now)
+                with self._cond:
+                    self._cond.wait_for(lambda: self._jpeg_seq > last_seq, timeout=self._wait_timeout)
+                    if self._jpeg_seq <= last_seq:
+                        continue
+                    last_seq, jpeg = self._jpeg_seq, self._jpeg
+                next_due = time.monotonic() + interval
+                yield BOUNDARY_CHUNK + jpeg + b"\r\n"
+        finally:
+            self._unsubscribe()
+
+    def _subscribe(self) -> int:
+        with self._cond:
+            self._subscribers += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._encode_loop, name="mjpeg-encoder", daemon=True)
+                self._thread.start()
+            # New clients start from the next fresh JPEG, never a stale one
+            return self._jpeg_seq
+
+    def _unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+            self._cond.notify_all()
+
+    # -----------------------------
+    # Encoder
+    # -----------------------------
+    def encode(self, frame: np.ndarray) -> bytes:
+        """BGR frame -> JPEG bytes with the zones drawn on top, at the current quality step"""
+        return self.encode_prepared(self.encoder.prepare(frame, self.adaptive.current[1]))
+
+    def encode_prepared(self, image: np.ndarray) -> bytes:
+        """Overlay and encode a buffer returned by encoder.prepare()"""
+        self.overlay.apply(image)
+        return self.encoder.encode(image, self.adaptive.current[0])
+
+    def _encode_loop(self):
+        buffer = self._buffer_factory()
+        interval = 1.0 / self.max_fps
+        last_frame_seq = 0
+        last_encoded = None
+        while True:
+            with self._cond:
+                if self._subscribers <= 0:
+                    self._thread = None
+                    return
+            ref = buffer.acquire(last_frame_seq + 1, timeout=self._wait_timeout)
+            if ref is None:
+                continue
+            last_frame_seq = ref.seq
+
+            started = time.monotonic()
+            try:
+                with ref:  # hold the slot only while copying it out
+                    image = self.encoder.prepare(ref.frame, self.adaptive.current[1])
+                jpeg = self.encode_prepared(image)
+            except Exception as e:
+                print("[ERROR] MJPEG encode failed:", e)
+                jpeg = None
+            elapsed = time.monotonic() - started
+            if jpeg is not None:
+                self.frames_encoded += 1
+                self.encode_time_total += elapsed
+                self.bytes_encoded += len(jpeg)
+                period = started - last_encoded if last_encoded is not None else 0.0
+                last_encoded = started
+                self.adaptive.update(elapsed, period, self._subscribers)
+                with self._cond:
+                    self._jpeg = jpeg
+                    self._jpeg_seq += 1
+                    self._cond.notify_all()
+            if elapsed < interval:
+                time.sleep(interval - elapsed)
@@ -0,0 +1,119 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap frame-differencing pre-stage in front of the detector.
+
+    Each frame is shrunk to a small blurred greyscale thumbnail and compared
+    against the thumbnail of the last frame that actually went through the
+    model. If too few pixels changed, the previous occupancy result is reused
+    instead of running inference again. A result is never reused for longer
+    than ``max_reuse_s`` so slow changes (someone sitting very still while
+    the light shifts) are still re-checked periodically.
+    """
+
+    def __init__(self, changed_fraction: float = 0.01, pixel_delta: int = 25,
+                 size: Tuple[int, int] = (160, 120), max_reuse_s: float = 30.0,
+                 enabled: bool = True):
+        self.changed_fraction = changed_fraction
+        self.pixel_delta = pixel_delta
+        self.size = size
+        self.max_reuse_s = max_reuse_s
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._reference: Optional[np.ndarray] = None
+        self._last_result: Any = None
+        self._last_result_at = 0.0
+        self._pending: Optional[np.ndarray] = None
+
+        # Counters
+        self.frames_checked = 0
+        self.inferences_run = 0
+        self.inferences_skipped = 0
+        self.gate_time_total = 0.0
+        self.inference_time_total = 0.0
+        self.last_motion_score = 0.0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def check(self, frame: np.ndarray) -> Tuple[bool, Any]:
+        """
+        Returns (run_inference, cached_result). When run_inference is False,
+        cached_result is the last stored result and should be used as-is.
+        """
+        started = time.perf_counter()
+        thumb = self._thumbnail(frame)
+        with self._lock:
+            self.frames_checked += 1
+            run = True
+            if self.enabled and self._reference is not None and self._last_result is not None \
+                    and (time.time() - self._last_result_at) < self.max_reuse_s:
+                diff = cv2.absdiff(thumb, self._reference)
+                self.last_motion_score = float(np.count_nonzero(diff > self.pixel_delta)) / diff.size
+                run = self.last_motion_score >= self.changed_fraction
+            if run:
+                self._pending = thumb
+            else:
+                self.inferences_skipped += 1
+            self.gate_time_total += time.perf_counter() - started
+            return run, (None if run else self._last_result)
+
+    def moved(self, frame: np.ndarray) -> bool:
+        """
+        Whether ``frame`` differs from the last inferred frame, without
+        touching the gate's state (used to end an idle wait early)
+        """
+        thumb = self._thumbnail(frame)
+        with self._lock:
+            if self._reference is None:
+                return True
+            diff = cv2.absdiff(thumb, self._reference)
+            self.last_motion_score = float(np.count_nonzero(diff > self.pixel_delta)) / diff.size
+            return self.last_motion_score >= self.changed_fraction
+
+    def store(self, result: Any, inference_time: float = 0.0):
+        """Record the result of an inference that check() asked for"""
+        with self._lock:
+            self.inferences_run += 1
+            self.inference_time_total += inference_time
+            if self._pending is not None:
+                self._reference = self._pending
+                self._pending = None
+            self._last_result = result
+            self._last_result_at = time.time()
+
+    def reset(self):
+        with self._lock:
+            self._reference = None
+            self._last_result = None
+            self._pending = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            checked = self.frames_checked
+            run = self.inferences_run
+            skipped = self.inferences_skipped
+            avg_inference_ms = self.inference_time_total / run * 1000 if run else 0.0
+            avg_gate_ms = self.gate_time_total / checked * 1000 if checked else 0.0
+            return {
+                "enabled": self.enabled,
+                "frames_checked": checked,
+                "inferences_run": run,
+                "inferences_skipped": skipped,
+                "skip_ratio": round(skipped / checked, 3) if checked else 0.0,
+                "avg_gate_ms": round(avg_gate_ms, 3),
+                "avg_inference_ms": round(avg_inference_ms, 2),
+                # Net CPU time saved: skipped inferences minus the cost of gating every frame
+                "estimated_cpu_s_saved": round((skipped * avg_inference_ms - checked * avg_gate_ms) / 1000, 2),
+                "last_motion_score": round(self.last_motion_score, 4),
+            }
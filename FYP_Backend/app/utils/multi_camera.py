@@ -0,0 +1,280 @@
+"""
+Several cameras sharing one loaded detection model.
+
+Each CameraChannel owns its camera, capture thread, ring buffer and the
+stateful parts of the pipeline (motion gate, ROI tiler), but every channel's
+DetectionPipeline points at the same InferenceBackend. A single scheduler
+thread is the only caller of the model: it picks the next channel with a
+fresh frame that is within its frame budget and runs one frame through it.
+
+Policies:
+  * "round_robin": cycle through ready channels in order.
+  * "fair": weighted fair sharing of model time (stride scheduling). Each
+    channel is charged inference_time / weight, and the ready channel with
+    the least charge goes next. An idle channel cannot bank credit, so a
+    camera coming back online does not starve the others.
+
+Channel config (JSON list, inline or in a file):
+    [{"name": "room101", "source": "picamera", "camera_num": 0, "relay_pins": [2, 3, 4, 17],
+      "weight": 2, "max_fps": 4, "zones": [<zone polygons, optional>]}, ...]
+
+``camera_num`` picks the CSI camera of a "picamera" (or "auto" on a Pi)
+entry. It defaults to the next number no other Pi camera entry uses, so two
+Pi cameras never open the same sensor.
+"""
+import json
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.utils.detection_pipeline import DetectionPipeline, FrameResult
+from app.utils.camera_supervisor import CameraSupervisor
+from app.utils.frame_buffer import CaptureThread, FrameRingBuffer
+from app.utils.hardware import CameraSource, resolve_camera_spec
+
+LATENCY_WINDOW = 256
+
+
+def load_camera_configs(spec: str) -> List[Dict]:
+    """Parse a camera list from inline JSON or a JSON file path; empty spec = no cameras"""
+    spec = (spec or "").strip()
+    if not spec:
+        return []
+    if not spec.startswith("["):
+        with open(spec) as f:
+            spec = f.read()
+    configs = json.loads(spec)
+    names = [config["name"] for config in configs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate camera names in {names}")
+    for config in configs:
+        config["source"] = resolve_camera_spec(config.get("source", "auto"))
+        config.setdefault("relay_pins", [])
+        config.setdefault("weight", 1.0)
+        config.setdefault("max_fps", None)
+        config.setdefault("zones", [])  # zone polygons, empty = plain grid
+    pi_cameras = [config for config in configs if config["source"] == "picamera"]
+    taken = {config["camera_num"] for config in pi_cameras if config.get("camera_num") is not None}
+    free = (num for num in range(len(pi_cameras) + len(taken)) if num not in taken)
+    for config in configs:
+        if config.get("camera_num") is None:
+            config["camera_num"] = next(free) if config["source"] == "picamera" else 0
+    numbers = [config["camera_num"] for config in pi_cameras]
+    if len(set(numbers)) != len(numbers):
+        raise ValueError(f"Duplicate camera_num in {numbers}")
+    return configs
+
+
+class CameraChannel:
+    """One camera and its share of the detection pipeline"""
+
+    def __init__(self, name: str, camera: CameraSource, pipeline: DetectionPipeline,
+                 on_result: Callable[["CameraChannel", FrameResult, float], None],
+                 weight: float = 1.0, max_fps: Optional[float] = None, buffer_slots: int = 6,
+                 shared_buffer: bool = False, stale_after_s: float = 5.0, frozen_after_s: float = 10.0):
+        if weight <= 0:
+            raise ValueError(f"Camera '{name}' needs a positive weight")
+        self.name = name
+        self.camera = camera
+        self.pipeline = pipeline
+        self.on_result = on_result
+        self.weight = float(weight)
+        self.max_fps = max_fps
+        self.buffer = FrameRingBuffer(buffer_slots, shared=shared_buffer)
+        # Full-size frames for the preview when the camera has a separate detection stream
+        self.display_buffer = FrameRingBuffer(buffer_slots) if camera.lores_size else None
+        # The camera object is restarted in place by the watchdog
+        self.supervisor = CameraSupervisor(
+            lambda: camera, self.buffer, lambda: self.capture.running, name=name,
+            stale_after_s=stale_after_s, frozen_after_s=frozen_after_s
+        )
+        self.capture = CaptureThread(self.supervisor.get, self.buffer, display_buffer=self.display_buffer)
+
+        # Scheduler bookkeeping
+        self.last_seq = 0
+        self.next_due = 0.0
+        self.pass_value = 0.0
+
+        # Stats
+        self.frames = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.busy_s = 0.0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._waits = deque(maxlen=LATENCY_WINDOW)
+        self._started_at: Optional[float] = None
+
+    def start(self):
+        self._started_at = time.time()
+        self.supervisor.start()
+        self.capture.start()
+
+    @property
+    def preview_buffer(self) -> FrameRingBuffer:
+        return self.display_buffer if self.display_buffer is not None else self.buffer
+
+    def stop(self):
+        self.capture.stop()
+        self.supervisor.stop()
+        self.buffer.close()
+        if self.display_buffer is not None:
+            self.display_buffer.close()
+
+    def ready(self, now: float) -> bool:
+        """A frame newer than the last processed one is waiting and the frame budget allows it"""
+        return self.buffer.seq > self.last_seq and now >= self.next_due
+
+    def process(self, now: float) -> float:
+        """Run the newest frame through the pipeline; returns the seconds spent"""
+        started = time.perf_counter()
+        ref = self.buffer.acquire(self.last_seq + 1, timeout=0)
+        if ref is None:
+            return 0.0
+        self.last_seq = ref.seq
+        captured_at = ref.timestamp
+        if self.max_fps:
+            self.next_due = now + 1.0 / self.max_fps
+        try:
+            with ref:
+                result = self.pipeline.process_frame(ref.frame)
+            self.on_result(self, result, time.time())
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            print(f"[ERROR] Detection on camera '{self.name}' failed:", e)
+        elapsed = time.perf_counter() - started
+        self.frames += 1
+        self.busy_s += elapsed
+        self._latencies.append(elapsed)
+        self._waits.append(max(0.0, now - captured_at))
+        return elapsed
+
+    def stats(self, total_busy_s: float, total_weight: float) -> Dict:
+        latencies = np.array(self._latencies, dtype=np.float64) * 1000
+        waits = np.array(self._waits, dtype=np.float64) * 1000
+        uptime = time.time() - self._started_at if self._started_at else 0.0
+        summary = {
+            "weight": self.weight,
+            "max_fps": self.max_fps,
+            "capture_running": self.capture.running,
+            "frames_captured": self.capture.frames_captured,
+            "frames_processed": self.frames,
+            "errors": self.errors,
+            "last_error": self.last_error or self.capture.last_error or self.supervisor.breaker.last_error,
+            "camera": self.supervisor.stats(),
+            "motion_gate": self.pipeline.motion_gate.stats() if self.pipeline.motion_gate is not None else None,
+            "roi": {"enabled": self.pipeline.roi_tiler is not None,
+                    **(self.pipeline.roi_tiler.stats() if self.pipeline.roi_tiler is not None else {})},
+            "tracker": {"enabled": self.pipeline.tracker is not None,
+                        **(self.pipeline.tracker.stats() if self.pipeline.tracker is not None else {})},
+            "processed_fps": round(self.frames / uptime, 2) if uptime > 0 else 0.0,
+            # Share of model time actually received vs the share the weights entitle it to
+            "model_share": round(self.busy_s / total_busy_s, 3) if total_busy_s > 0 else 0.0,
+            "fair_share": round(self.weight / total_weight, 3) if total_weight > 0 else 0.0,
+        }
+        if len(latencies):
+            summary.update({
+                "latency_ms_p50": round(float(np.percentile(latencies, 50)), 2),
+                "latency_ms_p95": round(float(np.percentile(latencies, 95)), 2),
+                # Frame age when the scheduler picked it up: time spent queued behind other cameras
+                "wait_ms_p50": round(float(np.percentile(waits, 50)), 2),
+                "wait_ms_p95": round(float(np.percentile(waits, 95)), 2),
+            })
+        return summary
+
+
+class MultiCameraScheduler:
+    POLICIES = ("round_robin", "fair")
+
+    def __init__(self, channels: List[CameraChannel], policy: str = "fair", idle_wait: float = 0.01,
+                 throttle_fn: Optional[Callable[[], float]] = None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown scheduling policy '{policy}', expected one of {self.POLICIES}")
+        if not channels:
+            raise ValueError("MultiCameraScheduler needs at least one camera")
+        self.channels = list(channels)
+        self.by_name = {channel.name: channel for channel in self.channels}
+        self.policy = policy
+        self.idle_wait = idle_wait
+        self.throttle_fn = throttle_fn  # >1 stretches each inference into a duty cycle
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._rr_index = 0
+        self._virtual_time = 0.0
+        self._started_at: Optional[float] = None
+        self.busy_s = 0.0
+        self.idle_polls = 0
+        self.throttled_s = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._started_at = time.time()
+        for channel in self.channels:
+            channel.start()
+        self._thread = threading.Thread(target=self._run, name="camera-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        for channel in self.channels:
+            channel.stop()
+
+    def pick(self, now: float) -> Optional[CameraChannel]:
+        """Next channel to run, or None if no channel has a frame due"""
+        ready = [channel for channel in self.channels if channel.ready(now)]
+        if not ready:
+            return None
+        if self.policy == "round_robin":
+            n = len(self.channels)
+            for offset in range(n):
+                channel = self.channels[(self._rr_index + offset) % n]
+                if channel in ready:
+                    self._rr_index = (self._rr_index + offset + 1) % n
+                    return channel
+        for channel in ready:
+            channel.pass_value = max(channel.pass_value, self._virtual_time)
+        channel = min(ready, key=lambda c: c.pass_value)
+        self._virtual_time = channel.pass_value
+        return channel
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            channel = self.pick(time.time())
+            if channel is None:
+                self.idle_polls += 1
+                self._stop_event.wait(self.idle_wait)
+                continue
+            elapsed = channel.process(time.time())
+            channel.pass_value += elapsed / channel.weight
+            self.busy_s += elapsed
+            throttle = self.throttle_fn() if self.throttle_fn is not None else 1.0
+            if throttle > 1.0:
+                # Busy for 1/throttle of the time the model would otherwise be
+                pause = elapsed * (throttle - 1.0)
+                self.throttled_s += pause
+                self._stop_event.wait(pause)
+
+    def stats(self) -> Dict:
+        uptime = time.time() - self._started_at if self._started_at else 0.0
+        total_weight = sum(channel.weight for channel in self.channels)
+        return {
+            "policy": self.policy,
+            "running": self.running,
+            # Fraction of wall time the shared model was busy
+            "utilization": round(self.busy_s / uptime, 3) if uptime > 0 else 0.0,
+            "frames_processed": sum(channel.frames for channel in self.channels),
+            "thermal_pause_s": round(self.throttled_s, 2),
+            "cameras": {channel.name: channel.stats(self.busy_s, total_weight) for channel in self.channels},
+        }
@@ -0,0 +1,132 @@
+import math
+import threading
+from typing import Dict, Optional
+
+
+class AdaptiveRateController:
+    """
+    Chooses how many captured frames to skip between inferences, and how long
+    to sleep between scans, from measured capture and inference times.
+
+    Two constraints drive the frame skip:
+      * CPU budget - inference may use at most ``cpu_budget`` of one core's
+        time: inference / (skip * frame_interval) <= cpu_budget
+      * target latency - a person entering should be seen within
+        ``target_latency_ms``: skip * frame_interval + inference <= target
+    Within those bounds the largest skip is used to save CPU. The CPU budget
+    wins when they conflict, so a thermally throttled Pi slows
+    its sampling rate down instead of falling further and further behind.
+    set_throttle() divides the budget further while the SoC runs hot.
+    """
+
+    def __init__(self, target_latency_ms: float = 500.0, cpu_budget: float = 0.5,
+                 initial_skip: int = 5, min_skip: int = 1, max_skip: int = 30,
+                 base_scan_interval: float = 6.0, max_scan_interval: float = 60.0,
+                 smoothing: float = 0.2, enabled: bool = True):
+        self.target_latency_ms = target_latency_ms
+        self.cpu_budget = cpu_budget
+        self.min_skip = min_skip
+        self.max_skip = max_skip
+        self.base_scan_interval = base_scan_interval
+        self.max_scan_interval = max_scan_interval
+        self.smoothing = smoothing
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._frame_skip = initial_skip
+        self._scan_interval = base_scan_interval
+        self.capture_ms: Optional[float] = None
+        self.inference_ms: Optional[float] = None
+        self.frame_interval_ms: Optional[float] = None
+        self._last_frame: Optional[tuple] = None
+        self.latency_target_met = True
+        self.throttle = 1.0  # thermal throttle factor from the resource governor
+
+    def _ema(self, current: Optional[float], sample: float) -> float:
+        return sample if current is None else current + self.smoothing * (sample - current)
+
+    # -----------------------------
+    # Measurements
+    # -----------------------------
+    def record_frame(self, seq: int, timestamp: float):
+        """Feed (seq, capture timestamp) of each consumed frame to learn the camera rate"""
+        with self._lock:
+            if self._last_frame is not None:
+                last_seq, last_ts = self._last_frame
+                if seq > last_seq and timestamp > last_ts:
+                    per_frame = (timestamp - last_ts) / (seq - last_seq) * 1000
+                    self.frame_interval_ms = self._ema(self.frame_interval_ms, per_frame)
+            self._last_frame = (seq, timestamp)
+
+    def record_capture(self, seconds: float):
+        with self._lock:
+            self.capture_ms = self._ema(self.capture_ms, seconds * 1000)
+
+    def record_inference(self, seconds: float):
+        with self._lock:
+            self.inference_ms = self._ema(self.inference_ms, seconds * 1000)
+            self._recompute()
+
+    def record_scan(self, busy_seconds: float, scan_seconds: float):
+        """
+        After a scan, space the next one so detection's average CPU share
+        (busy / (scan + sleep)) stays within the budget.
+        """
+        with self._lock:
+            if not self.enabled:
+                return
+            needed = busy_seconds / self.effective_budget - scan_seconds
+            self._scan_interval = min(self.max_scan_interval, max(self.base_scan_interval, needed))
+
+    def _recompute(self):
+        if not self.enabled or self.inference_ms is None or not self.frame_interval_ms:
+            return
+        # Fewest skipped frames the CPU budget allows, and the most the latency
+        # target tolerates; prefer the latter since it spends the least CPU.
+        budget_skip = math.ceil(self.inference_ms / (self.effective_budget * self.frame_interval_ms))
+        latency_skip = math.floor((self.target_latency_ms - self.inference_ms) / self.frame_interval_ms)
+        self.latency_target_met = latency_skip >= budget_skip
+        self._frame_skip = max(self.min_skip, min(self.max_skip, max(budget_skip, latency_skip)))
+
+    def set_throttle(self, factor: float):
+        """Divide the CPU budget by ``factor`` (>= 1) until set back to 1"""
+        with self._lock:
+            self.throttle = max(1.0, factor)
+            self._recompute()
+
+    # -----------------------------
+    # Outputs
+    # -----------------------------
+    @property
+    def effective_budget(self) -> float:
+        return self.cpu_budget / self.throttle
+
+    @property
+    def frame_skip(self) -> int:
+        return self._frame_skip
+
+    @property
+    def scan_interval(self) -> float:
+        return self._scan_interval
+
+    def stats(self) -> Dict:
+        with self._lock:
+            fps = 1000 / self.frame_interval_ms if self.frame_interval_ms else None
+            effective = None
+            if fps:
+                # Inference slower than the sampling interval caps the rate itself
+                period_ms = max(self._frame_skip * self.frame_interval_ms, self.inference_ms or 0.0)
+                effective = 1000 / period_ms
+            return {
+                "enabled": self.enabled,
+                "frame_skip": self._frame_skip,
+                "scan_interval_s": round(self._scan_interval, 2),
+                "camera_fps": round(fps, 2) if fps else None,
+                "effective_inference_fps": round(effective, 2) if effective else None,
+                "capture_ms": round(self.capture_ms, 2) if self.capture_ms is not None else None,
+                "inference_ms": round(self.inference_ms, 2) if self.inference_ms is not None else None,
+                "target_latency_ms": self.target_latency_ms,
+                "cpu_budget": self.cpu_budget,
+                "thermal_throttle": self.throttle,
+                "latency_target_met": self.latency_target_met,
+            }
@@ -0,0 +1,196 @@
+"""
+Relay bank owned by a single actuator thread.
+
+Scans, the continuous loop, the camera scheduler and error handlers all want
+to switch relays, often at the same time. Instead of each of them calling
+the driver, they post the desired state of some pins with apply() (or
+all_off()) and return straight away. The actuator thread is the only code
+that touches the driver. Each pass it:
+
+  * coalesces every command queued since the last pass (latest state per
+    pin wins), so a burst of scans costs one write per pin at most,
+  * writes only the pins whose state differs from what the bank is at,
+  * holds back a pin toggled less than ``min_toggle_s`` ago until its
+    interval has passed (so a flickering zone cannot chatter a relay), and
+    then applies whatever is desired at that point.
+
+Shutdown uses stop(), which switches everything off immediately, ignoring
+the toggle interval. ``on_write(seconds)`` is called from the actuator
+thread with the duration of every driver write, so write latency is
+measured where the write happens rather than where it is queued.
+"""
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+from app.utils.hardware import RelayDriver
+
+
+class RelayActuator:
+    def __init__(self, driver: RelayDriver, min_toggle_s: float = 1.0,
+                 on_write: Optional[Callable[[float], None]] = None):
+        self.driver = driver
+        self.name = driver.name
+        self.min_toggle_s = min_toggle_s
+        self.on_write = on_write
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        # Owned by the actuator thread
+        self._desired: Dict[int, bool] = {}
+        self._last_toggle: Dict[int, float] = {}
+        self._held: Set[int] = set()  # pins waiting out their toggle interval
+        self._setup_writes = 0
+
+        self.requests = 0
+        self.pins_requested = 0
+        self.coalesced = 0  # commands merged into another in the same pass
+        self.deferred = 0  # writes held back by the toggle interval
+        self.write_errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def states(self) -> Dict[int, bool]:
+        """What the relay bank is currently set to"""
+        return dict(self.driver.states)
+
+    @property
+    def writes(self) -> int:
+        return self.driver.writes
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def start(self, pins: Sequence[int]):
+        """Configure the pins (all OFF) and start the actuator thread"""
+        if self.running:
+            return
+        self.driver.setup(pins)
+        self._setup_writes = self.driver.writes
+        self._desired = {pin: False for pin in pins}
+        self._last_toggle = {}
+        self._held = set()
+        self._thread = threading.Thread(target=self._run, name="relay-actuator", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Switch every relay off now and stop the thread"""
+        if self.running:
+            self._queue.put(("stop", None))
+            self._thread.join(timeout)
+        else:
+            self.driver.all_off()
+        self._thread = None
+
+    def cleanup(self):
+        self.driver.cleanup()
+
+    # -----------------------------
+    # Commands (any thread)
+    # -----------------------------
+    def apply(self, states: Dict[int, bool]):
+        """Ask for these pin states; returns without waiting for the write"""
+        with self._stats_lock:
+            self.requests += 1
+            self.pins_requested += len(states)
+        self._queue.put(("apply", dict(states)))
+
+    def all_off(self):
+        self._queue.put(("all_off", None))
+
+    def flush(self, timeout: float = 1.0) -> bool:
+        """Wait until every command queued before this call has been processed"""
+        if not self.running:
+            return False
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    # -----------------------------
+    # Actuator thread
+    # -----------------------------
+    def _next_due(self, now: float) -> Optional[float]:
+        """Seconds until the earliest held-back pin may toggle, None if nothing is held back"""
+        waits = [self._last_toggle.get(pin, 0.0) + self.min_toggle_s - now
+                 for pin, on in self._desired.items() if self.driver.states.get(pin) != on]
+        return max(0.0, min(waits)) if waits else None
+
+    def _write_changes(self, now: float, force: bool = False):
+        for pin, on in self._desired.items():
+            if self.driver.states.get(pin) == on:
+                self._held.discard(pin)
+                continue
+            if not force and now - self._last_toggle.get(pin, -self.min_toggle_s) < self.min_toggle_s:
+                if pin not in self._held:
+                    self._held.add(pin)
+                    self.deferred += 1
+                continue
+            self._held.discard(pin)
+            started = time.perf_counter()
+            try:
+                self.driver.set(pin, on)
+            except Exception as e:
+                self.write_errors += 1
+                self.last_error = str(e)
+                print(f"[ERROR] Relay write to GPIO {pin} failed:", e)
+            if self.on_write is not None:
+                self.on_write(time.perf_counter() - started)
+            self._last_toggle[pin] = now
+
+    def _run(self):
+        while True:
+            try:
+                commands: List = [self._queue.get(timeout=self._next_due(time.monotonic()))]
+            except queue.Empty:
+                commands = []
+            while True:
+                try:
+                    commands.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop, flushed, applied = False, [], 0
+            for kind, payload in commands:
+                if kind == "apply":
+                    self._desired.update(payload)
+                    applied += 1
+                elif kind == "all_off":
+                    self._desired = {pin: False for pin in set(self._desired) | set(self.driver.states)}
+                    applied += 1
+                elif kind == "flush":
+                    flushed.append(payload)
+                elif kind == "stop":
+                    stop = True
+            if applied > 1:
+                self.coalesced += applied - 1
+            if stop:
+                self._desired = {pin: False for pin in set(self._desired) | set(self.driver.states)}
+
+            self._write_changes(time.monotonic(), force=stop)
+            for done in flushed:
+                done.set()
+            if stop:
+                return
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            requests, pins_requested = self.requests, self.pins_requested
+        return {
+            "driver": self.name,
+            "actuator_running": self.running,
+            "states": {pin: "ON" if on else "OFF" for pin, on in self.driver.states.items()},
+            "requests": requests,
+            "coalesced": self.coalesced,
+            "writes": self.driver.writes,
+            # Requested pin states that needed no write (unchanged or superseded)
+            "writes_saved": max(0, pins_requested - (self.driver.writes - self._setup_writes)),
+            "deferred": self.deferred,
+            "min_toggle_s": self.min_toggle_s,
+            "write_errors": self.write_errors,
+            "last_error": self.last_error,
+        }
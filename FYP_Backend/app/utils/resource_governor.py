@@ -0,0 +1,228 @@
+"""
+CPU and thermal governor for the detection subsystem.
+
+Two jobs:
+
+  * CPU placement - how many threads the inference backend may use
+    (torch / onnxruntime / OpenVINO all default to every core, which starves
+    the API and the capture thread on a 4-core Pi) and, optionally, which
+    cores the detection threads run on. pin_current_thread() pins the
+    calling thread; threads and worker processes it starts afterwards
+    inherit the mask, so pinning the startup thread covers the detection
+    loop, the schedulers and the inference worker.
+  * Thermal headroom - the SoC temperature is read from sysfs every
+    ``poll_interval`` seconds and smoothed. The Pi firmware caps the ARM
+    clock at 80-85 C, which makes every inference slower at once. The
+    governor acts before that: from ``soft_limit_c`` up to ``hard_limit_c``
+    (set below the firmware limit) the throttle factor rises linearly from
+    1 to ``max_throttle``, using the temperature projected ``lookahead_s``
+    ahead from its recent trend. Consumers divide their detection rate by
+    the factor (rate controller CPU budget, scan spacing, camera scheduler
+    duty cycle).
+
+Every change of the throttle factor is kept as a decision for the API.
+Without a readable sensor the factor stays at 1.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+SOC_TEMP_PATH = "/sys/class/thermal/thermal_zone0/temp"
+# Raspberry Pi firmware throttling flags (vcgencmd get_throttled)
+FIRMWARE_THROTTLED_PATH = "/sys/devices/platform/soc/soc:firmware/get_throttled"
+FIRMWARE_FLAGS = {0: "under_voltage", 1: "arm_freq_capped", 2: "throttled", 3: "soft_temp_limit"}
+
+
+def parse_cpu_list(spec: str) -> Optional[List[int]]:
+    """ "1-3,5" -> [1, 2, 3, 5]; empty spec = no pinning """
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+    cpus = set()
+    for part in spec.split(","):
+        start, _, end = part.strip().partition("-")
+        cpus.update(range(int(start), int(end or start) + 1))
+    return sorted(cpus)
+
+
+def resolve_thread_count(spec: str, cpus: Optional[List[int]] = None) -> Optional[int]:
+    """
+    "auto": one per pinned core, or every core but one for the API;
+    "0": leave the backend's own default; otherwise the number given.
+    """
+    spec = (spec or "auto").strip().lower()
+    if spec == "auto":
+        return len(cpus) if cpus else max(1, (os.cpu_count() or 1) - 1)
+    threads = int(spec)
+    return threads if threads > 0 else None
+
+
+class ResourceGovernor:
+    def __init__(self, inference_threads: Optional[int] = None, cpus: Optional[List[int]] = None,
+                 temp_path: str = SOC_TEMP_PATH, throttled_path: str = FIRMWARE_THROTTLED_PATH,
+                 soft_limit_c: float = 70.0, hard_limit_c: float = 78.0, max_throttle: float = 4.0,
+                 lookahead_s: float = 30.0, poll_interval: float = 2.0, smoothing: float = 0.3,
+                 step: float = 0.25, hysteresis_c: float = 1.0,
+                 on_throttle: Optional[Callable[[float], None]] = None, history_size: int = 50):
+        if hard_limit_c <= soft_limit_c:
+            raise ValueError("hard_limit_c must be above soft_limit_c")
+        if max_throttle < 1.0:
+            raise ValueError("max_throttle must be at least 1")
+        self.inference_threads = inference_threads  # None = backend default
+        self.cpus = cpus  # None = no pinning
+        self.temp_path = temp_path
+        self.throttled_path = throttled_path
+        self.soft_limit_c = soft_limit_c
+        self.hard_limit_c = hard_limit_c
+        self.max_throttle = max_throttle
+        self.lookahead_s = lookahead_s
+        self.poll_interval = poll_interval
+        self.smoothing = smoothing
+        self.step = step  # throttle is quantised so small wobbles don't count as decisions
+        self.hysteresis_c = hysteresis_c  # the throttle eases only this far below where it rose
+        self.on_throttle = on_throttle
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.temperature_c: Optional[float] = None  # smoothed
+        self.trend_c_per_s = 0.0
+        self.projected_c: Optional[float] = None
+        self._last_read: Optional[float] = None
+        self.throttle = 1.0
+        self.sensor_errors = 0
+        self.pinned_threads = 0
+        self.pin_error: Optional[str] = None
+        self.decisions = deque(maxlen=history_size)
+
+    # -----------------------------
+    # CPU placement
+    # -----------------------------
+    def pin_current_thread(self) -> bool:
+        """Restrict the calling thread (and what it starts later) to ``cpus``"""
+        if not self.cpus or not hasattr(os, "sched_setaffinity"):
+            return False
+        try:
+            os.sched_setaffinity(0, self.cpus)  # 0 = the calling thread on Linux
+        except (OSError, ValueError) as e:
+            self.pin_error = str(e)
+            print(f"[ERROR] Could not pin detection threads to CPUs {self.cpus}:", e)
+            return False
+        self.pinned_threads += 1
+        return True
+
+    # -----------------------------
+    # Thermal policy
+    # -----------------------------
+    def read_temperature(self) -> Optional[float]:
+        """SoC temperature in C, None if there is no readable sensor"""
+        try:
+            with open(self.temp_path) as f:
+                return int(f.read().strip()) / 1000.0
+        except (OSError, ValueError):
+            self.sensor_errors += 1
+            return None
+
+    def read_firmware_flags(self) -> Optional[List[str]]:
+        """Throttling the firmware is applying right now (Raspberry Pi only)"""
+        try:
+            with open(self.throttled_path) as f:
+                value = int(f.read().strip(), 16)
+        except (OSError, ValueError):
+            return None
+        return [name for bit, name in FIRMWARE_FLAGS.items() if value & (1 << bit)]
+
+    def throttle_for(self, temperature_c: float) -> float:
+        """Throttle factor for a (projected) temperature, quantised to ``step``"""
+        span = (temperature_c - self.soft_limit_c) / (self.hard_limit_c - self.soft_limit_c)
+        factor = 1.0 + (self.max_throttle - 1.0) * min(1.0, max(0.0, span))
+        return round(factor / self.step) * self.step
+
+    def update(self, sample_c: Optional[float], now: Optional[float] = None) -> float:
+        """Feed one temperature reading; returns the throttle factor in force"""
+        now = time.time() if now is None else now
+        if sample_c is None:
+            return self.throttle
+        with self._lock:
+            previous, last_read = self.temperature_c, self._last_read
+            if previous is None:
+                self.temperature_c = sample_c
+            else:
+                self.temperature_c = previous + self.smoothing * (sample_c - previous)
+                if now > last_read:
+                    rate = (self.temperature_c - previous) / (now - last_read)
+                    self.trend_c_per_s += self.smoothing * (rate - self.trend_c_per_s)
+            self._last_read = now
+            # Only a rising trend pulls the decision forward; cooling is waited out
+            self.projected_c = self.temperature_c + max(0.0, self.trend_c_per_s) * self.lookahead_s
+            throttle = self.throttle_for(self.projected_c)
+            if throttle < self.throttle:
+                eased = self.throttle_for(self.projected_c + self.hysteresis_c)
+                throttle = max(throttle, min(self.throttle, eased))
+            changed = throttle != self.throttle
+            if changed:
+                self.decisions.append({
+                    "timestamp": now,
+                    "temperature_c": round(self.temperature_c, 1),
+                    "projected_c": round(self.projected_c, 1),
+                    "throttle": throttle,
+                    "reason": "heating" if throttle > self.throttle else "cooling",
+                })
+                self.throttle = throttle
+        if changed:
+            print(f"[INFO] Thermal governor: {self.projected_c:.1f}C projected, detection rate / {throttle:g}")
+            if self.on_throttle is not None:
+                self.on_throttle(throttle)
+        return throttle
+
+    # -----------------------------
+    # Thread
+    # -----------------------------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="resource-governor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.update(self.read_temperature())
+            except Exception as e:
+                print("[ERROR] Thermal governor update failed:", e)
+            self._stop_event.wait(self.poll_interval)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            temperature, projected = self.temperature_c, self.projected_c
+            decisions = list(self.decisions)
+        return {
+            "running": self.running,
+            "inference_threads": self.inference_threads,
+            "cpus": self.cpus,
+            "pinned_threads": self.pinned_threads,
+            "pin_error": self.pin_error,
+            "temperature_c": round(temperature, 1) if temperature is not None else None,
+            "projected_c": round(projected, 1) if projected is not None else None,
+            "trend_c_per_min": round(self.trend_c_per_s * 60, 2),
+            "soft_limit_c": self.soft_limit_c,
+            "hard_limit_c": self.hard_limit_c,
+            "throttle": self.throttle,
+            "firmware_throttling": self.read_firmware_flags(),
+            "sensor_errors": self.sensor_errors,
+            "decisions": decisions[-10:],
+        }
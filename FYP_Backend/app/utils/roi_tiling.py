@@ -0,0 +1,225 @@
+"""
+Region-of-interest tiling for the smart detection pipeline.
+
+Most frames only change a couple of the 3x3 zones, so instead of sending the
+whole frame through the model every time, RoiTiler picks the zones that need
+re-checking and crops just those (plus a margin so people straddling a zone
+edge are still seen whole). The crops go to the backend as one batch and the
+fresh counts are merged into the last known per-zone counts.
+
+A zone is re-checked when:
+  * its part of a small greyscale thumbnail changed since it was last checked,
+  * it is flagged as uncertain (e.g. hysteresis is counting towards a switch),
+  * it has not been verified for ``reverify_s`` seconds.
+
+When more than ``max_zones`` zones qualify, one full-frame inference is
+cheaper than the crops, so the frame goes down the normal path.
+
+Zone shapes come from a ZoneMapper, so polygon zones are cropped by their
+bounding box and counted by the same label image as the full-frame path.
+"""
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.utils.inference_backends import InferenceBackend
+from app.utils.zone_mapping import ZoneMapper
+
+
+class RoiTiler:
+    def __init__(self, rows: int, cols: int, margin: float = 0.25, reverify_s: float = 10.0,
+                 changed_fraction: float = 0.02, pixel_delta: int = 25,
+                 thumb_size: Tuple[int, int] = (96, 72), max_zones: Optional[int] = None,
+                 imgsz: int = 320, zone_mapper: Optional[ZoneMapper] = None):
+        self.rows = rows
+        self.cols = cols
+        self.n_zones = rows * cols
+        self.margin = margin  # fraction of a cell added on every side of a crop
+        self.reverify_s = reverify_s
+        self.changed_fraction = changed_fraction
+        self.pixel_delta = pixel_delta
+        self.thumb_size = thumb_size
+        self.max_zones = max_zones if max_zones is not None else self.n_zones // 2
+        self.imgsz = imgsz
+        self.zone_mapper = zone_mapper if zone_mapper is not None else ZoneMapper(rows, cols)
+
+        self._lock = threading.Lock()
+        self._layout_version = -1
+        self._thumb_lut: Optional[np.ndarray] = None
+        self._thumb_zone_pixels = np.ones(self.n_zones)
+        self._geometry: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]] = {}
+        self._reference: Optional[np.ndarray] = None
+        self._pending: Optional[np.ndarray] = None
+        self._counts: Optional[np.ndarray] = None
+        self._last_checked = np.full(self.n_zones, -np.inf)
+        self._flagged = np.zeros(self.n_zones, dtype=bool)
+        self.last_motion = np.zeros(self.n_zones)
+
+        # Counters, split by path so the two can be compared directly
+        self.full_frames = 0
+        self.full_time_total = 0.0
+        self.roi_frames = 0
+        self.roi_time_total = 0.0
+        self.roi_crops = 0
+        self.idle_frames = 0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _sync_layout_locked(self) -> bool:
+        """Follow a zone layout change; True if the last result no longer applies"""
+        version = self.zone_mapper.version
+        if version == self._layout_version:
+            return False
+        self._layout_version = version
+        self._thumb_lut = self.zone_mapper.lut_for((self.thumb_size[1], self.thumb_size[0]))
+        pixels = np.bincount(self._thumb_lut[self._thumb_lut >= 0], minlength=self.n_zones)
+        self._thumb_zone_pixels = np.maximum(pixels, 1)
+        self._geometry = {}
+        self._reference = None
+        self._counts = None
+        return True
+
+    def geometry(self, frame_shape: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (zone bounding boxes, crop rects) as (n_zones, 4) int x0, y0, x1, y1
+        arrays for a frame size. A zone with no pixels gets an empty box.
+        """
+        key = tuple(frame_shape[:2])
+        cached = self._geometry.get(key)
+        if cached is None:
+            h, w = key
+            lut = self.zone_mapper.lut_for(key)
+            zones = np.zeros((self.n_zones, 4), dtype=np.int64)
+            for zone in range(self.n_zones):
+                ys, xs = np.nonzero(lut == zone)
+                if len(xs):
+                    zones[zone] = (xs.min(), ys.min(), xs.max() + 1, ys.max() + 1)
+            size = np.concatenate([zones[:, 2:] - zones[:, :2]] * 2, axis=1)
+            pad = np.array([-1, -1, 1, 1]) * size * self.margin
+            crops = np.clip(np.round(zones + pad), 0, [w, h, w, h]).astype(np.int64)
+            cached = self._geometry[key] = (zones, crops)
+        return cached
+
+    def zone_motion(self, thumb: np.ndarray) -> np.ndarray:
+        """Fraction of changed thumbnail pixels per zone since each zone was last checked"""
+        changed = cv2.absdiff(thumb, self._reference) > self.pixel_delta
+        labels = self._thumb_lut[changed]
+        return np.bincount(labels[labels >= 0], minlength=self.n_zones) / self._thumb_zone_pixels
+
+    def flag(self, zones: np.ndarray):
+        """Mark zones (flat bool mask) as uncertain so they are re-checked next frame"""
+        with self._lock:
+            self._flagged |= np.asarray(zones, dtype=bool).reshape(-1)
+
+    def plan(self, frame: np.ndarray, now: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Flat indices of the zones to re-check for this frame (possibly empty),
+        or None when the whole frame should go through the model instead.
+        """
+        now = time.time() if now is None else now
+        thumb = self._thumbnail(frame)
+        with self._lock:
+            self._pending = thumb
+            self._sync_layout_locked()
+            if self._reference is None or self._counts is None:
+                return None
+            self.last_motion = self.zone_motion(thumb)
+            due = (now - self._last_checked) >= self.reverify_s
+            zone_rects, _ = self.geometry(frame.shape)
+            has_pixels = (zone_rects[:, 2] > zone_rects[:, 0]) & (zone_rects[:, 3] > zone_rects[:, 1])
+            zones = np.flatnonzero(((self.last_motion >= self.changed_fraction) | due | self._flagged) & has_pixels)
+            if len(zones) > self.max_zones:
+                return None
+            if not len(zones):
+                self.idle_frames += 1
+            return zones
+
+    def last_counts(self) -> np.ndarray:
+        with self._lock:
+            return self._counts.copy()
+
+    def detect(self, backend: InferenceBackend, frame: np.ndarray,
+               zones: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Run one batched inference over the zone crops -> (counts merged into
+        the last counts, (N, 4) frame-coordinate boxes found in the zones)
+        """
+        _, crop_rects = self.geometry(frame.shape)
+        crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in crop_rects[zones]]
+        results = backend.predict_batch(crops, imgsz=self.imgsz)
+
+        counts = self.last_counts()
+        boxes = []
+        for zone, detections in zip(zones, results):
+            if not len(detections):
+                counts[zone] = 0
+                continue
+            # A crop includes its neighbours' margins; only count people centred in this zone
+            xyxy = detections.xyxy + np.tile(crop_rects[zone, :2], 2).astype(np.float32)
+            inside = self.zone_mapper.zone_of(xyxy, frame.shape) == zone
+            counts[zone] = int(np.count_nonzero(inside))
+            boxes.append(xyxy[inside])
+        return counts, (np.concatenate(boxes) if boxes else np.zeros((0, 4), dtype=np.float32))
+
+    def commit(self, counts: np.ndarray, zones: Optional[np.ndarray], inference_time: float,
+               now: Optional[float] = None):
+        """Record a result: zones=None for a full-frame inference, else the zones that were re-checked"""
+        now = time.time() if now is None else now
+        with self._lock:
+            thumb, self._pending = self._pending, None
+            self._counts = np.asarray(counts).copy()
+            if zones is None:
+                self.full_frames += 1
+                self.full_time_total += inference_time
+                self._last_checked[:] = now
+                self._flagged[:] = False
+                if thumb is not None:
+                    self._reference = thumb
+            else:
+                self.roi_frames += 1
+                self.roi_time_total += inference_time
+                self.roi_crops += len(zones)
+                self._last_checked[zones] = now
+                self._flagged[zones] = False
+                if thumb is not None and self._reference is not None:
+                    np.copyto(self._reference, thumb, where=np.isin(self._thumb_lut, zones))
+
+    def reset(self):
+        """Forget the last result and zero the counters"""
+        with self._lock:
+            self.full_frames = self.roi_frames = self.roi_crops = self.idle_frames = 0
+            self.full_time_total = self.roi_time_total = 0.0
+            self._reference = None
+            self._pending = None
+            self._counts = None
+            self._last_checked[:] = -np.inf
+            self._flagged[:] = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            full_ms = self.full_time_total / self.full_frames * 1000 if self.full_frames else None
+            roi_ms = self.roi_time_total / self.roi_frames * 1000 if self.roi_frames else None
+            return {
+                "full_frame": {
+                    "frames": self.full_frames,
+                    "avg_inference_ms": round(full_ms, 2) if full_ms else None,
+                    "fps": round(1000 / full_ms, 2) if full_ms else None,
+                },
+                "roi": {
+                    "frames": self.roi_frames,
+                    "avg_inference_ms": round(roi_ms, 2) if roi_ms else None,
+                    "fps": round(1000 / roi_ms, 2) if roi_ms else None,
+                    "avg_crops": round(self.roi_crops / self.roi_frames, 2) if self.roi_frames else None,
+                    "imgsz": self.imgsz,
+                },
+                "idle_frames": self.idle_frames,
+                "speedup": round(full_ms / roi_ms, 2) if full_ms and roi_ms else None,
+                "max_zones": self.max_zones,
+                "last_motion": [round(float(m), 4) for m in self.last_motion],
+            }
@@ -0,0 +1,214 @@
+"""
+Duty-cycled scan scheduling.
+
+Instead of scanning at a fixed interval around the clock, ScanScheduler
+picks the gap before the next scan from what it has seen:
+
+  * occupied (last scan found someone, or any relay is on):
+    ``occupied_interval``, so lights follow people promptly,
+  * empty: starts at ``empty_interval`` and grows by ``backoff`` with every
+    consecutive empty scan, up to ``max_idle_interval``,
+  * quiet hours (e.g. 23:00-06:00): empty rooms back off further, up to
+    ``quiet_interval``,
+  * busy hours: an hour of the day that has often been occupied lately
+    (learned per hour as a moving average) caps the empty back-off at
+    ``busy_hour_interval``, so a room that usually fills up at 9:00 isn't
+    polled once every two minutes at 9:00.
+
+``min_interval_fn`` (the rate controller's CPU-budget spacing) is a floor
+on every interval, and ``throttle_fn`` (the thermal governor's factor)
+stretches it while the SoC runs hot. In scan mode the thread is started and
+stopped explicitly and can be paused; pause() only stops scanning and leaves
+the relays as they are. Scans wait for ``ready_fn`` (e.g. the camera being
+up) instead of failing and sitting out a whole interval. The continuous
+loop uses the same policy without the thread: record() and next_interval()
+give the gap to leave between frames while a room is empty.
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+
+def parse_hours(spec: str) -> Optional[Tuple[int, int]]:
+    """ "23-6" -> (23, 6); empty spec = no quiet hours """
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+    start, end = (int(part) % 24 for part in spec.split("-"))
+    return start, end
+
+
+class ScanScheduler:
+    def __init__(self, scan_fn: Callable[[], bool],
+                 occupied_interval: float = 6.0, empty_interval: float = 15.0,
+                 backoff: float = 1.5, max_idle_interval: float = 120.0,
+                 quiet_hours: Optional[Tuple[int, int]] = (23, 6), quiet_interval: float = 300.0,
+                 busy_hour_threshold: float = 0.25, busy_hour_interval: float = 30.0,
+                 hour_smoothing: float = 0.05, history_size: int = 500,
+                 relays_on_fn: Optional[Callable[[], bool]] = None,
+                 min_interval_fn: Optional[Callable[[], float]] = None,
+                 throttle_fn: Optional[Callable[[], float]] = None,
+                 ready_fn: Optional[Callable[[], bool]] = None, ready_poll_s: float = 0.5):
+        self.scan_fn = scan_fn  # runs one scan, returns whether anyone was found
+        self.occupied_interval = occupied_interval
+        self.empty_interval = empty_interval
+        self.backoff = backoff
+        self.max_idle_interval = max_idle_interval
+        self.quiet_hours = quiet_hours
+        self.quiet_interval = quiet_interval
+        self.busy_hour_threshold = busy_hour_threshold
+        self.busy_hour_interval = busy_hour_interval
+        self.hour_smoothing = hour_smoothing
+        self.relays_on_fn = relays_on_fn
+        self.min_interval_fn = min_interval_fn
+        self.throttle_fn = throttle_fn
+        self.ready_fn = ready_fn
+        self.ready_poll_s = ready_poll_s
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()  # interrupts the wait between scans
+        self._paused = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.history = deque(maxlen=history_size)  # (timestamp, occupied)
+        self.hourly_occupancy = np.zeros(24)  # share of scans that found someone, per hour of day
+        self.empty_streak = 0
+        self.last_occupied = False
+        self.scans = 0
+        self.errors = 0
+        self.last_interval = 0.0
+        self.last_reason = "startup"
+        self.next_scan_at: Optional[float] = None
+
+    # -----------------------------
+    # Policy
+    # -----------------------------
+    def in_quiet_hours(self, hour: int) -> bool:
+        if self.quiet_hours is None:
+            return False
+        start, end = self.quiet_hours
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    def record(self, occupied: bool, now: Optional[float] = None):
+        """Feed one scan's outcome into the occupancy history"""
+        now = time.time() if now is None else now
+        hour = time.localtime(now).tm_hour
+        with self._lock:
+            self.history.append((now, occupied))
+            self.hourly_occupancy[hour] += self.hour_smoothing * (float(occupied) - self.hourly_occupancy[hour])
+            self.last_occupied = occupied
+            self.empty_streak = 0 if occupied else self.empty_streak + 1
+            self.scans += 1
+
+    def next_interval(self, now: Optional[float] = None) -> Tuple[float, str]:
+        """(seconds until the next scan, why)"""
+        now = time.time() if now is None else now
+        hour = time.localtime(now).tm_hour
+        relays_on = self.relays_on_fn() if self.relays_on_fn is not None else False
+        with self._lock:
+            if self.last_occupied or relays_on:
+                interval, reason = self.occupied_interval, "occupied"
+            else:
+                interval = self.empty_interval * self.backoff ** max(0, self.empty_streak - 1)
+                reason, ceiling = "empty", self.max_idle_interval
+                if self.hourly_occupancy[hour] >= self.busy_hour_threshold:
+                    reason, ceiling = "busy_hour", min(ceiling, self.busy_hour_interval)
+                elif self.in_quiet_hours(hour):
+                    reason, ceiling = "quiet_hours", max(ceiling, self.quiet_interval)
+                interval = max(self.empty_interval, min(interval, ceiling))
+        if self.min_interval_fn is not None:
+            floor = self.min_interval_fn()
+            if floor > interval:
+                interval, reason = floor, reason + "+cpu_budget"
+        if self.throttle_fn is not None:
+            throttle = self.throttle_fn()
+            if throttle > 1.0:
+                interval, reason = interval * throttle, reason + "+thermal"
+        return interval, reason
+
+    # -----------------------------
+    # Thread
+    # -----------------------------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._run, name="scan-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop after the scan in progress, if any"""
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        self.next_scan_at = None
+
+    def pause(self):
+        self._paused = True
+        self._wake.set()
+
+    def resume(self):
+        """Resume scanning, starting with a scan straight away"""
+        self._paused = False
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if self._paused:
+                self.next_scan_at = None
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            if self.ready_fn is not None and not self.ready_fn():
+                self.next_scan_at, self.last_reason = None, "waiting_until_ready"
+                self._wake.wait(self.ready_poll_s)
+                self._wake.clear()
+                continue
+            try:
+                self.record(bool(self.scan_fn()))
+            except Exception as e:
+                self.errors += 1
+                print("[ERROR] Scheduled scan failed:", e)
+            interval, reason = self.next_interval()
+            self.last_interval, self.last_reason = interval, reason
+            self.next_scan_at = time.time() + interval
+            self._wake.wait(interval)
+            self._wake.clear()
+
+    def stats(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            recent = [occupied for ts, occupied in self.history if now - ts <= 3600]
+            hourly = [round(float(v), 3) for v in self.hourly_occupancy]
+            summary = {
+                "running": self.running,
+                "paused": self._paused,
+                "scans": self.scans,
+                "errors": self.errors,
+                "last_occupied": self.last_occupied,
+                "empty_streak": self.empty_streak,
+                "occupancy_last_hour": round(sum(recent) / len(recent), 3) if recent else None,
+                "hourly_occupancy": hourly,
+            }
+        summary.update({
+            "interval_s": round(self.last_interval, 2),
+            "reason": self.last_reason,
+            "next_scan_in_s": round(max(0.0, self.next_scan_at - now), 2) if self.next_scan_at else None,
+            "in_quiet_hours": self.in_quiet_hours(time.localtime(now).tm_hour),
+        })
+        return summary
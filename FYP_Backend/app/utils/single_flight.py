@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call at a time; callers that arrive while a call is in
+    flight wait for it and share its result (or its exception) instead of
+    starting a second one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._call: Optional[_Call] = None
+        self.calls = 0
+        self.joined = 0
+
+    @property
+    def in_flight(self) -> bool:
+        return self._call is not None
+
+    def do(self, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._call
+            leader = call is None
+            if leader:
+                call = self._call = _Call()
+                self.calls += 1
+            else:
+                self.joined += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._call = None
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class LatestValue(Generic[T]):
+    """Most recently published value plus the time it was published"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._value: Optional[T] = None
+        self._published_at = 0.0
+
+    def publish(self, value: T):
+        with self._cond:
+            self._value = value
+            self._published_at = time.time()
+            self._cond.notify_all()
+
+    def get(self) -> Optional[T]:
+        return self._value
+
+    @property
+    def published_at(self) -> float:
+        return self._published_at
+
+    def wait_newer(self, since: float, timeout: float) -> Optional[T]:
+        """Block until a value published after ``since`` exists, or time out"""
+        with self._cond:
+            if self._cond.wait_for(lambda: self._published_at > since, timeout=timeout):
+                return self._value
+            return None
@@ -0,0 +1,212 @@
+"""
+Lightweight multi-object tracker for the smart detection pipeline (pure NumPy).
+
+Detections are matched to existing tracks greedily by IoU against each
+track's predicted box. If boxes no longer overlap, which happens when the
+model runs rarely and people move between inferences, they fall back to
+centroid distance. Every track keeps a smoothed constant-velocity estimate,
+so it is matched (and, while coasting, counted) where it should be by the
+time of the next inference. A track missed by a few inferences coasts for
+``max_age_s`` instead of dropping out, which keeps counts from flickering.
+
+Zone changes are reported as entry/exit events:
+  * "enter": a confirmed track appears in a zone (or moves into it),
+  * "exit": a track leaves a zone (moves away or expires).
+"""
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.zone_mapping import ZoneMapper, box_centers
+
+
+class TrackEvent(NamedTuple):
+    kind: str  # "enter" | "exit"
+    track_id: int
+    zone: Tuple[int, int]
+    timestamp: float
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes -> (N, M)"""
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y1 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def greedy_match(score: np.ndarray) -> List[Tuple[int, int]]:
+    """(row, col) pairs taken in descending score order; pairs with score <= 0 are never matched"""
+    pairs = []
+    if score.size == 0:
+        return pairs
+    used_rows, used_cols = set(), set()
+    for flat in np.argsort(-score, axis=None):
+        row, col = divmod(int(flat), score.shape[1])
+        if score[row, col] <= 0:
+            break
+        if row in used_rows or col in used_cols:
+            continue
+        pairs.append((row, col))
+        used_rows.add(row)
+        used_cols.add(col)
+    return pairs
+
+
+class IoUTracker:
+    def __init__(self, zone_mapper: ZoneMapper, iou_threshold: float = 0.3, max_age_s: float = 2.0,
+                 min_hits: int = 1, centroid_gate: float = 0.75, velocity_smoothing: float = 0.5):
+        self.zone_mapper = zone_mapper
+        self.iou_threshold = iou_threshold
+        self.max_age_s = max_age_s
+        self.min_hits = min_hits
+        self.centroid_gate = centroid_gate  # max centre jump, as a fraction of the box diagonal
+        self.velocity_smoothing = velocity_smoothing
+
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._boxes = np.zeros((0, 4), dtype=np.float32)
+        self._velocity = np.zeros((0, 2), dtype=np.float32)  # px/s of the box centre
+        self._updated = np.zeros(0)  # when the box was last set from a detection
+        self._last_seen = np.zeros(0)
+        self._hits = np.zeros(0, dtype=np.int64)
+        self._zones = np.zeros(0, dtype=np.int64)  # flat zone index, -1 = none
+
+        self.tracks_created = 0
+        self.events_total: Dict[str, int] = {"enter": 0, "exit": 0}
+
+    # -----------------------------
+    # Geometry
+    # -----------------------------
+    def _predicted(self, now: float) -> np.ndarray:
+        """Track boxes moved along their velocity to ``now`` (never further than max_age_s)"""
+        dt = np.clip(now - self._updated, 0.0, self.max_age_s)[:, None]
+        shift = self._velocity * dt
+        return self._boxes + np.concatenate([shift, shift], axis=1)
+
+    def _event(self, kind: str, track_id: int, zone: int, now: float) -> TrackEvent:
+        self.events_total[kind] += 1
+        return TrackEvent(kind, int(track_id), divmod(int(zone), self.zone_mapper.cols), now)
+
+    # -----------------------------
+    # Updates
+    # -----------------------------
+    def update(self, xyxy: np.ndarray, now: float, frame_shape: Tuple[int, ...],
+               observed_zones: Optional[Sequence[int]] = None) -> List[TrackEvent]:
+        """
+        Feed one inference's person boxes and return the entry/exit events it
+        caused. ``observed_zones`` limits which zones this inference looked at
+        (ROI mode): tracks elsewhere are left alone rather than counted as missed.
+        """
+        detections = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        events = []
+        with self._lock:
+            predicted = self._predicted(now)
+            score = np.zeros((len(predicted), len(detections)))
+            if len(predicted) and len(detections):
+                iou = iou_matrix(predicted, detections)
+                track_x, track_y = box_centers(predicted)
+                det_x, det_y = box_centers(detections)
+                distance = np.hypot(track_x[:, None] - det_x[None, :], track_y[:, None] - det_y[None, :])
+                diagonal = np.hypot(predicted[:, 2] - predicted[:, 0], predicted[:, 3] - predicted[:, 1])
+                gate = np.maximum(diagonal * self.centroid_gate, 1.0)[:, None]
+                # IoU matches always beat centroid-only matches
+                score = np.where(iou >= self.iou_threshold, 1.0 + iou,
+                                 np.where(distance < gate, 1.0 - distance / gate, 0.0))
+
+            matched_tracks, matched_dets = set(), set()
+            for track, det in greedy_match(score):
+                matched_tracks.add(track)
+                matched_dets.add(det)
+                dt = now - self._updated[track]
+                if dt > 0:
+                    old_x, old_y = box_centers(self._boxes[track:track + 1])
+                    new_x, new_y = box_centers(detections[det:det + 1])
+                    velocity = np.array([new_x[0] - old_x[0], new_y[0] - old_y[0]]) / dt
+                    self._velocity[track] = (self.velocity_smoothing * velocity
+                                             + (1 - self.velocity_smoothing) * self._velocity[track])
+                self._boxes[track] = detections[det]
+                self._updated[track] = now
+                self._last_seen[track] = now
+                self._hits[track] += 1
+
+            if observed_zones is not None and len(self._ids):
+                # Tracks in zones this inference did not look at are still there.
+                # Tracks in no zone (unconfirmed, off-frame, polygon gaps) age as usual.
+                unobserved = (self._zones >= 0) & ~np.isin(self._zones, np.asarray(observed_zones))
+                unobserved[list(matched_tracks)] = False
+                self._last_seen[unobserved] = now
+
+            new = [det for det in range(len(detections)) if det not in matched_dets]
+            if new:
+                count = len(new)
+                self._ids = np.concatenate([self._ids, np.arange(self._next_id, self._next_id + count)])
+                self._next_id += count
+                self.tracks_created += count
+                self._boxes = np.concatenate([self._boxes, detections[new]])
+                self._velocity = np.concatenate([self._velocity, np.zeros((count, 2), dtype=np.float32)])
+                self._updated = np.concatenate([self._updated, np.full(count, now)])
+                self._last_seen = np.concatenate([self._last_seen, np.full(count, now)])
+                self._hits = np.concatenate([self._hits, np.ones(count, dtype=np.int64)])
+                self._zones = np.concatenate([self._zones, np.full(count, -1, dtype=np.int64)])
+
+            # Expire tracks that have not been seen for max_age_s
+            expired = (now - self._last_seen) > self.max_age_s
+            for i in np.flatnonzero(expired & (self._zones >= 0)):
+                events.append(self._event("exit", self._ids[i], self._zones[i], now))
+            if expired.any():
+                keep = ~expired
+                self._ids, self._boxes, self._velocity = self._ids[keep], self._boxes[keep], self._velocity[keep]
+                self._updated, self._last_seen = self._updated[keep], self._last_seen[keep]
+                self._hits, self._zones = self._hits[keep], self._zones[keep]
+
+            # Zone transitions of confirmed tracks
+            zones = self.zone_mapper.zone_of(self._predicted(now), frame_shape)
+            zones[self._hits < self.min_hits] = -1
+            for i in np.flatnonzero(zones != self._zones):
+                if self._zones[i] >= 0:
+                    events.append(self._event("exit", self._ids[i], self._zones[i], now))
+                if zones[i] >= 0:
+                    events.append(self._event("enter", self._ids[i], zones[i], now))
+            self._zones = zones
+        return events
+
+    def hold(self, now: float):
+        """The scene is known to be unchanged (e.g. motion gate reuse): keep every track alive"""
+        with self._lock:
+            self._last_seen[:] = now
+
+    def counts(self, now: float, frame_shape: Tuple[int, ...]) -> np.ndarray:
+        """Flat per-zone count of confirmed tracks at their interpolated positions"""
+        with self._lock:
+            confirmed = self._hits >= self.min_hits
+            zones = self.zone_mapper.zone_of(self._predicted(now)[confirmed], frame_shape)
+        return np.bincount(zones[zones >= 0], minlength=self.zone_mapper.n_zones)
+
+    def reset(self):
+        with self._lock:
+            self._ids = self._ids[:0]
+            self._boxes = self._boxes[:0]
+            self._velocity = self._velocity[:0]
+            self._updated = self._updated[:0]
+            self._last_seen = self._last_seen[:0]
+            self._hits = self._hits[:0]
+            self._zones = self._zones[:0]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "active_tracks": int(len(self._ids)),
+                "confirmed_tracks": int(np.count_nonzero(self._hits >= self.min_hits)),
+                "tracks_created": self.tracks_created,
+                "events": dict(self.events_total),
+                "iou_threshold": self.iou_threshold,
+                "max_age_s": self.max_age_s,
+            }
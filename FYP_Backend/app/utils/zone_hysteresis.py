@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import Dict, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+
+class ZoneHysteresis:
+    """
+    Per-zone on/off debouncing for continuous detection.
+
+    A zone switches ON after ``on_frames`` consecutive processed frames with
+    someone in it, and switches OFF only once it has been empty for
+    ``off_seconds``. Both thresholds can be set per zone, so a doorway can
+    react faster than a row of desks.
+    """
+
+    def __init__(self, rows: int, cols: int,
+                 on_frames: Union[int, Sequence[int]] = 2,
+                 off_seconds: Union[float, Sequence[float]] = 10.0,
+                 overrides: Optional[Dict[Tuple[int, int], Tuple[int, float]]] = None):
+        self.rows = rows
+        self.cols = cols
+        n_zones = rows * cols
+        self.on_frames = np.broadcast_to(np.asarray(on_frames, dtype=np.int64), (n_zones,)).copy()
+        self.off_seconds = np.broadcast_to(np.asarray(off_seconds, dtype=np.float64), (n_zones,)).copy()
+        for (row, col), (zone_on, zone_off) in (overrides or {}).items():
+            self.on_frames[row * cols + col] = zone_on
+            self.off_seconds[row * cols + col] = zone_off
+
+        self._lock = threading.Lock()
+        self._state = np.zeros(n_zones, dtype=bool)
+        self._hits = np.zeros(n_zones, dtype=np.int64)
+        self._last_seen = np.full(n_zones, -np.inf)
+        self.updates = 0
+        self.transitions = 0
+        self.last_update: Optional[float] = None
+
+    def update(self, occupied: np.ndarray, now: Optional[float] = None) -> bool:
+        """
+        Feed one frame's per-zone occupancy (flat bool/count array).
+        Returns True when any zone changed state.
+        """
+        now = time.time() if now is None else now
+        occupied = np.asarray(occupied).reshape(-1) > 0
+        with self._lock:
+            self._hits = np.where(occupied, self._hits + 1, 0)
+            self._last_seen[occupied] = now
+
+            turn_on = ~self._state & (self._hits >= self.on_frames)
+            turn_off = self._state & ((now - self._last_seen) >= self.off_seconds)
+            changed = turn_on | turn_off
+            self._state ^= changed
+
+            self.updates += 1
+            self.transitions += int(changed.sum())
+            self.last_update = now
+            return bool(changed.any())
+
+    def reset(self):
+        with self._lock:
+            self._state[:] = False
+            self._hits[:] = 0
+            self._last_seen[:] = -np.inf
+
+    @property
+    def state(self) -> np.ndarray:
+        with self._lock:
+            return self._state.copy()
+
+    def pending(self) -> np.ndarray:
+        """Flat bool mask of zones part-way towards switching ON or OFF"""
+        with self._lock:
+            return (~self._state & (self._hits > 0)) | (self._state & (self._hits == 0))
+
+    def occupied(self) -> Set[Tuple[int, int]]:
+        """(row, col) of every zone currently held ON"""
+        return {divmod(int(i), self.cols) for i in np.flatnonzero(self.state)}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "zones_on": [list(divmod(int(i), self.cols)) for i in np.flatnonzero(self._state)],
+                "updates": self.updates,
+                "transitions": self.transitions,
+                "last_update": self.last_update,
+                "on_frames": self.on_frames.reshape(self.rows, self.cols).tolist(),
+                "off_seconds": self.off_seconds.reshape(self.rows, self.cols).tolist(),
+            }
@@ -0,0 +1,162 @@
+"""
+Detection box -> zone mapping through a pixel label image.
+
+Zones are identified by (row, col) like the original 3x3 grid, which is
+what relays, hysteresis and the API key on. By default each zone is a grid
+cell; alternatively each zone can be given one or more polygons, e.g.
+
+    [{"zone": [0, 0], "points": [[0.0, 0.0], [0.45, 0.0], [0.3, 0.6], [0.0, 0.6]]},
+     {"zone": [0, 1], "points": [[0.45, 0.0], [1.0, 0.0], [1.0, 0.6], [0.3, 0.6]]}]
+
+with points as fractions of the frame width/height, so one layout works at
+any resolution. Either way the layout is compiled once per frame size into
+an int16 label image (the LUT) and a box centre maps to its zone with a
+single array index, however complex the polygons are. Where polygons
+overlap the later one wins; pixels outside every polygon belong to no zone.
+"""
+import json
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+
+def box_centers(xyxy: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Centre x/y of every (N, 4) xyxy box"""
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    return (xyxy[:, 0] + xyxy[:, 2]) * 0.5, (xyxy[:, 1] + xyxy[:, 3]) * 0.5
+
+
+def build_grid_lut(frame_shape: Tuple[int, ...], rows: int, cols: int) -> np.ndarray:
+    """Pixel -> cell index lookup table (-1 where a pixel belongs to no cell)"""
+    h, w = frame_shape[:2]
+    cell_h, cell_w = h // rows, w // cols
+    row_idx = np.arange(h) // cell_h
+    col_idx = np.arange(w) // cell_w
+    lut = row_idx[:, None] * cols + col_idx[None, :]
+    lut[(row_idx >= rows)[:, None] | (col_idx >= cols)[None, :]] = -1
+    return lut.astype(np.int16)
+
+
+def load_zone_polygons(spec) -> List[Dict]:
+    """Zone polygons from a list, inline JSON or a JSON file path; empty spec = plain grid"""
+    if isinstance(spec, (list, tuple)):
+        return list(spec)
+    spec = (spec or "").strip()
+    if not spec:
+        return []
+    if not spec.startswith("["):
+        with open(spec) as f:
+            spec = f.read()
+    return json.loads(spec)
+
+
+def validate_polygons(polygons, rows: int, cols: int) -> List[Dict]:
+    """Normalise a polygon list to [{"zone": (row, col), "points": (N, 2) float array}]"""
+    checked = []
+    for polygon in polygons or []:
+        row, col = (int(v) for v in polygon["zone"])
+        if not (0 <= row < rows and 0 <= col < cols):
+            raise ValueError(f"Zone {[row, col]} is outside the {rows}x{cols} grid")
+        points = np.asarray(polygon["points"], dtype=np.float64)
+        if points.ndim != 2 or points.shape[1] != 2 or len(points) < 3:
+            raise ValueError(f"Zone {[row, col]} needs at least 3 [x, y] points")
+        if points.min() < 0.0 or points.max() > 1.0:
+            raise ValueError(f"Zone {[row, col]} points must be fractions of the frame size (0..1)")
+        checked.append({"zone": (row, col), "points": points})
+    return checked
+
+
+def build_polygon_lut(frame_shape: Tuple[int, ...], polygons: List[Dict], cols: int) -> np.ndarray:
+    """Pixel -> zone index label image rasterised from validated polygons (-1 outside all of them)"""
+    h, w = frame_shape[:2]
+    lut = np.full((h, w), -1, dtype=np.int16)
+    for polygon in polygons:
+        row, col = polygon["zone"]
+        points = np.round(polygon["points"] * [w - 1, h - 1]).astype(np.int32)
+        cv2.fillPoly(lut, [points], row * cols + col)
+    return lut
+
+
+def lut_zone_counts(xyxy: np.ndarray, lut: np.ndarray, n_zones: int) -> np.ndarray:
+    """People per zone using a precomputed pixel -> zone label image"""
+    h, w = lut.shape
+    center_x, center_y = box_centers(xyxy)
+    inside = (center_x >= 0) & (center_x < w) & (center_y >= 0) & (center_y < h)
+    labels = lut[center_y[inside].astype(np.int64), center_x[inside].astype(np.int64)]
+    return np.bincount(labels[labels >= 0], minlength=n_zones)
+
+
+class ZoneMapper:
+    """
+    Maps detection boxes to zones through a lookup table that is built once
+    per frame resolution and reused for every subsequent frame. Changing the
+    layout with set_polygons() drops the compiled tables and bumps
+    ``version`` so anything derived from them can rebuild too.
+    """
+
+    def __init__(self, rows: int, cols: int, polygons: Optional[List[Dict]] = None):
+        self.rows = rows
+        self.cols = cols
+        self.n_zones = rows * cols
+        self.polygons: List[Dict] = []
+        self.version = 0
+        self._luts: Dict[Tuple[int, int], np.ndarray] = {}
+        self._lock = threading.Lock()
+        if polygons:
+            self.set_polygons(polygons)
+
+    def set_polygons(self, polygons: Optional[List[Dict]]):
+        """Replace the zone layout (empty = plain grid); raises ValueError on a bad layout"""
+        checked = validate_polygons(polygons, self.rows, self.cols)
+        with self._lock:
+            self.polygons = checked
+            self._luts = {}
+            self.version += 1
+
+    def polygon_config(self) -> List[Dict]:
+        """The current layout in its JSON form"""
+        return [{"zone": list(p["zone"]), "points": p["points"].round(4).tolist()} for p in self.polygons]
+
+    def lut_for(self, frame_shape: Tuple[int, ...]) -> np.ndarray:
+        key = tuple(frame_shape[:2])
+        lut = self._luts.get(key)
+        if lut is None:
+            with self._lock:
+                lut = self._luts.get(key)
+                if lut is None:
+                    if self.polygons:
+                        lut = build_polygon_lut(key, self.polygons, self.cols)
+                    else:
+                        lut = build_grid_lut(key, self.rows, self.cols)
+                    self._luts[key] = lut
+        return lut
+
+    def zone_of(self, xyxy: np.ndarray, frame_shape: Tuple[int, ...]) -> np.ndarray:
+        """Flat zone index of every box centre (-1 outside every zone)"""
+        lut = self.lut_for(frame_shape)
+        h, w = lut.shape
+        center_x, center_y = box_centers(xyxy)
+        zones = np.full(len(center_x), -1, dtype=np.int64)
+        inside = (center_x >= 0) & (center_x < w) & (center_y >= 0) & (center_y < h)
+        zones[inside] = lut[center_y[inside].astype(np.int64), center_x[inside].astype(np.int64)]
+        return zones
+
+    def outlines(self, frame_shape: Tuple[int, ...]) -> List[np.ndarray]:
+        """Polygon outlines in pixels for drawing (empty for the plain grid)"""
+        h, w = frame_shape[:2]
+        return [np.round(p["points"] * [w - 1, h - 1]).astype(np.int32) for p in self.polygons]
+
+    def counts(self, xyxy: np.ndarray, frame_shape: Tuple[int, ...]) -> np.ndarray:
+        """Flat (n_zones,) people count per cell"""
+        if len(xyxy) == 0:
+            return np.zeros(self.n_zones, dtype=np.int64)
+        return lut_zone_counts(xyxy, self.lut_for(frame_shape), self.n_zones)
+
+    def occupied(self, counts: np.ndarray) -> Set[Tuple[int, int]]:
+        """(row, col) of every cell with at least one person"""
+        return {(int(i) // self.cols, int(i) % self.cols) for i in np.flatnonzero(counts)}
+
+    def as_grid(self, counts: np.ndarray) -> list:
+        return counts.reshape(self.rows, self.cols).tolist()
@@ -0,0 +1,79 @@
+import threading
+from typing import Dict, Set, Tuple
+
+import numpy as np
+
+
+class ZoneVoter:
+    """
+    Per-zone sequential vote across the frames of one detection scan.
+
+    Each zone runs a sequential probability ratio test between "empty" (the
+    detector fires in ``false_positive_rate`` of frames) and "occupied" (it
+    fires in ``detection_rate`` of frames). Every processed frame adds its
+    log-likelihood ratio; a zone is decided once its evidence reaches the
+    ``confidence`` bound either way. The scan can stop as soon as every
+    zone is decided instead of always running its full duration.
+
+    Frames whose result was reused (motion gate) are not fresh evidence and
+    count with ``reused_weight``.
+    """
+
+    def __init__(self, rows: int, cols: int, confidence: float = 0.95,
+                 detection_rate: float = 0.6, false_positive_rate: float = 0.05,
+                 reused_weight: float = 0.5):
+        if not 0.5 < confidence < 1.0:
+            raise ValueError("confidence must be between 0.5 and 1")
+        if not 0.0 < false_positive_rate < detection_rate < 1.0:
+            raise ValueError("need 0 < false_positive_rate < detection_rate < 1")
+        self.rows = rows
+        self.cols = cols
+        self.confidence = confidence
+        self.reused_weight = reused_weight
+        self._hit_llr = np.log(detection_rate / false_positive_rate)
+        self._miss_llr = np.log((1 - detection_rate) / (1 - false_positive_rate))
+        self._bound = np.log(confidence / (1 - confidence))
+
+        self._lock = threading.Lock()
+        self._llr = np.zeros(rows * cols)
+        self._hits = np.zeros(rows * cols, dtype=np.int64)
+        self.frames = 0
+
+    def vote(self, counts: np.ndarray, reused: bool = False):
+        """Add one frame's per-zone result (flat counts or bool mask)"""
+        occupied = np.asarray(counts).reshape(-1) > 0
+        weight = self.reused_weight if reused else 1.0
+        with self._lock:
+            self._llr += weight * np.where(occupied, self._hit_llr, self._miss_llr)
+            self._hits += occupied
+            self.frames += 1
+
+    def decided(self) -> np.ndarray:
+        """Flat bool mask of zones whose evidence has reached the confidence bound"""
+        with self._lock:
+            return np.abs(self._llr) >= self._bound
+
+    def all_decided(self) -> bool:
+        return bool(self.decided().all())
+
+    def occupied_mask(self) -> np.ndarray:
+        """Current per-zone decision; undecided zones go with the sign of their evidence"""
+        with self._lock:
+            return self._llr > 0
+
+    def occupied(self) -> Set[Tuple[int, int]]:
+        return {divmod(int(i), self.cols) for i in np.flatnonzero(self.occupied_mask())}
+
+    def confidence_grid(self) -> list:
+        """Probability (flat prior) that each zone's decision is right, as a rows x cols grid"""
+        with self._lock:
+            probability = 1.0 / (1.0 + np.exp(-np.abs(self._llr)))
+        return np.round(probability, 3).reshape(self.rows, self.cols).tolist()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "decided_zones": int(np.count_nonzero(np.abs(self._llr) >= self._bound)),
+                "hits": self._hits.reshape(self.rows, self.cols).tolist(),
+            }
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the smart detection pipeline.
+
+Replays a recorded video, a directory of frames or the synthetic scene
+through the same DetectionPipeline the API uses (ring buffer -> motion gate
+-> inference -> tracker/zone mapping -> hysteresis -> relay actuator) and
+reports FPS, per-stage p50/p95/p99 latency and peak RSS. Defaults match the
+service's (motion gate and tracker on, ROI tiling off). Relays go through
+the RelayActuator thread to the in-memory driver, so it runs on any Linux
+machine.
+
+Examples:
+    python benchmark_detection.py --source file:recordings/classroom.mp4 --frames 300
+    python benchmark_detection.py --source synthetic --backend onnxruntime --model yolov8n.onnx
+    python benchmark_detection.py --source file:frames/ --json results/$(git rev-parse --short HEAD).json
+    python benchmark_detection.py --source file:frames/ --compare results/baseline.json
+    python benchmark_detection.py --source file:recordings/classroom.mp4 --roi
+    python benchmark_detection.py --no-motion-gate --no-tracker  # raw per-frame inference
+    python benchmark_detection.py --width 1280 --height 960 --detection-size 320x240 --imgsz 320
+"""
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+
+from app.utils.detection_pipeline import STAGES, DetectionPipeline
+from app.utils.frame_buffer import CaptureThread, FrameRingBuffer
+from app.utils.hardware import InMemoryRelayDriver, create_camera_source, parse_size
+from app.utils.inference_backends import create_backend
+from app.utils.motion_gate import MotionGate
+from app.utils.relay_actuator import RelayActuator
+from app.utils.roi_tiling import RoiTiler
+from app.utils.tracker import IoUTracker
+from app.utils.zone_hysteresis import ZoneHysteresis
+from app.utils.zone_mapping import ZoneMapper
+
+# Same as app/routers/smart_detection.py
+RELAY_PINS = [2, 3, 4, 17]
+GRID_ROWS, GRID_COLS = 3, 3
+ROI_MAX_ZONES = 4
+HYSTERESIS_ON_FRAMES = 1
+HYSTERESIS_OFF_SECONDS = 10.0
+
+
+def summarize(samples: List[float]) -> Dict:
+    ms = np.array(samples, dtype=np.float64) * 1000
+    if not len(ms):
+        return {"count": 0}
+    return {
+        "count": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_benchmark(args) -> Dict:
+    samples = defaultdict(list)
+    lores_size = parse_size(args.detection_size)
+    camera = create_camera_source(args.source, size=(args.width, args.height), fps=None, lores_size=lores_size)
+    camera.start()
+    backend = create_backend(args.backend, args.model, conf=args.conf, imgsz=args.imgsz,
+                             num_threads=args.threads or None).load()
+    zone_mapper = ZoneMapper(GRID_ROWS, GRID_COLS)
+    relay_actuator = RelayActuator(InMemoryRelayDriver(), min_toggle_s=args.relay_min_toggle,
+                                   on_write=lambda seconds: samples["relay_write"].append(seconds))
+    relay_actuator.start(RELAY_PINS)
+    pipeline = DetectionPipeline(
+        backend, zone_mapper, relay_actuator, RELAY_PINS,
+        motion_gate=MotionGate() if args.motion_gate else None,
+        on_stage=lambda stage, seconds: samples[stage].append(seconds),
+        roi_tiler=RoiTiler(GRID_ROWS, GRID_COLS, imgsz=args.roi_imgsz, max_zones=ROI_MAX_ZONES,
+                           zone_mapper=zone_mapper) if args.roi else None,
+        tracker=IoUTracker(zone_mapper) if args.tracker else None
+    )
+    hysteresis = ZoneHysteresis(GRID_ROWS, GRID_COLS, on_frames=HYSTERESIS_ON_FRAMES,
+                                off_seconds=HYSTERESIS_OFF_SECONDS)
+    buffer = FrameRingBuffer()
+    # Detection reads the lores stream; the full-size frames go to a display pool as in the API
+    capture = CaptureThread(lambda: camera, buffer, display_buffer=FrameRingBuffer() if lores_size else None)
+
+    def step(record: bool):
+        started = time.perf_counter()
+        capture.capture_once(camera)  # same capture-into-slot path as the capture thread
+        captured = time.perf_counter()
+        with buffer.acquire(buffer.seq) as ref:
+            acquired = time.perf_counter()
+            result = pipeline.process_frame(ref.frame)
+        # As the continuous loop does: relays follow zone hysteresis
+        if hysteresis.update(result.counts, time.time()):
+            pipeline.apply_relays(hysteresis.occupied(), [])
+        if pipeline.roi_tiler is not None:
+            pipeline.roi_tiler.flag(hysteresis.pending())
+        if record:
+            samples["capture"].append(captured - started)
+            samples["frame_acquire"].append(acquired - captured)
+            samples["total"].append(time.perf_counter() - started)
+
+    for _ in range(args.warmup):
+        step(record=False)
+    samples.clear()
+    if pipeline.roi_tiler is not None:
+        pipeline.roi_tiler.reset()
+
+    started = time.perf_counter()
+    for _ in range(args.frames):
+        step(record=True)
+    wall = time.perf_counter() - started
+    camera.stop()
+    relay_actuator.flush()
+    relay_actuator.stop()
+
+    return {
+        "label": args.label,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"machine": platform.machine(), "python": platform.python_version()},
+        "config": {
+            "source": args.source, "backend": args.backend, "model": args.model,
+            "imgsz": args.imgsz, "threads": args.threads or None, "size": [args.width, args.height],
+            "detection_size": list(lores_size) if lores_size else None,
+            "motion_gate": args.motion_gate, "frames": args.frames, "warmup": args.warmup,
+            "roi": args.roi, "roi_imgsz": args.roi_imgsz, "tracker": args.tracker,
+            "relay_min_toggle_s": args.relay_min_toggle,
+        },
+        "frames": args.frames,
+        "wall_s": round(wall, 3),
+        "fps": round(args.frames / wall, 2) if wall > 0 else None,
+        "backend_load_s": round(backend.load_time_s, 3),
+        "stages": {stage: summarize(samples[stage])
+                   for stage in ("capture", "frame_acquire") + STAGES[1:] + ("total",)},
+        "relay_writes": relay_actuator.writes,
+        "relays": relay_actuator.stats(),
+        "frame_pool": buffer.stats(),
+        "tracker": pipeline.tracker.stats() if pipeline.tracker is not None else None,
+        # Full-frame vs ROI inference throughput over the same run
+        "roi": pipeline.roi_tiler.stats() if pipeline.roi_tiler is not None else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_report(report: Dict, baseline: Dict = None):
+    print(f"\nSmart detection benchmark ({report['commit']}, {report['config']['backend']})")
+    print(f"  frames={report['frames']}  wall={report['wall_s']}s  fps={report['fps']}  peak_rss={report['peak_rss_mb']}MB")
+    print(f"  {'stage':<14}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for stage, stats in report["stages"].items():
+        if not stats.get("count"):
+            continue
+        line = f"  {stage:<14}{stats['count']:>7}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+        base = (baseline or {}).get("stages", {}).get(stage, {})
+        if base.get("p95_ms"):
+            line += f"   p95 {100 * (stats['p95_ms'] / base['p95_ms'] - 1):+.1f}% vs {baseline['commit']}"
+        print(line)
+    roi = report.get("roi")
+    if roi:
+        full, crops = roi["full_frame"], roi["roi"]
+        print(f"  inference path   full-frame: {full['frames']} frames, {full['avg_inference_ms']} ms, {full['fps']} fps")
+        print(f"                   roi:        {crops['frames']} frames, {crops['avg_inference_ms']} ms, {crops['fps']} fps"
+              f" ({crops['avg_crops']} crops/frame, {roi['idle_frames']} idle, speedup {roi['speedup']}x)")
+    if baseline and baseline.get("fps"):
+        print(f"  fps {100 * (report['fps'] / baseline['fps'] - 1):+.1f}% vs {baseline['commit']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the smart detection pipeline")
+    parser.add_argument("--source", default="synthetic", help='"synthetic" or "file:<video or frame dir>"')
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--backend", default="ultralytics")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--threads", type=int, default=0, help="inference threads (0 = backend default)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--detection-size", default="",
+                        help='separate detection stream, e.g. "320x240" (default: detect on the full frame)')
+    parser.add_argument("--motion-gate", action=argparse.BooleanOptionalAction, default=True,
+                        help="skip inference on static frames (default: on, as in the service)")
+    parser.add_argument("--roi", action="store_true", help="re-check only changed zones as batched crops")
+    parser.add_argument("--roi-imgsz", type=int, default=320)
+    parser.add_argument("--tracker", action=argparse.BooleanOptionalAction, default=True,
+                        help="count zones from tracked people (default: on, as in the service)")
+    parser.add_argument("--relay-min-toggle", type=float, default=1.0,
+                        help="seconds between toggles of one relay (RELAY_MIN_TOGGLE_SECONDS)")
+    parser.add_argument("--label", default="")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
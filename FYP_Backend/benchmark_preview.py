@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the /preview JPEG encoder.
+
+Encodes the same captured frames with the previous preview path (frame
+copy, cv2.line grid, cv2.imencode at its default quality 95) and
+with every available JpegEncoder at each AdaptiveQuality step (copy/scale,
+precomputed zone overlay, encode). Reports per-frame latency and JPEG size.
+
+Examples:
+    python benchmark_preview.py --source synthetic --frames 200
+    python benchmark_preview.py --source file:frames/ --json results/preview.json
+"""
+
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from app.utils.hardware import create_camera_source
+from app.utils.jpeg_encoder import JPEG_ENCODERS, QUALITY_LADDER, ZoneOverlay
+
+GRID_ROWS, GRID_COLS = 3, 3
+
+
+def legacy_encode(frame: np.ndarray, bgr: np.ndarray) -> bytes:
+    """The preview path before the encoder rework, for comparison"""
+    np.copyto(bgr, frame)  # frames are already BGR
+    h, w, _ = bgr.shape
+    cell_h, cell_w = h // GRID_ROWS, w // GRID_COLS
+    for i in range(1, GRID_ROWS):
+        cv2.line(bgr, (0, i * cell_h), (w, i * cell_h), (0, 255, 0), 1)
+    for j in range(1, GRID_COLS):
+        cv2.line(bgr, (j * cell_w, 0), (j * cell_w, h), (0, 255, 0), 1)
+    ret, jpeg = cv2.imencode(".jpg", bgr)
+    return jpeg.tobytes()
+
+
+def measure(encode_fn, frames: List[np.ndarray], warmup: int) -> Dict:
+    for frame in frames[:warmup]:
+        encode_fn(frame)
+    times, sizes = [], []
+    for frame in frames:
+        started = time.perf_counter()
+        jpeg = encode_fn(frame)
+        times.append(time.perf_counter() - started)
+        sizes.append(len(jpeg))
+    ms = np.array(times, dtype=np.float64) * 1000
+    return {
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "avg_kb": round(float(np.mean(sizes)) / 1024, 1),
+    }
+
+
+def run_benchmark(args) -> Dict:
+    camera = create_camera_source(args.source, size=(args.width, args.height), fps=None)
+    camera.start()
+    frames = [camera.capture_array().copy() for _ in range(args.frames)]
+    camera.stop()
+
+    bgr = np.empty_like(frames[0])
+    results = {"legacy": measure(lambda frame: legacy_encode(frame, bgr), frames, args.warmup)}
+    overlay = ZoneOverlay(GRID_ROWS, GRID_COLS)
+    for name, encoder_cls in JPEG_ENCODERS.items():
+        try:
+            encoder = encoder_cls()
+        except (ImportError, OSError, RuntimeError) as e:
+            results[name] = {"unavailable": str(e)}
+            continue
+        for quality, scale in QUALITY_LADDER:
+            def encode(frame, encoder=encoder, quality=quality, scale=scale):
+                image = encoder.prepare(frame, scale)
+                overlay.apply(image)
+                return encoder.encode(image, quality)
+            results[f"{name} q{quality} x{scale:g}"] = measure(encode, frames, args.warmup)
+    return {
+        "config": {"source": args.source, "size": [args.width, args.height], "frames": args.frames},
+        "results": results,
+    }
+
+
+def print_report(report: Dict):
+    results = report["results"]
+    legacy = results["legacy"]["mean_ms"]
+    print(f"\nPreview encoder benchmark ({report['config']['source']}, "
+          f"{report['config']['size'][0]}x{report['config']['size'][1]})")
+    print(f"  {'path':<22}{'mean':>9}{'p50':>9}{'p95':>9}{'KB':>8}{'speedup':>9}")
+    for path, stats in results.items():
+        if "unavailable" in stats:
+            print(f"  {path:<22}unavailable: {stats['unavailable']}")
+            continue
+        print(f"  {path:<22}{stats['mean_ms']:>9.2f}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}"
+              f"{stats['avg_kb']:>8.1f}{legacy / stats['mean_ms']:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the preview JPEG encoder")
+    parser.add_argument("--source", default="synthetic", help='"synthetic" or "file:<video or frame dir>"')
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
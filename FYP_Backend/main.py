@@ -1,17 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 from app.routers import dashboard, monitoring, occupancy, zone_control, energy_analytics, device_control, smart_detection
 from app.database.database import init_db
+from app.utils.metrics import metrics_registry
 import uvicorn
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
+    smart_detection.start_detection_service()  # model loads in the background
     yield
     # Shutdown
-    pass
+    smart_detection.stop_detection_service()
 
 app = FastAPI(
     title="IoT Energy Management API",
@@ -46,5 +49,16 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "iot-energy-backend"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 503 until the smart detection model is loaded and warmed up"""
+    status = smart_detection.readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of smart detection metrics"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for the relay actuator (app/utils/relay_actuator.py).
+
+Runs against the in-memory relay driver, so no Pi is needed:
+    python -m pytest test_relay_actuator.py
+    python test_relay_actuator.py
+"""
+
+import threading
+
+from app.utils.detection_pipeline import DetectionPipeline
+from app.utils.hardware import InMemoryRelayDriver
+from app.utils.relay_actuator import RelayActuator
+from app.utils.zone_mapping import ZoneMapper
+
+RELAY_PINS = [2, 3, 4, 17]
+
+
+def start_actuator(min_toggle_s: float = 0.0, on_write=None) -> RelayActuator:
+    actuator = RelayActuator(InMemoryRelayDriver(), min_toggle_s=min_toggle_s, on_write=on_write)
+    actuator.start(RELAY_PINS)
+    return actuator
+
+
+def test_concurrent_requests_coalesce_into_one_write():
+    """800 threads asking for the same state at once switch the relay once"""
+    actuator = start_actuator()
+    setup_writes = actuator.writes
+    barrier = threading.Barrier(800)
+
+    def request():
+        barrier.wait()
+        actuator.apply({2: True})
+
+    threads = [threading.Thread(target=request) for _ in range(800)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert actuator.flush()
+
+    assert actuator.writes - setup_writes == 1
+    assert actuator.states[2] is True
+    assert actuator.stats()["requests"] == 800
+    actuator.stop()
+
+
+def test_toggle_interval_holds_back_a_flickering_relay():
+    actuator = start_actuator(min_toggle_s=60.0)
+    actuator.apply({3: True})
+    actuator.flush()
+    actuator.apply({3: False})
+    actuator.flush()
+    assert actuator.states[3] is True  # second toggle waits out the interval
+    assert actuator.deferred == 1
+    actuator.stop()
+    assert not any(actuator.states.values())  # shutdown ignores the interval
+
+
+def test_write_latency_is_timed_on_the_actuator_thread():
+    timed_on = []
+    actuator = start_actuator(on_write=lambda seconds: timed_on.append(threading.current_thread().name))
+    actuator.apply({4: True, 17: True})
+    actuator.flush()
+    assert timed_on == ["relay-actuator", "relay-actuator"]
+    actuator.stop()
+
+
+def test_pipeline_reports_actual_relay_states():
+    actuator = start_actuator(min_toggle_s=60.0)
+    pipeline = DetectionPipeline(None, ZoneMapper(3, 3), actuator, RELAY_PINS[:3])
+    logs = []
+    assert pipeline.apply_relays({(0, 1)}, logs) == {2: "OFF", 3: "ON", 4: "OFF"}
+    # Zone 1 empties inside the toggle interval: the relay is still on
+    assert pipeline.apply_relays(set(), logs)[3] == "ON"
+    assert "held" in logs[-2]
+    actuator.stop()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
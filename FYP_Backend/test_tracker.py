@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for the people tracker (app/utils/tracker.py).
+
+Pure NumPy, no model or camera needed:
+    python -m pytest test_tracker.py
+    python test_tracker.py
+"""
+
+import numpy as np
+
+from app.utils.tracker import IoUTracker
+from app.utils.zone_mapping import ZoneMapper
+
+FRAME_SHAPE = (480, 640, 3)
+NO_BOXES = np.zeros((0, 4), dtype=np.float32)
+
+
+def walk_off_right_edge(tracker: IoUTracker) -> float:
+    """One person walks right across zone (0, 2) and out of the frame; returns the time they left"""
+    now = 0.0
+    for x in range(450, 700, 50):
+        tracker.update(np.array([[x, 20, x + 60, 140]]), now, FRAME_SHAPE)
+        now += 0.5
+    return now
+
+
+def test_track_off_frame_expires_in_roi_mode():
+    """ROI inferences elsewhere must not keep a track outside every zone alive"""
+    tracker = IoUTracker(ZoneMapper(3, 3), max_age_s=2.0)
+    now = walk_off_right_edge(tracker)
+    for _ in range(120):  # 60 s of ROI inferences that only look at zone 0
+        tracker.update(NO_BOXES, now, FRAME_SHAPE, observed_zones=[0])
+        now += 0.5
+    assert tracker.stats()["active_tracks"] == 0
+
+
+def test_track_in_unobserved_zone_is_held_in_roi_mode():
+    """A confirmed track in a zone the ROI inference skipped stays alive"""
+    tracker = IoUTracker(ZoneMapper(3, 3), max_age_s=2.0)
+    tracker.update(np.array([[500, 20, 560, 140]]), 0.0, FRAME_SHAPE)
+    for step in range(1, 20):
+        tracker.update(NO_BOXES, step * 0.5, FRAME_SHAPE, observed_zones=[0])
+    assert tracker.stats()["active_tracks"] == 1
+
+
+def test_track_off_frame_expires_in_full_frame_mode():
+    tracker = IoUTracker(ZoneMapper(3, 3), max_age_s=2.0)
+    now = walk_off_right_edge(tracker)
+    for _ in range(6):
+        tracker.update(NO_BOXES, now, FRAME_SHAPE)
+        now += 0.5
+    assert tracker.stats()["active_tracks"] == 0
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
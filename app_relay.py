@@ -6,6 +6,7 @@ from typing import List, Tuple
 from picamera2 import Picamera2
 from ultralytics import YOLO
 import cv2
+import numpy as np
 import time
 import threading
 import traceback
@@ -120,13 +121,14 @@ def run_detection() -> DetectionResponse:
             for r in results:
                 if len(r.boxes) == 0:
                     continue
-                for box in r.boxes:
-                    # Convert tensor to numpy
-                    x1, y1, x2, y2 = box.xyxy.cpu().numpy()[0]
-                    center_x, center_y = (x1 + x2)/2, (y1 + y2)/2
-                    grid_col, grid_row = int(center_x // cell_w), int(center_y // cell_h)
-                    if 0 <= grid_row < GRID_ROWS and 0 <= grid_col < GRID_COLS:
-                        current_frame_grids.add((grid_row, grid_col))
+                # Map all box centres to grid cells in one pass
+                xyxy = r.boxes.xyxy.cpu().numpy()
+                center_x, center_y = (xyxy[:, 0] + xyxy[:, 2]) / 2, (xyxy[:, 1] + xyxy[:, 3]) / 2
+                grid_col = (center_x // cell_w).astype(int)
+                grid_row = (center_y // cell_h).astype(int)
+                valid = (grid_row >= 0) & (grid_row < GRID_ROWS) & (grid_col >= 0) & (grid_col < GRID_COLS)
+                counts = np.bincount(grid_row[valid] * GRID_COLS + grid_col[valid], minlength=GRID_ROWS * GRID_COLS)
+                current_frame_grids |= {divmod(int(i), GRID_COLS) for i in np.flatnonzero(counts)}
             last_occupied_grids = current_frame_grids
 
     human_detected = len(last_occupied_grids) > 0